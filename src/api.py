@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+api.py
+
+Library API for embedding postar in other programs (services, worker
+pools, GUIs):
+
+    from api import Postar
+
+    postar = Postar(settings={"B2_SHOWS_BASE": "...", "B2_TORRENTS_BASE": "...", "ENCODER_NAME": "..."})
+    html, summary = postar.render({"paths": ["/media/Show"], "mal_id": [41623], "span_color": ["blue"],
+                                   "airing_image": ["IMG"], "donation_image": ["IMG"]})
+
+A job is written like a jobs file entry (see jobs.py): a command line
+string, a list of arguments or an object of options. Everything a render
+depends on besides the job (settings, layout, caches, inventory, output
+folder) is held by a RenderContext and swapped in for that one call only,
+so a Postar can be used from many threads at once, and several Postars
+with different settings can live in one process.
+
+Long renders can be stopped from another thread with a CancelToken:
+
+    token = CancelToken()
+    html, summary = postar.render(job, cancel=token)   # token.cancel() elsewhere -> Cancelled
+
+The render stops at its next file, chunk or season; hashes, lookups and
+fragments finished before that are kept in the caches.
+
+Settings given here are used as they are: nothing is read from or written
+to .postar_settings.json, and there is no update check or banner.
+"""
+
+import argparse
+import contextlib
+from pathlib import Path
+
+from helper import (DEFAULT_SETTINGS, CancelToken, FragmentCache, ensure_settings, job_scope, save_hash_cache,
+                    save_mal_index, set_job_value)
+from jobs import job_argv, options_to_argv
+from layout import load_templates
+from python_postar import build_parser, preview_post, progressive_preview, run_batch_post, validate_post
+
+class RenderContext:
+    """
+    What a render uses besides its job. None means the process-wide
+    default (the settings file, the shared caches, ./output).
+
+    - settings: dict like .postar_settings.json; missing keys get defaults
+    - layout_dir: folder of user layout templates (<name>.html)
+    - fragment_cache: FragmentCache to use; FragmentCache(enabled=False)
+      re-renders everything
+    - inventory: where folders are listed from (helper.LocalInventory,
+      bucket.RemoteInventory)
+    - output_dir: where write() puts the post and its extra formats
+    - record_new: whether write() records New markers in processed.json
+    """
+    __slots__ = ("settings", "layout", "fragment_cache", "inventory", "output_dir", "record_new")
+
+    def __init__(self, settings: dict = None, layout_dir=None, fragment_cache: FragmentCache = None,
+                 inventory=None, output_dir=None, record_new=True):
+        self.settings = None if settings is None else {**DEFAULT_SETTINGS, **settings}
+        # Templates are loaded once; layouts compiled from them are shared by every render
+        self.layout = None if layout_dir is None else (load_templates(layout_dir), {})
+        self.fragment_cache = fragment_cache
+        self.inventory = inventory
+        self.output_dir = None if output_dir is None else Path(output_dir)
+        self.record_new = record_new
+
+    @contextlib.contextmanager
+    def scope(self, cancel: CancelToken = None):
+        """Run the block with this context in effect, for the current thread only."""
+        with job_scope():
+            if cancel is not None:
+                set_job_value("cancel", cancel)
+            for name, value in (("settings", self.settings), ("layout", self.layout),
+                                ("fragment_cache", self.fragment_cache), ("inventory", self.inventory),
+                                ("output_dir", self.output_dir)):
+                if value is not None:
+                    set_job_value(name, value)
+            if not self.record_new:
+                set_job_value("preview", True)
+            yield
+
+class PostarError(Exception):
+    """A job that can't be rendered: bad arguments, missing folders, a failed upload."""
+
+class Postar:
+    """
+    Renders posts with one RenderContext. Methods take a job and keyword
+    options, which are added to (and win over) the job's own.
+
+    - render(job) -> (html, summary): the post as a string; nothing is
+      written and no New markers are recorded
+    - preview(job) -> iterator of (html, summary): render() right away,
+      with placeholders for what isn't known yet, then again as the
+      background work fills them in (summary["final"] on the last one)
+    - write(job) -> summary: what the CLI does (output files, New markers)
+    - validate(job) -> list of problems, found without rendering
+
+    Each takes cancel=CancelToken() too; a cancelled call raises Cancelled.
+    Failures raise PostarError.
+    """
+
+    def __init__(self, settings: dict = None, context: RenderContext = None, **context_options):
+        self.context = context or RenderContext(settings=settings, **context_options)
+        if self.context.settings is None:
+            # The settings file's, loaded once for the whole process
+            ensure_settings()
+        self.parser = build_parser()
+        self.parser.error = self._parser_error
+
+    @staticmethod
+    def _parser_error(message):
+        raise PostarError(f"invalid arguments: {message}")
+
+    def args(self, job=None, **options) -> argparse.Namespace:
+        """Parse a job (and extra options) into the CLI's arguments."""
+        try:
+            _, argv = job_argv(self.parser, job if job is not None else [], {})
+            argv += options_to_argv(self.parser, options)
+        except ValueError as e:
+            raise PostarError(str(e)) from None
+        return self.parser.parse_args(argv)
+
+    def _call(self, fn, args, cancel=None):
+        with self.context.scope(cancel):
+            try:
+                return fn(args)
+            except SystemExit as e:
+                # sys.exit("message") inside a post
+                raise PostarError(str(e.code)) from None
+            finally:
+                save_hash_cache()
+                save_mal_index()
+
+    def render(self, job=None, cancel: CancelToken = None, **options) -> tuple[str, dict]:
+        return self._call(preview_post, self.args(job, **options), cancel)
+
+    def preview(self, job=None, cancel: CancelToken = None, **options):
+        updates = progressive_preview(self.args(job, **options))
+        try:
+            while True:
+                # The context applies while each version is rendered, not in between
+                with self.context.scope(cancel):
+                    try:
+                        update = next(updates)
+                    except StopIteration:
+                        return
+                    except SystemExit as e:
+                        raise PostarError(str(e.code)) from None
+                yield update
+        finally:
+            updates.close()
+            save_hash_cache()
+            save_mal_index()
+
+    def write(self, job=None, cancel: CancelToken = None, **options) -> dict:
+        return self._call(run_batch_post, self.args(job, **options), cancel)
+
+    def validate(self, job=None, cancel: CancelToken = None, **options) -> list[str]:
+        try:
+            args = self.args(job, **options)
+        except PostarError as e:
+            return [str(e)]
+        return self._call(validate_post, args, cancel)
@@ -0,0 +1,538 @@
+"""
+bucket.py
+
+Minimal S3-compatible client (Backblaze B2, MinIO, ...), a remote
+inventory that lets postar build posts from a bucket listing instead of
+local files, and a streaming uploader that hashes files while pushing them.
+"""
+
+import base64
+import datetime
+import hashlib
+import hmac
+import json
+import os
+import re
+import threading
+import time
+import xml.etree.ElementTree as ET
+import zlib
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import PurePosixPath
+from urllib.parse import quote, urlsplit, unquote
+
+import requests
+
+S3_NS = "{http://s3.amazonaws.com/doc/2006-03-01/}"
+MEDIA_EXTS = (".mkv", ".rar", ".zip")
+
+def _write_text_atomic(path, text: str):
+    """Written to a temporary file and renamed, so a reader or a crash never sees half a file."""
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+# ----------------------
+# Request signing (AWS Signature Version 4)
+# ----------------------
+def _hmac(key: bytes, msg: str) -> bytes:
+    return hmac.new(key, msg.encode("utf-8"), hashlib.sha256).digest()
+
+def _signing_key(secret: str, datestamp: str, region: str) -> bytes:
+    k_date = _hmac(("AWS4" + secret).encode("utf-8"), datestamp)
+    k_region = _hmac(k_date, region)
+    k_service = _hmac(k_region, "s3")
+    return _hmac(k_service, "aws4_request")
+
+def region_from_endpoint(endpoint: str) -> str:
+    """s3.us-west-004.backblazeb2.com -> us-west-004, anything else -> us-east-1."""
+    m = re.search(r's3[.-]([a-z0-9-]+)\.', urlsplit(endpoint).netloc)
+    return m.group(1) if m else "us-east-1"
+
+# ----------------------
+# S3 client
+# ----------------------
+class S3Error(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+
+class S3Client:
+    """Path-style S3 client signed with SigV4. Thread-safe; shares one pooled session."""
+
+    def __init__(self, endpoint: str, bucket: str, key_id: str, secret_key: str, region: str = "", pool_size: int = 16):
+        parts = urlsplit(endpoint.rstrip("/"))
+        self.scheme = parts.scheme or "https"
+        self.host = parts.netloc
+        self.base_path = parts.path  # non-empty for stand-ins mounted below a path
+        self.bucket = bucket
+        self.key_id = key_id
+        self.secret_key = secret_key
+        self.region = region or region_from_endpoint(endpoint)
+
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def request(self, method: str, key: str = "", params: dict = None, headers: dict = None, data=b"", stream=False, unsigned_payload=False):
+        params = params or {}
+        headers = dict(headers or {})
+
+        canonical_uri = quote(f"{self.base_path}/{self.bucket}" + (f"/{key}" if key else ""), safe="/~")
+        canonical_query = "&".join(
+            f"{quote(str(k), safe='~')}={quote(str(v), safe='~')}" for k, v in sorted(params.items())
+        )
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        datestamp = now.strftime("%Y%m%d")
+        # Large bodies are sent unsigned (integrity comes from Content-MD5) to avoid hashing them twice
+        payload_hash = "UNSIGNED-PAYLOAD" if unsigned_payload else hashlib.sha256(data).hexdigest()
+
+        headers["x-amz-date"] = amz_date
+        headers["x-amz-content-sha256"] = payload_hash
+        signed = {"host": self.host}
+        signed.update({k.lower(): str(v).strip() for k, v in headers.items() if k.lower().startswith("x-amz-") or k.lower() == "content-md5"})
+        signed_names = ";".join(sorted(signed))
+        canonical_headers = "".join(f"{k}:{signed[k]}\n" for k in sorted(signed))
+
+        canonical_request = "\n".join([
+            method, canonical_uri, canonical_query, canonical_headers, signed_names, payload_hash
+        ])
+        scope = f"{datestamp}/{self.region}/s3/aws4_request"
+        string_to_sign = "\n".join([
+            "AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical_request.encode("utf-8")).hexdigest()
+        ])
+        signature = hmac.new(
+            _signing_key(self.secret_key, datestamp, self.region), string_to_sign.encode("utf-8"), hashlib.sha256
+        ).hexdigest()
+        headers["Authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self.key_id}/{scope}, "
+            f"SignedHeaders={signed_names}, Signature={signature}"
+        )
+
+        url = f"{self.scheme}://{self.host}{canonical_uri}" + (f"?{canonical_query}" if canonical_query else "")
+        r = self.session.request(method, url, headers=headers, data=data, stream=stream, timeout=60)
+        if r.status_code >= 400:
+            raise S3Error(r.status_code, r.text[:200])
+        return r
+
+    def list_objects(self, prefix: str = "", delimiter: str = "", page_size: int = 1000) -> tuple[list[dict], list[str]]:
+        """
+        ListObjectsV2 with pagination (page_size keys per request). Returns
+        (objects, common_prefixes) where objects are {"key", "size", "etag"} dicts.
+        """
+        objects, prefixes = [], []
+        token = None
+
+        while True:
+            params = {"list-type": "2", "prefix": prefix, "max-keys": str(page_size)}
+            if delimiter:
+                params["delimiter"] = delimiter
+            if token:
+                params["continuation-token"] = token
+
+            root = ET.fromstring(self.request("GET", params=params).content)
+            for c in root.iter(f"{S3_NS}Contents"):
+                objects.append({
+                    "key": c.findtext(f"{S3_NS}Key"),
+                    "size": int(c.findtext(f"{S3_NS}Size") or 0),
+                    "etag": (c.findtext(f"{S3_NS}ETag") or "").strip('"')
+                })
+            for p in root.iter(f"{S3_NS}CommonPrefixes"):
+                prefixes.append(p.findtext(f"{S3_NS}Prefix"))
+
+            if root.findtext(f"{S3_NS}IsTruncated") != "true":
+                break
+            token = root.findtext(f"{S3_NS}NextContinuationToken")
+
+        return objects, prefixes
+
+    def head_object(self, key: str) -> dict:
+        """Return {"size", "etag", "metadata"} for an object (metadata without the x-amz-meta- prefix)."""
+        r = self.request("HEAD", key)
+        return {
+            "size": int(r.headers.get("Content-Length", 0)),
+            "etag": r.headers.get("ETag", "").strip('"'),
+            "metadata": {
+                k[len("x-amz-meta-"):].lower(): v
+                for k, v in r.headers.items() if k.lower().startswith("x-amz-meta-")
+            }
+        }
+
+    # ---- Uploads ----
+    @staticmethod
+    def _meta_headers(metadata: dict) -> dict:
+        return {f"x-amz-meta-{k}": str(v) for k, v in (metadata or {}).items()}
+
+    def put_object(self, key: str, data: bytes, metadata: dict = None) -> str:
+        headers = self._meta_headers(metadata)
+        headers["Content-MD5"] = base64.b64encode(hashlib.md5(data).digest()).decode("ascii")
+        return self.request("PUT", key, headers=headers, data=data, unsigned_payload=True).headers.get("ETag", "").strip('"')
+
+    def create_multipart_upload(self, key: str, metadata: dict = None) -> str:
+        r = self.request("POST", key, params={"uploads": ""}, headers=self._meta_headers(metadata))
+        return ET.fromstring(r.content).findtext(f"{S3_NS}UploadId")
+
+    def upload_part(self, key: str, upload_id: str, part_number: int, data: bytes) -> str:
+        headers = {"Content-MD5": base64.b64encode(hashlib.md5(data).digest()).decode("ascii")}
+        r = self.request(
+            "PUT", key,
+            params={"partNumber": str(part_number), "uploadId": upload_id},
+            headers=headers,
+            data=data,
+            unsigned_payload=True
+        )
+        return r.headers.get("ETag", "").strip('"')
+
+    def complete_multipart_upload(self, key: str, upload_id: str, parts: dict) -> str:
+        body = "".join(
+            f'<Part><PartNumber>{n}</PartNumber><ETag>"{parts[n]}"</ETag></Part>' for n in sorted(parts)
+        )
+        data = f"<CompleteMultipartUpload>{body}</CompleteMultipartUpload>".encode("utf-8")
+        r = self.request("POST", key, params={"uploadId": upload_id}, data=data)
+        return (ET.fromstring(r.content).findtext(f"{S3_NS}ETag") or "").strip('"')
+
+    def abort_multipart_upload(self, key: str, upload_id: str):
+        self.request("DELETE", key, params={"uploadId": upload_id})
+
+    def replace_metadata(self, key: str, metadata: dict):
+        """Server-side copy of an object onto itself with new metadata (objects up to 5 GB)."""
+        headers = self._meta_headers(metadata)
+        headers["x-amz-copy-source"] = quote(f"/{self.bucket}/{key}", safe="/~")
+        headers["x-amz-metadata-directive"] = "REPLACE"
+        self.request("PUT", key, headers=headers)
+
+# ----------------------
+# Bucket location from B2 URLs
+# ----------------------
+def bucket_location(base_url: str, bucket: str = "") -> tuple[str, str]:
+    """
+    Work out (bucket, key_prefix) for a public download base URL.
+
+    - B2 friendly URLs: https://f005.backblazeb2.com/file/<bucket>/<prefix>/
+    - Otherwise the configured bucket is located in the path, or the whole
+      path is used as the prefix (custom domains pointing at the bucket).
+    """
+    path = unquote(urlsplit(base_url).path).lstrip("/")
+    parts = path.split("/")
+
+    if len(parts) >= 2 and parts[0] == "file":
+        return parts[1], "/".join(parts[2:])
+
+    if bucket and bucket in parts:
+        return bucket, "/".join(parts[parts.index(bucket) + 1:])
+
+    return bucket, path
+
+# ----------------------
+# Remote inventory
+# ----------------------
+class RemoteMediaFile:
+    __slots__ = ("name", "size", "path", "key", "etag", "version")
+
+    def __init__(self, name, size, key, etag):
+        self.name = name
+        self.size = size
+        self.path = None  # not available locally
+        self.key = key
+        self.etag = etag
+        self.version = etag  # changes whenever the object does
+
+class RemoteInventory:
+    """
+    Inventory backend that reads folder contents from a bucket listing.
+
+    Listings are fetched concurrently (one ListObjectsV2 pager per folder)
+    and cached in cache_file for listing_ttl seconds. CRC32 values stored as
+    x-amz-meta-crc32 object metadata are cached by ETag, so an object is only
+    HEADed again after it changes.
+    """
+
+    def __init__(self, client: S3Client, shows_prefix: str, torrents_prefix: str | None, cache_file=None, listing_ttl: int = 600, concurrency: int = 8):
+        self.client = client
+        self.shows_prefix = shows_prefix.rstrip("/") + "/" if shows_prefix else ""
+        # None when the torrents live somewhere this client can't list
+        self.torrents_prefix = (torrents_prefix.rstrip("/") + "/" if torrents_prefix else "") if torrents_prefix is not None else None
+        self.cache_file = cache_file
+        self.listing_ttl = listing_ttl
+        self.concurrency = concurrency
+        self.lock = threading.Lock()
+        self.cache = {"listings": {}, "hashes": {}}
+        self.torrents = None
+
+        if cache_file and cache_file.exists():
+            try:
+                self.cache.update(json.loads(cache_file.read_text(encoding="utf-8")))
+            except Exception:
+                pass
+
+    def save_cache(self):
+        if not self.cache_file:
+            return
+        with self.lock:
+            text = json.dumps(self.cache, indent=2)
+        try:
+            _write_text_atomic(self.cache_file, text)
+        except Exception as e:
+            print(f"[Bucket] Warning: could not save bucket cache ({e})")
+
+    # ---- Listings ----
+    def _listing(self, prefix: str, force=False) -> list[dict]:
+        with self.lock:
+            cached = self.cache["listings"].get(prefix)
+        if cached and not force and time.time() - cached["time"] < self.listing_ttl:
+            return cached["objects"]
+
+        objects, _ = self.client.list_objects(prefix)
+        with self.lock:
+            self.cache["listings"][prefix] = {"time": time.time(), "objects": objects}
+        return objects
+
+    def prefetch(self, folder_names, force=False):
+        """List every folder (and the torrents prefix) concurrently."""
+        prefixes = [self.shows_prefix + name.strip("/") + "/" for name in folder_names]
+        if self.torrents_prefix is not None:
+            prefixes.append(self.torrents_prefix)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="bucket-list") as pool:
+            listings = dict(zip(prefixes, pool.map(lambda p: self._listing(p, force), prefixes)))
+
+        if self.torrents_prefix is not None:
+            self.torrents = {
+                o["key"][len(self.torrents_prefix):]
+                for o in listings[self.torrents_prefix] if o["key"].endswith(".torrent")
+            }
+        self.save_cache()
+
+    def discover(self, name: str) -> list[PurePosixPath]:
+        """Remote equivalent of discover_media_folders(): folders under *name* holding media."""
+        prefix = self.shows_prefix + name.strip("/") + "/"
+        found = set()
+        for o in self._listing(prefix):
+            rel = PurePosixPath(o["key"][len(self.shows_prefix):])
+            if rel.suffix.lower() in MEDIA_EXTS:
+                found.add(rel.parent)
+        return sorted(found)
+
+    # ---- Inventory interface ----
+    def _objects(self, folder) -> list[dict]:
+        return self._listing(self.shows_prefix + str(folder).strip("/") + "/")
+
+    def exists(self, folder) -> bool:
+        return bool(str(folder).strip("./")) and bool(self._objects(folder))
+
+    def list_media_files(self, folder) -> list[RemoteMediaFile]:
+        prefix = self.shows_prefix + str(folder).strip("/") + "/"
+        files = []
+        for o in self._objects(folder):
+            name = o["key"][len(prefix):]
+            if "/" not in name and PurePosixPath(name).suffix.lower() in MEDIA_EXTS:
+                files.append(RemoteMediaFile(name, o["size"], o["key"], o["etag"]))
+        return files
+
+    def mkv_names(self, folder) -> list[str]:
+        return sorted((f.name for f in self.list_media_files(folder) if f.name.lower().endswith(".mkv")), key=str.lower)
+
+    def total_bytes(self, folder) -> int:
+        return sum(o["size"] for o in self._objects(folder))
+
+    def has_torrent(self, folder) -> bool:
+        if self.torrents is None:
+            return True  # unknown, don't warn
+        return f"{PurePosixPath(str(folder)).name}.torrent" in self.torrents
+
+    def crc32(self, folder, media_file: RemoteMediaFile) -> str | None:
+        """Stored CRC32 from object metadata, cached by ETag."""
+        with self.lock:
+            cached = self.cache["hashes"].get(media_file.key)
+        if cached and cached.get("etag") == media_file.etag:
+            return cached.get("crc32")
+
+        try:
+            meta = self.client.head_object(media_file.key)["metadata"]
+        except Exception as e:
+            print(f"[Bucket] Could not read metadata for {media_file.key}: {e}")
+            return None
+
+        crc = (meta.get("crc32") or "").upper() or None
+        with self.lock:
+            self.cache["hashes"][media_file.key] = {
+                "etag": media_file.etag,
+                "crc32": crc,
+                "sha1": meta.get("large_file_sha1") or meta.get("sha1")
+            }
+        return crc
+
+    def known_crc32(self, folder, media_file: RemoteMediaFile) -> tuple[bool, str | None]:
+        """(known, crc32) from the cache only; known is False when crc32() would have to ask the bucket."""
+        with self.lock:
+            cached = self.cache["hashes"].get(media_file.key)
+        if cached and cached.get("etag") == media_file.etag:
+            return True, cached.get("crc32")
+        return False, None
+
+    def encoding_info(self, folder):
+        # MediaInfo needs the file itself
+        print(f"[Bucket] {PurePosixPath(str(folder)).name}: MediaInfo can't be read from the bucket, "
+              f"the encoding table will show Unknown (build the post from local folders for it)")
+        return None
+
+# ----------------------
+# Streaming upload
+# ----------------------
+MB = 1024 * 1024
+UPLOAD_PART_SIZE = 64 * MB
+UPLOAD_MAX_INFLIGHT = 4       # parts in flight per file (bounds memory to inflight * part size)
+UPLOAD_PART_RETRIES = 3
+MAX_COPY_SIZE = 5 * 1024 * MB  # CopyObject limit for writing hashes back as metadata
+
+class UploadState:
+    """
+    Resumable multipart upload state, saved atomically as JSON after every
+    finished part. Entries are keyed by object key and only reused while the
+    local file's size, mtime and the part size are unchanged.
+    """
+
+    def __init__(self, state_file):
+        self.state_file = state_file
+        self.lock = threading.Lock()
+        self.data = {}
+        if state_file and state_file.exists():
+            try:
+                self.data = json.loads(state_file.read_text(encoding="utf-8"))
+            except Exception:
+                self.data = {}
+
+    def _save(self):
+        if self.state_file:
+            _write_text_atomic(self.state_file, json.dumps(self.data, indent=2))
+
+    def get(self, key: str, fingerprint: dict) -> dict | None:
+        with self.lock:
+            entry = self.data.get(key)
+            if entry and all(entry.get(k) == v for k, v in fingerprint.items()):
+                return entry
+            return None
+
+    def stale_upload_id(self, key: str) -> str | None:
+        """Upload id of an unfinished upload of *key* that can't be resumed (get() returned None)."""
+        with self.lock:
+            return (self.data.get(key) or {}).get("upload_id")
+
+    def start(self, key: str, fingerprint: dict, upload_id: str) -> dict:
+        with self.lock:
+            entry = dict(fingerprint, upload_id=upload_id, parts={})
+            self.data[key] = entry
+            self._save()
+            return entry
+
+    def part_done(self, key: str, part_number: int, etag: str):
+        with self.lock:
+            self.data[key]["parts"][str(part_number)] = etag
+            self._save()
+
+    def finish(self, key: str):
+        with self.lock:
+            self.data.pop(key, None)
+            self._save()
+
+def _upload_part_with_retry(client: S3Client, key: str, upload_id: str, part_number: int, data: bytes) -> str:
+    for attempt in range(1, UPLOAD_PART_RETRIES + 1):
+        try:
+            return client.upload_part(key, upload_id, part_number, data)
+        except Exception as e:
+            if attempt == UPLOAD_PART_RETRIES:
+                raise
+            print(f"[Upload] Part {part_number} of {key} failed ({e}), retrying...")
+            time.sleep(attempt)
+
+def upload_file(client: S3Client, path, key: str, state: UploadState, part_size: int = UPLOAD_PART_SIZE, max_inflight: int = UPLOAD_MAX_INFLIGHT) -> dict:
+    """
+    Upload *path* to *key* with a single read of the file.
+
+    Each chunk is fed to the CRC32 and SHA-1 digests and handed to the part
+    uploader at the same time; up to max_inflight parts upload in parallel.
+    Finished parts are recorded in *state*, so an interrupted upload resumes
+    without re-sending them (resumed parts are still read once for hashing);
+    if the file has changed since, the earlier upload is aborted instead.
+    Returns {"size", "crc32", "sha1"}.
+    """
+    st = path.stat()
+    crc = 0
+    sha1 = hashlib.sha1()
+
+    # ---- Small files: one PUT with the hashes as metadata ----
+    if st.st_size <= part_size:
+        with open(path, "rb") as f:
+            data = f.read()
+        crc = zlib.crc32(data)
+        sha1.update(data)
+        result = {"size": st.st_size, "crc32": f"{crc & 0xffffffff:08X}", "sha1": sha1.hexdigest()}
+        client.put_object(key, data, metadata={"crc32": result["crc32"], "sha1": result["sha1"]})
+        return result
+
+    # ---- Large files: multipart ----
+    fingerprint = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "part_size": part_size}
+    entry = state.get(key, fingerprint)
+    if entry:
+        print(f"[Upload] Resuming {key} ({len(entry['parts'])} part(s) already uploaded)")
+    else:
+        stale = state.stale_upload_id(key)
+        if stale:
+            # The file changed since: its parts are no use, and they'd be billed until aborted
+            try:
+                client.abort_multipart_upload(key, stale)
+            except S3Error as e:
+                print(f"[Upload] Could not abort the earlier upload of {key}: {e}")
+        entry = state.start(key, fingerprint, client.create_multipart_upload(key))
+    upload_id = entry["upload_id"]
+    parts = {int(n): etag for n, etag in entry["parts"].items()}
+
+    pool = ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix="upload-part")
+    pending = {}
+
+    def collect(done):
+        for future in done:
+            n = pending.pop(future)
+            parts[n] = future.result()
+            state.part_done(key, n, parts[n])
+
+    try:
+        with open(path, "rb") as f:
+            for n, chunk in enumerate(iter(lambda: f.read(part_size), b""), 1):
+                crc = zlib.crc32(chunk, crc)
+                sha1.update(chunk)
+                if n in parts:
+                    continue
+
+                # Back-pressure: never hold more than max_inflight parts in memory
+                while len(pending) >= max_inflight:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+
+                pending[pool.submit(_upload_part_with_retry, client, key, upload_id, n, chunk)] = n
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+    finally:
+        pool.shutdown(wait=True)
+
+    client.complete_multipart_upload(key, upload_id, parts)
+    state.finish(key)
+
+    result = {"size": st.st_size, "crc32": f"{crc & 0xffffffff:08X}", "sha1": sha1.hexdigest()}
+
+    # Hashes are only known once the last byte is read; store them as metadata
+    if st.st_size <= MAX_COPY_SIZE:
+        try:
+            client.replace_metadata(key, {"crc32": result["crc32"], "large_file_sha1": result["sha1"]})
+        except Exception as e:
+            print(f"[Upload] Could not store hashes on {key}: {e}")
+
+    return result
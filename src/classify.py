@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+classify.py
+
+Filename classification for the episode tables.
+
+classify_filename() works out everything the tables need from a media
+file's name — category (episode, op/ed, ova/ona/oad/sp, extras, dash),
+label, episode number, version suffix, series name and the CRC32 tag — with
+precompiled patterns:
+
+- one scan finds every OP/ED, OVA/ONA/OAD/SP and Movie tag in the name,
+  and the category is picked from what it found (same precedence as
+  always: OP/ED, OVA, ONA, OAD, SP, extras, movie, dash label, episode)
+- the label/episode extractors then run only for the category picked
+- results are memoized per name, so the same file is classified once per
+  process however many posts or jobs list it
+
+The results match the per-check regexes build_quality_table() used before
+exactly; CLASSIFY_CORPUS_FILE holds the golden corpus they're held to.
+Episode wraps a listed media file with its classification and a sort key
+computed once; sorted_episodes() gives a folder's table order.
+
+Run this file to check the corpus:
+
+    python classify.py [corpus.tsv]
+"""
+
+import re
+import sys
+from pathlib import Path
+
+CLASSIFY_CORPUS_FILE = Path(__file__).with_name("classify_corpus.tsv")
+CLASSIFY_MEMO_MAX_ENTRIES = 200_000
+
+# ----------------------
+# Patterns
+# ----------------------
+# All category tags in one alternation. No two branches can match at the
+# same position and no match swallows the start of another tag, so a single
+# finditer() sees every tag the old one-regex-per-check code would have.
+# The "not after a letter/digit" check comes after each tag's letters so the
+# engine can skip straight to candidate letters. ASCII names are scanned
+# lowercased without IGNORECASE, which is cheaper and exact: no non-ASCII
+# character folds to a tag letter.
+_TAGS_PATTERN = (
+    r'(?:'
+    r'(?:op|ed)(?<![a-z0-9]..)[ _-]?\d{1,2}'
+    r'|(?:ova|ona|oad)(?<![a-z0-9]...)(?:[ _\-]*?\d{1,3})?'
+    r'|sp(?<![a-z0-9]..)(?:[ _\-]*?\d{1,3})?'
+    r'|movie(?<![a-z0-9].....)'
+    r')(?![a-z0-9])'
+)
+_TAGS = re.compile(_TAGS_PATTERN, re.IGNORECASE)
+_TAGS_ASCII = re.compile(_TAGS_PATTERN)
+_SPECIAL_ORDER = ("OVA", "ONA", "OAD", "SP")
+
+_OP_ED_LABEL = re.compile(r'(OP|ED)[ _-]?\d{1,2}', re.IGNORECASE)
+_SPECIAL_LABEL = re.compile(
+    r'_-_(?P<label>'
+    r'(?P<tag>OVA|ONA|OAD|SP)'
+    r'(?:[ _\-]*\d{1,3}(?:\.\d)?)?'
+    r'(?:_[^()]+)?'
+    r')',
+    re.IGNORECASE
+)
+_MOVIE_LABEL = re.compile(r'-_\s*(Movie(?:[ _\-]?\d{1,2}(?:\.\d)?)?(?:_[^_()]+)*)', re.IGNORECASE)
+_DASH_LABEL = re.compile(r'-_([A-Za-z0-9_]*[A-Za-z][A-Za-z0-9_]*)(?=_\(|$)')
+
+_PARENS = re.compile(r'\([^\)]*\)')
+_NUMBER = re.compile(r'(\d{1,4})(v\d)?')
+_VERSION = re.compile(r'(\d{1,4})(v\d{1,4})', re.IGNORECASE)
+_CRC = re.compile(r'\[([0-9A-Fa-f]{8})\]')
+_SERIES_END = re.compile(r'_-\s*\d{1,3}')
+
+# ----------------------
+# Field extractors
+# ----------------------
+def find_episode_number(filename: str):
+    """
+    Extract the episode number from the filename.
+    Ignores series numbering, resolution numbers (720/1080), CRC hashes,
+    release group tags, and properly handles v1/v2 suffixes.
+    """
+    ignore_numbers = {720, 1080}
+
+    # Remove all parentheses blocks (CRC, resolution, release group)
+    filename_clean = _PARENS.sub('', filename) if '(' in filename else filename
+
+    # Focus on part after the last dash
+    last_dash_index = filename_clean.rfind('-')
+    search_str = filename_clean[last_dash_index + 1:] if last_dash_index != -1 else filename_clean
+
+    # Search for first number (episode) with optional v1/v2
+    match = _NUMBER.search(search_str)
+    if match:
+        val = int(match.group(1))
+        if val not in ignore_numbers and val < 10000:
+            return val
+
+    # Fallback: last valid number in the whole filename
+    matches = _NUMBER.findall(filename_clean)
+    for number_str, _ in reversed(matches):
+        val = int(number_str)
+        if val not in ignore_numbers and val < 10000:
+            return val
+
+    return None
+
+def extract_version_suffix(name: str):
+    # Matches 01v2, 05v3, 12v10 etc.
+    m = _VERSION.search(name)
+    return m.group(2).lower() if m else ""
+
+def extract_crc_from_filename(fname: str) -> str | None:
+    """
+    Match CRC inside brackets: [A1B2C3D4] or [a1b2c3d4]
+    """
+    m = _CRC.search(fname) if '[' in fname else None
+    return m.group(1).upper() if m else None   # <-- normalize to uppercase
+
+def extract_special_label(name: str):
+    """OVA / ONA / OAD / SP label, only when it appears after the '_-_' separator."""
+    m = _SPECIAL_LABEL.search(name)
+    return m.group("label").rstrip('_') if m else None
+
+def extract_movie_label(name: str):
+    """Full movie label, including decimals: Movie_08.5_vs_Detective_Conan_Special"""
+    m = _MOVIE_LABEL.search(name)
+    return m.group(1).rstrip('_') if m else None
+
+def extract_dash_label(name: str):
+    """Text label after '-_' (NCOP1, Menu). Anything starting with a digit is an episode (01, 01v2, 24a)."""
+    m = _DASH_LABEL.search(name) if '-_' in name else None
+    if not m:
+        return None
+    label = m.group(1).strip()
+    return None if label[:1].isdigit() else label
+
+def extract_series_name(name: str) -> str:
+    """Everything before the '_- NN' episode separator."""
+    m = _SERIES_END.search(name) if '_-' in name else None
+    return (name[:m.start()] if m else name).strip()
+
+# ----------------------
+# Classifier
+# ----------------------
+class FileClass:
+    """What classify_filename() found in one name. Shared between callers, so treat it as read-only."""
+    __slots__ = ("category", "label", "episode", "version", "series", "crc")
+
+    def __init__(self, category, label, episode=None, version="", series="", crc=None):
+        self.category = category
+        self.label = label
+        self.episode = episode
+        self.version = version
+        self.series = series
+        self.crc = crc
+
+    def as_tuple(self) -> tuple:
+        return (self.category, self.label, self.episode, self.version, self.series, self.crc)
+
+def _classify(fname: str) -> FileClass:
+    lowered = fname.lower()
+    op_ed = movie = False
+    specials = set()
+    tags = _TAGS_ASCII.finditer(lowered) if fname.isascii() else _TAGS.finditer(fname)
+    for m in tags:
+        tag = m.group().lower()
+        if tag[:2] in ("op", "ed"):
+            op_ed = True
+            break
+        if tag[0] == "m":
+            movie = True
+        else:
+            specials.add(tag[:3].upper() if tag[0] == "o" else "SP")
+
+    episode = None
+    version = ""
+    if op_ed:
+        m = _OP_ED_LABEL.search(fname)
+        label = m.group(0).upper().replace("_", "").replace("-", "") if m else fname
+        category = "op" if label.startswith("OP") else "ed"
+    elif specials:
+        tag = next(t for t in _SPECIAL_ORDER if t in specials)
+        category = tag.lower()
+        label = extract_special_label(fname) or tag
+    elif "extras" in lowered:
+        category = "extras"
+        label = "Extras"
+    elif movie:
+        category = "dash"
+        label = extract_movie_label(fname) or "MOVIE"
+    else:
+        dash_label = extract_dash_label(fname)
+        if dash_label:
+            category = "dash"
+            label = dash_label.upper()
+        else:
+            episode = find_episode_number(fname)
+            if isinstance(episode, int):
+                category = "episode"
+                # Detect v2/v3/etc
+                version = extract_version_suffix(fname) if "v" in lowered else ""
+                label = f"{episode:02d}{version}"
+            else:
+                category = "extras"
+                label = fname
+
+    return FileClass(category, label, episode, version, extract_series_name(fname), extract_crc_from_filename(fname))
+
+_memo = {}
+
+def classify_filename(fname: str) -> FileClass:
+    result = _memo.get(fname)
+    if result is None:
+        if len(_memo) >= CLASSIFY_MEMO_MAX_ENTRIES:
+            _memo.clear()
+        result = _memo[fname] = _classify(fname)
+    return result
+
+# ----------------------
+# Episode records
+# ----------------------
+# Table order: episodes, specials, EDs, OPs, dash labels, extras
+CATEGORY_ORDER = {"episode": 0, "ova": 1, "ona": 1, "oad": 1, "sp": 1, "ed": 2, "op": 3, "dash": 4, "extras": 5}
+
+class Episode:
+    """
+    One media file of a folder as the tables see it. Built once per folder
+    listing and shared by the episode rows, the extra output formats and
+    the encoding summary. sort_key is worked out here, once: airing posts
+    group by series first, the rest sort episodes by number and everything
+    else by filename.
+    """
+    __slots__ = ("file", "name", "size", "category", "label", "episode", "series", "crc", "new", "sort_key")
+
+    def __init__(self, media_file, is_airing=False):
+        cls = classify_filename(media_file.name)
+        self.file = media_file
+        self.name = media_file.name
+        self.size = media_file.size
+        self.category = cls.category
+        self.label = cls.label
+        self.episode = cls.episode
+        self.series = cls.series
+        self.crc = cls.crc  # hashed lazily, only when the rows aren't cached
+        self.new = False
+
+        order = CATEGORY_ORDER.get(cls.category, 999)
+        if is_airing:
+            self.sort_key = (cls.series.lower(), order, cls.episode, self.name.lower())
+        elif cls.category == "episode":
+            self.sort_key = (order, cls.episode)
+        else:
+            self.sort_key = (order, self.name.lower())
+
+def sorted_episodes(media_files, is_airing=False) -> list[Episode]:
+    return sorted((Episode(f, is_airing) for f in media_files), key=lambda e: e.sort_key)
+
+# ----------------------
+# Golden corpus
+# ----------------------
+# One name per line: filename, category, label, episode, version, series, crc
+# separated by tabs; empty episode/crc columns stand for None.
+def _corpus_row(result: FileClass) -> list[str]:
+    return ["" if v is None else str(v) for v in result.as_tuple()]
+
+def verify_corpus(path: Path = CLASSIFY_CORPUS_FILE) -> list[str]:
+    """Classify every name in the corpus; returns a line per mismatch."""
+    problems = []
+    for lineno, line in enumerate(Path(path).read_text(encoding="utf-8").splitlines(), 1):
+        if not line or line.startswith("#"):
+            continue
+        fname, *expected = line.split("\t")
+        got = _corpus_row(_classify(fname))
+        if got != expected:
+            problems.append(f"{path}:{lineno}: {fname}\n    expected {expected}\n    got      {got}")
+    return problems
+
+if __name__ == "__main__":
+    corpus = Path(sys.argv[1]) if len(sys.argv) > 1 else CLASSIFY_CORPUS_FILE
+    problems = verify_corpus(corpus)
+    for problem in problems:
+        print(problem)
+    print(f"[Classify] {corpus.name}: {'FAILED, ' + str(len(problems)) + ' mismatch(es)' if problems else 'all names match'}")
+    sys.exit(1 if problems else 0)
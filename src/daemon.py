@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""
+daemon.py
+
+Long-running render server (--serve). Settings, the HTTP pools, the MAL
+lookups, hashes, compiled layouts and rendered fragments stay warm between
+requests, so a preview of a post whose files haven't changed only costs
+the render itself.
+
+Listens on a local TCP port (HOST:PORT, default 127.0.0.1:8731) or, where
+the platform has them, a Unix socket (any address containing a slash).
+Request bodies are JSON holding one job, written like a jobs file entry
+(see jobs.py): a command line string, a list of arguments or an object of
+options, sent with Content-Type: application/json.
+
+Web pages the user has open can reach a local port too, so the daemon
+refuses requests a browser would send on a page's behalf: POSTs with any
+other Content-Type (those need no CORS preflight), requests with an Origin
+that isn't local, and Host names other than localhost or an IP address
+(DNS rebinding).
+
+- GET  /health        status, uptime and queue counts
+- POST /render        render the post and return it without writing
+                      anything (New markers aren't recorded either);
+                      ?format=html answers with the bare post, ?write=1
+                      runs it like the CLI instead (output/, New markers);
+                      ?fast=1 answers right away, with placeholders for
+                      CRC32s, encoding info and synopses that aren't known
+                      yet (worked out in the background for next time);
+                      ?progressive=1 streams the fast preview and then
+                      each filled-in version as JSON lines, the last one
+                      with "final": true;
+                      ?session=KEY cancels the previous render with the
+                      same key (and its background work) if it's still
+                      going, for editors that render on every change
+                      (a cancelled render is answered with 409)
+- POST /validate      check the arguments, folders and layout without
+                      rendering ({"ok": ..., "errors": [...]})
+- POST /queue         add the job to the durable queue (202)
+- GET  /queue         every job in the queue and its status
+- GET  /queue/<id>    one job, with its checkpoints and log
+- POST /shutdown      stop the server
+
+The queue is the durable one in settings/postar_durable_queue.json (see
+jobqueue.py); the daemon runs it with --jobs workers unless another postar
+process already does. Jobs sharing a folder or an output file run in the
+order they were queued.
+"""
+
+import ipaddress
+import itertools
+import json
+import os
+import socket
+import socketserver
+import stat
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qs
+
+from helper import (Cancelled, CancelToken, get_fragment_cache, job_scope, save_hash_cache, save_mal_index, set_job_value,
+                    VERSION)
+from jobs import JobLog, job_argv, default_job_name
+from jobqueue import QueueRunner, QueueBusy, QueueFileError, STAGES
+
+DEFAULT_DAEMON_ADDRESS = "127.0.0.1:8731"
+CACHE_SAVE_INTERVAL = 30  # seconds between fragment cache saves
+MAX_REQUEST_BYTES = 1024 * 1024
+LOCAL_HOST_NAMES = {"localhost", "127.0.0.1", "::1"}
+
+class RequestError(Exception):
+    """A request the daemon can't act on; answered with *status*."""
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+# ----------------------
+# Service
+# ----------------------
+class PostarService:
+    """
+    What the handler calls. The postar side is passed in as callables so
+    this module doesn't import python_postar:
+
+    - build_parser() -> the CLI argument parser
+    - preview(args, placeholders) -> (html, summary): render without writing anything
+    - progressive(args) -> iterator of (html, summary): fast preview, filling in
+    - run(args) -> summary: run the post like the CLI does
+    - validate(args) -> list of problems
+    - resources(args) -> keys for ordering queued jobs (see jobs.py)
+    - queue, run_queued: the durable queue and its job function (jobqueue.py)
+    """
+
+    def __init__(self, build_parser, preview, run, validate, queue, run_queued, resources=None, workers=1,
+                 retries=None, retry_delay=None, progressive=None):
+        self.parser = build_parser()
+        self.parser.error = self._parser_error
+        self.preview_post = preview
+        self.progressive_preview = progressive
+        self.run_post = run
+        self.validate_post = validate
+        self.resources = resources
+        self.queue = queue
+        self.queue_options = {k: v for k, v in (("retries", retries), ("retry_delay", retry_delay)) if v is not None}
+        self.runner = QueueRunner(queue, build_parser(), run_queued, workers=workers)
+        self.runner_thread = None
+        self.log = JobLog(sys.stdout)
+        self.started = time.time()
+        self.stopping = threading.Event()
+        self.sessions = {}  # session key -> CancelToken of its latest render
+        self.sessions_lock = threading.Lock()
+
+    @staticmethod
+    def _parser_error(message):
+        raise RequestError(f"invalid arguments: {message}")
+
+    def parse(self, entry):
+        try:
+            name, argv = job_argv(self.parser, entry, {})
+        except ValueError as e:
+            raise RequestError(str(e)) from None
+        try:
+            args = self.parser.parse_args(argv)
+        except SystemExit:
+            raise RequestError("invalid arguments") from None
+        return name, argv, args
+
+    def health(self) -> dict:
+        counts = {}
+        for job in self.queue.jobs():
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {"status": "ok", "version": VERSION, "pid": os.getpid(), "uptime": round(time.time() - self.started, 1),
+                "queue_runner": self.runner_thread is not None, "jobs": counts}
+
+    def begin(self, session: str = None) -> CancelToken:
+        """
+        Cancel token for a new render. With a *session* key, the previous
+        render of that session is cancelled (a fast preview's background
+        work included): its result would be stale anyway.
+        """
+        token = CancelToken()
+        if session:
+            with self.sessions_lock:
+                previous = self.sessions.get(session)
+                self.sessions[session] = token
+            if previous:
+                previous.cancel("superseded by a newer render")
+        return token
+
+    def render(self, entry, write=False, fast=False, session=None):
+        _, _, args = self.parse(entry)
+        start = time.perf_counter()
+        result = {}
+        # A written post isn't cut short halfway (output files, New markers)
+        token = None if write else self.begin(session)
+
+        def work():
+            if write:
+                result["summary"] = self.run_post(args)
+                return
+            with job_scope():
+                set_job_value("cancel", token)
+                result["html"], result["summary"] = self.preview_post(args, placeholders=fast)
+
+        try:
+            log = self.log.capture(work)
+        except SystemExit as e:
+            raise RequestError(str(e.code), status=422) from None
+        except Cancelled as e:
+            raise RequestError(f"cancelled: {e}", status=409) from None
+        result.update(seconds=round(time.perf_counter() - start, 4), log=log)
+        return result
+
+    def render_progressive(self, entry, session=None):
+        """Yield one result per version of a filling-in fast preview (see render())."""
+        _, _, args = self.parse(entry)
+        if self.progressive_preview is None:
+            raise RequestError("progressive previews aren't available", status=501)
+        start = time.perf_counter()
+        token = self.begin(session)
+        updates = self.progressive_preview(args)
+        final = False
+        try:
+            while True:
+                result = {}
+
+                def step():
+                    with job_scope():
+                        set_job_value("cancel", token)
+                        result["html"], result["summary"] = next(updates)
+
+                try:
+                    log = self.log.capture(step)
+                except StopIteration:
+                    return
+                except SystemExit as e:
+                    yield {"error": str(e.code), "final": True}
+                    return
+                except Cancelled as e:
+                    yield {"error": f"cancelled: {e}", "cancelled": True, "final": True}
+                    return
+                final = result["summary"]["final"]
+                result.update(seconds=round(time.perf_counter() - start, 4), log=log, final=final)
+                yield result
+        finally:
+            if not final:
+                # Closed early (the client went away): stop the files being read too
+                token.cancel("the client went away")
+            updates.close()
+
+    def validate(self, entry) -> dict:
+        try:
+            _, _, args = self.parse(entry)
+        except RequestError as e:
+            return {"ok": False, "errors": [str(e)]}
+        errors = self.validate_post(args)
+        return {"ok": not errors, "errors": errors}
+
+    # ---- Queue ----
+    def start_queue(self):
+        """Run the durable queue in the background, unless another process already does."""
+        try:
+            self.runner.start()
+        except QueueBusy as e:
+            print(f"[Daemon] Not running the queue: {e}. Queued jobs are left to that process.")
+            return
+        except QueueFileError as e:
+            print(f"[Daemon] Not running the queue: {e}")
+            return
+        self.runner_thread = threading.Thread(target=self.runner.run_jobs, kwargs={"until_empty": False},
+                                              name="postar-queue", daemon=True)
+        self.runner_thread.start()
+
+    def submit(self, entry) -> dict:
+        name, argv, args = self.parse(entry)
+        keys = set(self.resources(args)) if self.resources else set()
+        job = self.queue.add(name or default_job_name(argv, 0), argv, keys, **self.queue_options)
+        self.runner.wakeup.set()
+        return self.describe(job["id"])
+
+    def describe(self, job_id: str, with_log=False) -> dict:
+        try:
+            job = self.queue.get(job_id)
+        except KeyError:
+            raise RequestError(f"no job {job_id}", status=404) from None
+        info = {"id": job["id"], "name": job["name"], "status": job["status"], "attempts": job["attempts"],
+                "stages": [s for s in STAGES if s in job["stages"]], "error": job["error"], "result": job["result"]}
+        if with_log:
+            info["argv"] = job["argv"]
+            info["log"] = job["log"]
+        return info
+
+    def jobs(self) -> dict:
+        return {"jobs": [self.describe(job["id"]) for job in self.queue.jobs()]}
+
+    # ---- Housekeeping ----
+    def save_caches(self):
+        get_fragment_cache().save()
+        save_hash_cache()
+        save_mal_index()
+
+    def autosave(self):
+        while not self.stopping.wait(CACHE_SAVE_INTERVAL):
+            self.save_caches()
+
+    def close(self):
+        self.stopping.set()
+        if self.runner_thread:
+            # A job cut short here is resumed from its last checkpoint next time
+            self.runner.stop()
+            self.runner_thread.join()
+        self.save_caches()
+
+# ----------------------
+# Request handler
+# ----------------------
+class DaemonHandler(BaseHTTPRequestHandler):
+    server_version = "Postar/" + VERSION
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def service(self) -> PostarService:
+        return self.server.service
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            sys.stderr.write("[Daemon] " + (fmt % args) + "\n")
+
+    def address_string(self):
+        # Unix socket peers have no address
+        return self.client_address[0] if self.client_address else "local"
+
+    def send_body(self, status: int, body: bytes, content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status: int, payload):
+        self.send_body(status, json.dumps(payload).encode("utf-8"))
+
+    def send_json_lines(self, status: int, payloads):
+        """Stream one JSON document per line (chunked), each as soon as it's ready."""
+        payloads = iter(payloads)
+        first = next(payloads)  # errors in the request itself still get a plain answer
+        self.send_response(status)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for payload in itertools.chain([first], payloads):
+                line = json.dumps(payload).encode("utf-8") + b"\n"
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client moved on (a newer edit); stop filling this one in
+            self.close_connection = True
+        finally:
+            payloads.close()
+
+    def read_entry(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_REQUEST_BYTES:
+            raise RequestError("request too large", status=413)
+        try:
+            return json.loads(self.rfile.read(length) or b"null")
+        except ValueError as e:
+            raise RequestError(f"body is not JSON: {e}") from None
+
+    def check_request(self, method: str):
+        origin = self.headers.get("Origin")
+        if origin is not None and _host_name(origin) not in LOCAL_HOST_NAMES:
+            raise RequestError(f"requests from {origin} aren't allowed", status=403)
+        host = self.headers.get("Host")
+        if self.server.check_host and host is not None and not _is_local_host(_host_name("//" + host)):
+            raise RequestError(f"requests for {host} aren't allowed", status=403)
+        content_type = self.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if method == "POST" and content_type != "application/json":
+            raise RequestError("POST bodies must be sent as application/json", status=415)
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def dispatch(self, method: str):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        parts = [p for p in url.path.split("/") if p]
+        try:
+            self.check_request(method)
+            if method == "GET" and parts == ["health"]:
+                return self.send_json(200, self.service.health())
+            if method == "GET" and parts == ["queue"]:
+                return self.send_json(200, self.service.jobs())
+            if method == "GET" and len(parts) == 2 and parts[0] == "queue":
+                return self.send_json(200, self.service.describe(parts[1], with_log=True))
+            if method == "POST" and parts == ["render"]:
+                def flag(name):
+                    return query.get(name, ["0"])[0] not in ("0", "", "false")
+                session = query.get("session", [""])[0] or None
+                if flag("progressive"):
+                    return self.send_json_lines(200, self.service.render_progressive(self.read_entry(), session=session))
+                result = self.service.render(self.read_entry(), write=flag("write"), fast=flag("fast"), session=session)
+                if query.get("format", [""])[0] == "html" and "html" in result:
+                    return self.send_body(200, result["html"].encode("utf-8"), "text/html; charset=utf-8")
+                return self.send_json(200, result)
+            if method == "POST" and parts == ["validate"]:
+                return self.send_json(200, self.service.validate(self.read_entry()))
+            if method == "POST" and parts == ["queue"]:
+                return self.send_json(202, self.service.submit(self.read_entry()))
+            if method == "POST" and parts == ["shutdown"]:
+                self.send_json(200, {"stopping": True})
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+            raise RequestError(f"no route for {method} {url.path}", status=404)
+        except RequestError as e:
+            self.send_json(e.status, {"error": str(e)})
+        except Exception as e:
+            self.send_json(500, {"error": f"{type(e).__name__}: {e}"})
+
+def _host_name(url: str) -> str | None:
+    """Host name of an Origin or "//" + Host header, without port or brackets."""
+    try:
+        return urlsplit(url).hostname
+    except ValueError:
+        return None
+
+def _is_local_host(name: str | None) -> bool:
+    """localhost or an IP address: names that DNS rebinding can't point at the daemon."""
+    if name in LOCAL_HOST_NAMES:
+        return True
+    try:
+        ipaddress.ip_address(name or "")
+    except ValueError:
+        return False
+    return True
+
+# ----------------------
+# Servers
+# ----------------------
+class DaemonServer(ThreadingHTTPServer):
+    daemon_threads = True
+    check_host = True
+
+    def __init__(self, address, service: PostarService, verbose=False):
+        super().__init__(address, DaemonHandler)
+        self.service = service
+        self.verbose = verbose
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+if hasattr(socket, "AF_UNIX") and hasattr(socketserver, "UnixStreamServer"):
+    class UnixDaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+        check_host = False  # browsers can't reach a Unix socket, and clients send any Host
+
+        def __init__(self, path: str, service: PostarService, verbose=False):
+            try:
+                if not stat.S_ISSOCK(os.lstat(path).st_mode):
+                    raise FileExistsError(f"{path} exists and isn't a socket")
+                os.unlink(path)  # left behind by a daemon that didn't stop cleanly
+            except FileNotFoundError:
+                pass
+            super().__init__(path, DaemonHandler)
+            self.service = service
+            self.verbose = verbose
+
+        @property
+        def url(self) -> str:
+            return f"unix:{self.server_address}"
+
+        def server_close(self):
+            super().server_close()
+            Path(self.server_address).unlink(missing_ok=True)
+else:
+    UnixDaemonServer = None
+
+def make_server(address: str, service: PostarService, verbose=False):
+    """HOST:PORT (or just PORT) for TCP, anything with a slash for a Unix socket."""
+    address = address or DEFAULT_DAEMON_ADDRESS
+    if "/" in address or "\\" in address:
+        if UnixDaemonServer is None:
+            raise ValueError("Unix sockets aren't available on this platform, use HOST:PORT")
+        return UnixDaemonServer(address, service, verbose=verbose)
+    host, _, port = address.rpartition(":")
+    return DaemonServer((host or "127.0.0.1", int(port)), service, verbose=verbose)
+
+def serve(address: str, service: PostarService, verbose=False):
+    """Serve until interrupted or POST /shutdown."""
+    try:
+        server = make_server(address, service, verbose=verbose)
+    except (OSError, ValueError) as e:
+        print(f"[Daemon] Can't listen on {address}: {e}")
+        return False
+
+    sys.stdout = service.log
+    threading.Thread(target=service.autosave, name="postar-autosave", daemon=True).start()
+    service.start_queue()
+    print(f"[Daemon] Listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        sys.stdout = service.log.stream
+        print("[Daemon] Stopped.")
+    return True
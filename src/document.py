@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+document.py
+
+Intermediate document tree for a generated post:
+
+    Post → Season → Pane → Table → Row
+
+The builders in python_postar.py assemble the tree once — encoding tables,
+the merged BD batch table and the quality panes are attached where they
+belong instead of being spliced into already rendered HTML — and render()
+writes it out in a single pass, so render time is linear in output size.
+
+Children are either nodes or plain strings (one or more pre-rendered lines).
+LazyLines children are rendered while the tree is written out instead.
+"""
+
+# ----------------------
+# Nodes
+# ----------------------
+class Node:
+    """Lines before the children, the children, lines after."""
+    __slots__ = ("head", "children", "tail")
+
+    def __init__(self, head=None, children=None, tail=None):
+        self.head = list(head or [])
+        self.children = list(children or [])
+        self.tail = list(tail or [])
+
+    def add(self, child):
+        self.children.append(child)
+        return child
+
+    def emit_head(self, out: list):
+        out.extend(self.head)
+
+    def emit(self, out: list):
+        self.emit_head(out)
+        for child in self.children:
+            if isinstance(child, str):
+                out.append(child)
+            else:
+                child.emit(out)
+        out.extend(self.tail)
+
+class Post(Node):
+    __slots__ = ()
+
+class Season(Node):
+    """
+    One show or BD season. sections holds its QualitySections in pane order
+    (1080p, 720p); batch_at is the child index the merged BD batch table is
+    inserted at (right above the BD toggle buttons). info carries the MAL
+    and cover data for the non-HTML outputs (see formats.py).
+    """
+    __slots__ = ("sections", "batch_at", "info")
+
+    def __init__(self, head=None, children=None, tail=None):
+        super().__init__(head, children, tail)
+        self.sections = []
+        self.batch_at = None
+        self.info = {}
+
+class Pane(Node):
+    """A <div> wrapper: BD quality pane or the show/hide episode toggle."""
+    __slots__ = ()
+
+class Table(Node):
+    """
+    A table; its children are rows.
+
+    prefix is HTML placed directly above the table (the encoding table). It
+    takes over the indentation of the table's opening tag, which is the
+    layout posts have always had.
+    """
+    __slots__ = ("prefix",)
+
+    def __init__(self, head=None, children=None, tail=None, prefix=None):
+        super().__init__(head, children, tail)
+        self.prefix = prefix
+
+    def emit_head(self, out: list):
+        if not (self.prefix and self.head):
+            return super().emit_head(out)
+        first = self.head[0]
+        opening = first.lstrip(" ")
+        out.append(first[:len(first) - len(opening)] + self.prefix)
+        out.append(opening)
+        out.extend(self.head[1:])
+
+class QualitySection(Node):
+    """
+    Batch torrent table followed by the episode table (inside its toggle
+    pane) for one folder. info describes the folder and batch torrent;
+    records() returns one dict per episode row. files holds the folder's
+    classify.Episode records in table order, for anything else that needs
+    the folder listing (the encoding table).
+    """
+    __slots__ = ("batch", "episodes", "info", "records", "files")
+
+    def __init__(self, batch: Table, episodes: Table, pane: Pane, info: dict = None, records=None, files=None):
+        super().__init__(children=[batch, pane])
+        self.batch = batch
+        self.episodes = episodes
+        self.info = info or {}
+        self.records = records or list
+        self.files = files
+
+    def media_files(self):
+        """The inventory's media files behind files (None if the section wasn't built from a listing)."""
+        return None if self.files is None else [e.file for e in self.files]
+
+    def detach_batch(self):
+        """Drop the batch table (BD seasons get one merged table). Its line stays behind empty."""
+        self.children[0] = ""
+        self.batch = None
+
+class Row:
+    """A table row rendered by a compiled layout template (see layout.py)."""
+    __slots__ = ("render", "fields")
+
+    def __init__(self, render, fields=None):
+        self.render = render
+        self.fields = fields or {}
+
+    def emit(self, out: list):
+        out.append(self.render(self.fields))
+
+class LazyLines:
+    """
+    Lines produced by an iterator while the tree is being written out, so
+    expensive ones (episode rows that need a CRC32) are built one at a time,
+    right before they're written. Can only be emitted once.
+    """
+    __slots__ = ("lines",)
+
+    def __init__(self, lines):
+        self.lines = lines
+
+    def emit(self, out: list):
+        for line in self.lines:
+            out.append(line)
+
+# ----------------------
+# Rendering
+# ----------------------
+STREAM_BUFFER_SIZE = 64 * 1024
+
+def render(node) -> str:
+    """Render a tree in one pass."""
+    out = []
+    node.emit(out)
+    return "\n".join(out)
+
+class StreamWriter:
+    """
+    Line sink for Node.emit() that writes straight to a text stream (file,
+    stdout, socket.makefile("w")) instead of collecting lines. Lines are
+    separated exactly like render() separates them.
+    """
+    __slots__ = ("stream", "started", "chars")
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.started = False
+        self.chars = 0
+
+    def append(self, line: str):
+        if self.started:
+            self.stream.write("\n")
+            self.chars += 1
+        self.started = True
+        self.stream.write(line)
+        self.chars += len(line)
+
+    def extend(self, lines):
+        for line in lines:
+            self.append(line)
+
+class CompactWriter(StreamWriter):
+    """
+    StreamWriter that minifies as it writes: indentation is stripped and
+    line breaks between two tags are dropped (breaks next to text, such as
+    synopsis paragraphs, are kept). *rewrites* are (regex, replacement)
+    pairs applied to every line. raw_chars counts what the regular output
+    would have been.
+    """
+    __slots__ = ("rewrites", "raw_chars", "last", "blanks")
+
+    def __init__(self, stream, rewrites=()):
+        super().__init__(stream)
+        self.rewrites = rewrites
+        self.raw_chars = 0
+        self.last = ""
+        self.blanks = 0
+
+    def append(self, chunk: str):
+        self.raw_chars += len(chunk) + (1 if self.raw_chars else 0)
+        for line in chunk.split("\n"):
+            line = line.strip()
+            if not line:
+                self.blanks += 1
+                continue
+            for pattern, replacement in self.rewrites:
+                line = pattern.sub(replacement, line)
+
+            if not self.started:
+                sep = ""
+                self.started = True
+            elif self.last.endswith(">") and line.startswith("<"):
+                sep = ""
+            else:
+                sep = "\n" * (self.blanks + 1)
+            self.blanks = 0
+            self.stream.write(sep)
+            self.stream.write(line)
+            self.chars += len(sep) + len(line)
+            self.last = line
+
+def write_stream(blocks, stream, sinks=(), writer=None) -> int:
+    """
+    Write top-level blocks (nodes or strings) to *stream* as they are
+    produced, flushing after each one so readers see them right away. Only
+    the block being written is held in memory. Each block is also handed
+    to every sink's add() (extra output formats). Pass *writer* to use a
+    different line sink (CompactWriter). Returns characters written.
+    """
+    writer = writer or StreamWriter(stream)
+    for block in blocks:
+        if isinstance(block, str):
+            writer.append(block)
+        else:
+            block.emit(writer)
+        stream.flush()
+        for sink in sinks:
+            sink.add(block)
+    return writer.chars
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+formats.py
+
+Extra outputs built from the same document tree as the HTML post:
+
+- json    manifest with MAL data, encoding info, batch torrents and every
+          episode (size, CRC32, direct and shortened links)
+- md      Markdown for Discord announcements
+- bbcode  BBCode for trackers/forums
+
+Writers are fed the post's top-level blocks by write_stream() as they are
+produced, so folder scans, hashing, MediaInfo and MAL lookups are done once
+for all outputs, and each season is written out as soon as it's built.
+"""
+
+import json
+import re
+
+from document import Season
+from helper import SPASTE_PREFIX, OUO_PREFIX, FC_LC_PREFIX, VERSION
+
+FORMAT_EXTENSIONS = {
+    "json": ".json",
+    "md": ".md",
+    "bbcode": ".bbcode.txt",
+}
+
+def shortened_links(url: str) -> list[tuple[str, str]]:
+    return [("Spaste", SPASTE_PREFIX + url), ("Ouo.io", OUO_PREFIX + url), ("Fc.lc", FC_LC_PREFIX + url)]
+
+# Text from MAL and file names is escaped, so it can't break or inject markup
+_MD_SPECIAL = re.compile(r"([\\`*_~|\[\]()<>#])")
+
+def md_escape(text) -> str:
+    text = _MD_SPECIAL.sub(r"\\\1", str(text))
+    # List markers and numbered lists at the start of a line
+    return re.sub(r"^([-+])", r"\\\1", re.sub(r"^(\d+)\.", r"\1\\.", text))
+
+def md_url(url: str) -> str:
+    return url.replace('(', '%28').replace(')', '%29')
+
+def md_link(name: str, url: str) -> str:
+    return f"[{md_escape(name)}]({md_url(url)})"
+
+def bb_escape(text) -> str:
+    # BBCode has no escape character; entities keep brackets from opening tags
+    return str(text).replace("[", "&#91;").replace("]", "&#93;")
+
+def bb_url(url: str) -> str:
+    return url.replace('[', '%5B').replace(']', '%5D')
+
+def bb_link(name: str, url: str) -> str:
+    return f"[url={bb_url(url)}]{bb_escape(name)}[/url]"
+
+def season_sections(season: Season):
+    """(info, records) for each quality the season actually has (a BD season may lack its 720p folder)."""
+    for section in season.sections:
+        if section.info.get("folder"):
+            yield section.info, section.records()
+
+# ----------------------
+# Writers
+# ----------------------
+class FormatWriter:
+    """Base writer: add() every top-level block, close() at the end."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def add(self, block):
+        if isinstance(block, Season):
+            self.write_season(block)
+            self.stream.flush()
+
+    def write_season(self, season: Season):
+        raise NotImplementedError
+
+    def close(self):
+        self.stream.flush()
+
+class JsonManifestWriter(FormatWriter):
+    """Streams {"generator": ..., "seasons": [...]} one season at a time."""
+
+    def __init__(self, stream):
+        super().__init__(stream)
+        self.count = 0
+        self.stream.write(f'{{\n  "generator": {json.dumps(f"python_postar v{VERSION}")},\n  "seasons": [')
+
+    def write_season(self, season: Season):
+        entry = dict(season.info)
+        entry["sections"] = []
+        for info, records in season_sections(season):
+            section = dict(info)
+            section["torrent_links"] = dict(shortened_links(info["torrent"]))
+            section["episodes"] = [dict(r, links=dict(shortened_links(r["url"]))) for r in records]
+            entry["sections"].append(section)
+
+        text = json.dumps(entry, indent=2, ensure_ascii=False).replace("\n", "\n    ")
+        self.stream.write(("," if self.count else "") + "\n    " + text)
+        self.count += 1
+
+    def close(self):
+        self.stream.write("\n  ]\n}\n" if self.count else "]\n}\n")
+        super().close()
+
+class MarkdownWriter(FormatWriter):
+    def write_season(self, season: Season):
+        info = season.info
+        out = [f'## {md_link(info["title"], info["mal_url"])} | {md_escape(info["short_title"])}']
+        if info.get("cover"):
+            out.append(f'![{md_escape(info.get("display_name", ""))}]({md_url(info["cover"])})')
+        out.append("")
+        out.append(md_escape(info["synopsis"]))
+
+        for section, records in season_sections(season):
+            out.append("")
+            out.append(f'### {md_escape(section["quality"])} ({md_escape(section["size"])}){" **New**" if section["new"] else ""}')
+            enc = section.get("encoding")
+            if enc:
+                out.append(f'**Encoding:** {md_escape(enc["source"])} · {md_escape(enc["video"])} · {md_escape(enc["audio"])}')
+            out.append("**Batch torrent:** " + " · ".join(md_link(name, link) for name, link in shortened_links(section["torrent"])))
+            out.append("")
+            for r in records:
+                parts = [f'**{md_escape(r["label"])}**{" (New)" if r["new"] else ""}', md_escape(r["size"])]
+                if r["crc32"]:
+                    parts.append(f'`{r["crc32"]}`')
+                parts.append(" · ".join(md_link(name, link) for name, link in shortened_links(r["url"])))
+                out.append("- " + " · ".join(parts))
+
+        self.stream.write("\n".join(out) + "\n\n")
+
+class BBCodeWriter(FormatWriter):
+    def write_season(self, season: Season):
+        info = season.info
+        out = [f'[b]{bb_link(info["title"], info["mal_url"])}[/b] | {bb_escape(info["short_title"])}']
+        if info.get("cover"):
+            out.append(f'[img]{bb_url(info["cover"])}[/img]')
+        out.append(f'[quote]{bb_escape(info["synopsis"])}[/quote]')
+
+        for section, records in season_sections(season):
+            torrent = " | ".join(bb_link(name, link) for name, link in shortened_links(section["torrent"]))
+            out.append(f'[b]{bb_escape(section["quality"])}[/b] ({bb_escape(section["size"])}){" [i]New[/i]" if section["new"] else ""} — Batch torrent: {torrent}')
+            enc = section.get("encoding")
+            if enc:
+                out.append(f'[size=2]{bb_escape(enc["source"])} / {bb_escape(enc["video"])} / {bb_escape(enc["audio"])}[/size]')
+            out.append("[list]")
+            for r in records:
+                links = " | ".join(bb_link(name, link) for name, link in shortened_links(r["url"]))
+                crc = f' — [{r["crc32"]}]' if r["crc32"] else ""
+                out.append(f'[*][b]{bb_escape(r["label"])}[/b]{" [i]New[/i]" if r["new"] else ""} — {bb_escape(r["size"])}{crc} — {links}')
+            out.append("[/list]")
+
+        self.stream.write("\n".join(out) + "\n\n")
+
+FORMAT_WRITERS = {
+    "json": JsonManifestWriter,
+    "md": MarkdownWriter,
+    "bbcode": BBCodeWriter,
+}
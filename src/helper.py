@@ -1,20 +1,37 @@
+# Importing helper has no side effects and stays cheap: settings are loaded
+# by an explicit call (load_settings()/ensure_settings()), the settings
+# folder is created when something is first written to it, and heavy
+# dependencies (requests, pymediainfo, the updater) are imported on first
+# use. `python_postar.py --import-time` checks the budget.
 from datetime import date
-import os, re, json, argparse, io
+import os, re, json
 from pathlib import Path
 from urllib.parse import quote
-import requests, sys
-import zlib, zipfile, shutil, tempfile, subprocess
-import textwrap
-import platform
-import shutil
+import sys
+import zlib
+import hashlib
 import time
 import threading
+import contextlib
+import difflib
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from classify import find_episode_number, extract_version_suffix, extract_crc_from_filename
 
-try:
-    from pymediainfo import MediaInfo
-    HAVE_PYMEDIAINFO = True
-except Exception:
-    HAVE_PYMEDIAINFO = False
+_media_info = None  # pymediainfo's MediaInfo once imported, False if it isn't installed
+
+def media_info():
+    """pymediainfo's MediaInfo, imported on first use (None when pymediainfo isn't installed)."""
+    global _media_info
+    if _media_info is None:
+        try:
+            from pymediainfo import MediaInfo
+            _media_info = MediaInfo
+        except Exception:
+            _media_info = False
+    return _media_info or None
+
+def have_pymediainfo() -> bool:
+    return media_info() is not None
 
 # ------------------------
 # Nested Folder Support
@@ -28,6 +45,7 @@ def discover_media_folders(root: Path):
     found = []
 
     for dirpath, dirnames, filenames in os.walk(root):
+        check_cancelled()
         if any(Path(f).suffix.lower() in media_exts for f in filenames):
             found.append(Path(dirpath))
 
@@ -100,6 +118,7 @@ def migrate_old_settings():
         print("[Migration] Skipped.\n")
         return
 
+    import shutil
     for old, new in existing:
         try:
             new.parent.mkdir(parents=True, exist_ok=True)
@@ -114,7 +133,11 @@ def migrate_old_settings():
 # Settings Loader
 # ----------------------
 SETTINGS_DIR = APP_DIR / "settings"
-SETTINGS_DIR.mkdir(parents=True, exist_ok=True)
+
+def ensure_settings_dir() -> Path:
+    """Create the settings folder (on first write, not on import) and return it."""
+    SETTINGS_DIR.mkdir(parents=True, exist_ok=True)
+    return SETTINGS_DIR
 
 SETTINGS_FILE = SETTINGS_DIR / ".postar_settings.json"
 
@@ -122,12 +145,21 @@ DEFAULT_SETTINGS = {
     "B2_SHOWS_BASE": "",
     "B2_TORRENTS_BASE": "",
     "ENCODER_NAME": "",
-    "AUTO_UPDATE": False  # <-- New setting to enable/disable auto-update
+    "AUTO_UPDATE": False,  # <-- New setting to enable/disable auto-update
+    "MAL_PROVIDERS": ["official"],  # Add "jikan" to hedge: queried in order, the next after MAL_HEDGE_DELAY
+    "MAL_HEDGE_DELAY": 0.3,
+    # S3-compatible API access for --remote (bucket/prefix come from the B2 URLs)
+    "S3_ENDPOINT": "",
+    "S3_REGION": "",
+    "S3_KEY_ID": "",
+    "S3_SECRET_KEY": "",
+    "S3_BUCKET": ""
 }
 
 def load_settings(force_reconfigure=False):
     """Ensure .postar_settings.json exists and is writable next to the AppImage."""
 
+    ensure_settings_dir()
     migrate_old_settings()
     
     if force_reconfigure:
@@ -176,17 +208,44 @@ def prompt_for_settings():
         "AUTO_UPDATE": auto_update
     }
 
-# Load settings + override globals
-SETTINGS = load_settings()
-B2_SHOWS_BASE = SETTINGS["B2_SHOWS_BASE"]
-B2_TORRENTS_BASE = SETTINGS["B2_TORRENTS_BASE"]
+# The process settings: set by startup() (set_settings()), or loaded from the
+# settings file by the first ensure_settings()
+_settings = None
+_settings_lock = threading.Lock()
+
+def ensure_settings() -> dict:
+    """The process settings, loaded from the settings file the first time if nothing set them yet."""
+    with _settings_lock:
+        if _settings is None:
+            set_settings(load_settings())
+        return _settings
+
+def get_settings() -> dict:
+    """The settings in effect: the current job's (see api.RenderContext), else the process's."""
+    return job_value("settings") or _settings or ensure_settings()
+
+def set_settings(settings: dict):
+    """Replace the process settings (after a reload or --configure). Missing keys get their defaults."""
+    global _settings
+    _settings = {**DEFAULT_SETTINGS, **settings}
+
+# helper.SETTINGS, helper.ENCODER_NAME, ... read the settings in effect
+_SETTING_NAMES = ("B2_SHOWS_BASE", "B2_TORRENTS_BASE", "ENCODER_NAME", "AUTO_UPDATE")
+
+def __getattr__(name):
+    if name == "SETTINGS":
+        return get_settings()
+    if name in _SETTING_NAMES:
+        return get_settings()[name]
+    if name == "HAVE_PYMEDIAINFO":
+        return have_pymediainfo()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 FC_LC_PREFIX = "https://fc.lc/st?api=3053afcd9e6bde75550be021b9d8aa183f18d5ae&url="
 SPASTE_PREFIX = "https://www.spaste.com/r/LRZdw6?link="
 OUO_PREFIX = "https://ouo.io/s/QgcGSmNw?s="
 TORRENT_IMAGE = "http://i.imgur.com/CBig9hc.png"
 DDL_IMAGE = "http://i.imgur.com/UjCePGg.png"
-ENCODER_NAME = SETTINGS["ENCODER_NAME"]
-AUTO_UPDATE = SETTINGS["AUTO_UPDATE"]
 VERSION = "0.55"
 
 KB = 1024
@@ -201,6 +260,12 @@ PROCESSED_FILE = SETTINGS_DIR / "processed.json"
 REPO_OWNER = "xlordnoro"
 REPO_NAME  = "python_postar"
 VERSION_URL = f"https://raw.githubusercontent.com/{REPO_OWNER}/{REPO_NAME}/main/VERSION"
+
+# Base URLs can be pointed at a local stand-in (see tools/stub_server.py)
+GITHUB_API_BASE = os.environ.get("POSTAR_GITHUB_API_BASE", "https://api.github.com").rstrip("/")
+GITHUB_BASE = os.environ.get("POSTAR_GITHUB_BASE", "https://github.com").rstrip("/")
+MAL_API_BASE = os.environ.get("POSTAR_MAL_API_BASE", "https://api.myanimelist.net").rstrip("/")
+JIKAN_API_BASE = os.environ.get("POSTAR_JIKAN_API_BASE", "https://api.jikan.moe").rstrip("/")
 ORIGINAL_ARGV = sys.argv.copy()  # Save original arguments for restart
 
 # ----------------------
@@ -224,56 +289,11 @@ def should_check_update():
 
 def update_timestamp():
     try:
+        ensure_settings_dir()
         get_timestamp_file().write_text(date.today().isoformat())
     except Exception as e:
         print(f"[Update] Warning: could not write timestamp file: {e}")
 
-# ----------------------
-# Platform detection
-# ----------------------
-def detect_platform_zip():
-    """Return platform string used in release ZIP naming."""
-    if sys.platform.startswith("win"):
-        return "windows"
-
-    elif sys.platform.startswith("darwin"):
-        arch = platform.machine().lower()
-        if arch == "arm64":
-            return "macos_arm64"
-        else:
-            return "macos_x86_64"
-
-    else:
-        return "linux"
-
-# ----------------------
-# Backup helper
-# ----------------------
-def backup_file(target_path: Path, backup_dir: Path = None):
-    """
-    Create a backup of the file in a backup folder.
-    If the folder doesn't exist, it will be created.
-    
-    Args:
-        target_path: Path to the original file to back up.
-        backup_dir: Optional Path to the backup folder. 
-                    Defaults to 'backup' folder in the same directory as target_path.
-    """
-    if not target_path.exists():
-        return  # Nothing to back up
-
-    # Determine backup folder
-    if backup_dir is None:
-        backup_dir = target_path.parent / "backup"
-    backup_dir.mkdir(parents=True, exist_ok=True)
-
-    # Construct backup file path
-    backup_path = backup_dir / (target_path.name + ".backup")
-
-    # Copy the file
-    shutil.copy2(target_path, backup_path)
-    print(f"[Update] Backup created: {backup_path}")
-
 # ----------------------
 # Portable detection (FINAL)
 # ----------------------
@@ -304,12 +324,15 @@ def get_latest_github_release():
     """
     Returns (version_tag, release_title) from GitHub
     """
-    api_url = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/releases/latest"
+    api_url = f"{GITHUB_API_BASE}/repos/{REPO_OWNER}/{REPO_NAME}/releases/latest"
+
+    # One small request on every startup (and -v): urllib is far cheaper to
+    # import than the requests stack
+    from urllib.request import urlopen
 
     try:
-        resp = requests.get(api_url, timeout=5)
-        resp.raise_for_status()
-        data = resp.json()
+        with urlopen(api_url, timeout=5) as resp:
+            data = json.loads(resp.read().decode("utf-8"))
 
         tag = data.get("tag_name", "").lstrip("v")
         title = data.get("name") or data.get("tag_name", "Unknown Release")
@@ -338,515 +361,17 @@ def print_startup_banner():
         pass  # never block startup
 
 # ----------------------
-# Release URL
-# ----------------------
-def get_release_url(remote_ver: str):
-    platform = detect_platform_zip()
-    suffix = "_portable" if is_portable() else ""
-    zip_name = f"{REPO_NAME}_{platform}_v{remote_ver}{suffix}.zip"
-    return f"https://github.com/{REPO_OWNER}/{REPO_NAME}/releases/latest/download/{zip_name}"
-
-# ----------------------
-# Main auto-update function
+# Auto-update
 # ----------------------
 def check_for_github_update(force=False):
     """
-    Auto-update for portable EXE or source .py
-    - Downloads latest GitHub release ZIP
-    - Extracts to temp folder
-    - If portable EXE, launches updater batch and exits
-    - If source, overwrites files directly and restarts
+    Daily (or forced) update check. The updater itself (autoupdate.py) is
+    only imported when a check is actually due.
     """
-    global VERSION
-
-    if not force:
-        if not should_check_update():
-            return
-
-    # Always stamp when a check actually runs
-    update_timestamp()
-
-    print("[Update] Checking for updates...")
-
-    # ---- Get latest release info ----
-    remote_ver, release_title = get_latest_github_release()
-
-    if not remote_ver:
-        print("[Update] Could not determine latest version.")
-        return
-
-    if remote_ver <= VERSION:
-        print("[Update] Already up to date.")
-        return
-
-    print(f"[Update] New release available!")
-    print(f"         Version : {remote_ver}")
-    print(f"         Title   : {release_title}")
-    print(f"         Current : {VERSION}")
-
-    # ---- Download ZIP ----
-    zip_url = get_release_url(remote_ver)
-    print(f"[Update] Downloading release ZIP from {zip_url} ...")
-    try:
-        resp = requests.get(zip_url, timeout=30)
-        resp.raise_for_status()
-    except Exception as e:
-        print(f"[Update] Failed to download release ZIP: {e}")
+    if not force and not should_check_update():
         return
-
-    # ---- Extract to temporary folder ----
-    temp_dir = Path(tempfile.mkdtemp())
-    print(f"[Update] Preparing to update files in temporary folder {temp_dir} ...")
-    try:
-        with zipfile.ZipFile(io.BytesIO(resp.content)) as z:
-            z.extractall(temp_dir)
-    except Exception as e:
-        print(f"[Update] Failed to extract ZIP: {e}")
-        return
-
-    base_dir = get_base_dir()
-
-    # ---- Portable EXE handling ----
-    if is_portable():
-        print("[Update] Portable updater launched. Exiting current program...")
-    
-        updater_bat = base_dir / "update_portable.bat"
-    
-        exe_name = Path(sys.executable).name
-        temp_dir_str = str(temp_dir)
-        base_dir_str = str(base_dir)
-    
-        # ------------------------------------------------------------
-        # Preserve the original command-line arguments, except for
-        # the update flag.
-        #
-        # This prevents:
-        #
-        #     python_postar.exe -u
-        #
-        # from causing another update check after the application
-        # has been updated and relaunched.
-        # ------------------------------------------------------------
-    
-        restart_args = [
-            arg
-            for arg in ORIGINAL_ARGV[1:]
-            if arg.lower() not in ("-u", "--update")
-        ]
-    
-        original_args = subprocess.list2cmdline(restart_args)
-    
-        # ------------------------------------------------------------
-        # Escape characters that are special inside a batch file.
-        # ------------------------------------------------------------
-    
-        def bat_escape(value):
-            return (
-                value
-                .replace("^", "^^")
-                .replace("&", "^&")
-                .replace("|", "^|")
-                .replace("<", "^<")
-                .replace(">", "^>")
-                .replace("(", "^(")
-                .replace(")", "^)")
-            )
-    
-        exe_name_bat = bat_escape(exe_name)
-        temp_dir_bat = bat_escape(temp_dir_str)
-        base_dir_bat = bat_escape(base_dir_str)
-        original_args_bat = bat_escape(original_args)
-    
-        # ------------------------------------------------------------
-        # Generate portable updater
-        # ------------------------------------------------------------
-    
-        bat_text = f"""@echo off
-    setlocal EnableExtensions EnableDelayedExpansion
-    
-    REM ============================================================
-    REM Configuration
-    REM ============================================================
-    
-    set "TEMP_DIR={temp_dir_bat}"
-    set "BASE_DIR={base_dir_bat}"
-    set "EXE_NAME={exe_name_bat}"
-    set "BACKUP_DIR=%BASE_DIR%\\backup"
-    set "SOURCE_ROOT=%TEMP_DIR%"
-    
-    echo [Updater] Starting portable updater...
-    echo [Updater] Temporary directory:
-    echo [Updater] "%TEMP_DIR%"
-    echo [Updater] Base directory:
-    echo [Updater] "%BASE_DIR%"
-    
-    REM ============================================================
-    REM Wait for the main application to exit
-    REM ============================================================
-    
-    echo [Updater] Waiting for %EXE_NAME% to exit...
-    
-    :WAIT_FOR_APP
-    
-    tasklist /FI "IMAGENAME eq %EXE_NAME%" 2>NUL | find /I "%EXE_NAME%" >NUL
-    
-    if not errorlevel 1 (
-        timeout /t 1 /nobreak >NUL
-        goto WAIT_FOR_APP
-    )
-    
-    echo [Updater] Application has exited.
-    
-    REM ============================================================
-    REM Verify temporary update directory
-    REM ============================================================
-    
-    if not exist "%TEMP_DIR%" (
-        echo [Updater] ERROR: Update directory does not exist:
-        echo [Updater] "%TEMP_DIR%"
-        goto FAILED
-    )
-    
-    REM ============================================================
-    REM Detect correct extraction root
-    REM
-    REM If the ZIP extracted into a single directory, use that
-    REM directory as the source root.
-    REM Otherwise use TEMP_DIR directly.
-    REM ============================================================
-    
-    set "ENTRY_COUNT=0"
-    set "ONLY_ENTRY="
-    
-    for /f "delims=" %%A in ('dir /b /a "%TEMP_DIR%" 2^>nul') do (
-        set /a ENTRY_COUNT+=1
-        set "ONLY_ENTRY=%%A"
-    )
-    
-    if "!ENTRY_COUNT!"=="1" (
-        if exist "%TEMP_DIR%\\!ONLY_ENTRY!\\NUL" (
-            set "SOURCE_ROOT=%TEMP_DIR%\\!ONLY_ENTRY!"
-        )
-    )
-    
-    echo [Updater] Source root:
-    echo [Updater] "%SOURCE_ROOT%"
-    
-    if not exist "%SOURCE_ROOT%" (
-        echo [Updater] ERROR: Source root does not exist.
-        goto FAILED
-    )
-    
-    REM ============================================================
-    REM Create backup directory
-    REM ============================================================
-    
-    if not exist "%BACKUP_DIR%" (
-        mkdir "%BACKUP_DIR%"
-    )
-    
-    if errorlevel 1 (
-        echo [Updater] ERROR: Could not create backup directory.
-        goto FAILED
-    )
-    
-    echo [Updater] Backup directory:
-    echo [Updater] "%BACKUP_DIR%"
-    
-    REM ============================================================
-    REM PROCESS TOP-LEVEL FILES ONLY
-    REM
-    REM /a-d means:
-    REM     Files only
-    REM
-    REM Directories are completely excluded from this loop.
-    REM ============================================================
-    
-    for /f "delims=" %%A in ('dir /b /a-d "%SOURCE_ROOT%" 2^>nul') do (
-        call :UPDATE_FILE "%%A"
-    )
-    
-    REM ============================================================
-    REM PROCESS TOP-LEVEL DIRECTORIES ONLY
-    REM
-    REM /ad means:
-    REM     Directories only
-    REM
-    REM Directories are copied/merged but NEVER backed up.
-    REM ============================================================
-    
-    for /f "delims=" %%A in ('dir /b /ad "%SOURCE_ROOT%" 2^>nul') do (
-        call :UPDATE_DIRECTORY "%%A"
-    )
-    
-    echo [Updater] All update files processed.
-    
-    REM ============================================================
-    REM Relaunch application
-    REM ============================================================
-    
-    echo [Updater] Relaunching application...
-    
-    set "POSTAR_APP_DIR=%BASE_DIR%"
-    
-    start "" /D "%BASE_DIR%" "%BASE_DIR%\\%EXE_NAME%" {original_args_bat}
-    
-    if errorlevel 1 (
-        echo [Updater] ERROR: Failed to relaunch application.
-        goto FAILED
-    )
-    
-    echo [Updater] Application relaunched.
-    
-    REM ============================================================
-    REM Cleanup
-    REM ============================================================
-    
-    echo [Updater] Cleaning temporary update directory...
-    
-    set /a CLEANUP_ATTEMPT=0
-    
-    :CLEANUP
-    
-    set /a CLEANUP_ATTEMPT+=1
-    
-    if not exist "%TEMP_DIR%" (
-        echo [Updater] Temporary directory removed.
-        goto FINISHED
-    )
-    
-    rmdir /S /Q "%TEMP_DIR%" >NUL 2>&1
-    
-    if not exist "%TEMP_DIR%" (
-        echo [Updater] Temporary directory removed.
-        goto FINISHED
-    )
-    
-    if !CLEANUP_ATTEMPT! GEQ 10 (
-        echo [Updater] WARNING: Could not remove temporary directory.
-        goto FINISHED
-    )
-    
-    echo [Updater] Cleanup attempt !CLEANUP_ATTEMPT!/10 failed.
-    
-    timeout /t 1 /nobreak >NUL
-    goto CLEANUP
-    
-    
-    REM ============================================================
-    REM UPDATE TOP-LEVEL FILE
-    REM ============================================================
-    
-    :UPDATE_FILE
-    
-    set "ITEM=%~1"
-    
-    REM ------------------------------------------------------------
-    REM Never update the updater itself.
-    REM ------------------------------------------------------------
-    
-    if /I "%ITEM%"=="update_portable.bat" (
-        echo [Updater] Skipping update_portable.bat
-        exit /B 0
-    )
-    
-    REM ------------------------------------------------------------
-    REM Only EXE files are backed up.
-    REM
-    REM Everything else is simply copied:
-    REM
-    REM     .dll
-    REM     .json
-    REM     .txt
-    REM     .py
-    REM     etc.
-    REM ------------------------------------------------------------
-    
-    if /I "%~x1"==".exe" (
-    
-        if exist "%BASE_DIR%\\%ITEM%" (
-    
-            echo [Updater] Backing up EXE: %ITEM%
-    
-            copy /Y ^
-                "%BASE_DIR%\\%ITEM%" ^
-                "%BACKUP_DIR%\\%ITEM%" >NUL
-    
-            if errorlevel 1 (
-                echo [Updater] WARNING: Backup failed for %ITEM%
-            ) else (
-                echo [Updater] Backup created:
-                echo [Updater] "%BACKUP_DIR%\\%ITEM%"
-            )
-        )
-    )
-    
-    REM ------------------------------------------------------------
-    REM Copy the file
-    REM ------------------------------------------------------------
-    
-    echo [Updater] Copying file: %ITEM%
-    
-    copy /Y ^
-        "%SOURCE_ROOT%\\%ITEM%" ^
-        "%BASE_DIR%\\%ITEM%" >NUL
-    
-    if errorlevel 1 (
-        echo [Updater] ERROR: Copy failed for %ITEM%
-    ) else (
-        echo [Updater] File copied: %ITEM%
-    )
-    
-    exit /B 0
-    
-    
-    REM ============================================================
-    REM UPDATE TOP-LEVEL DIRECTORY
-    REM ============================================================
-    
-    :UPDATE_DIRECTORY
-    
-    set "ITEM=%~1"
-    
-    REM ------------------------------------------------------------
-    REM Never copy the backup directory.
-    REM ------------------------------------------------------------
-    
-    if /I "%ITEM%"=="backup" (
-        echo [Updater] Skipping backup directory
-        exit /B 0
-    )
-    
-    REM ------------------------------------------------------------
-    REM Copy/merge directory.
-    REM
-    REM No backup is created for directories.
-    REM This matches the original Python updater:
-    REM
-    REM     shutil.copytree(
-    REM         item,
-    REM         dest,
-    REM         dirs_exist_ok=True
-    REM     )
-    REM ------------------------------------------------------------
-    
-    echo [Updater] Copying directory: %ITEM%
-    
-    robocopy ^
-        "%SOURCE_ROOT%\\%ITEM%" ^
-        "%BASE_DIR%\\%ITEM%" ^
-        /E ^
-        /COPY:DAT ^
-        /DCOPY:DAT ^
-        /R:2 ^
-        /W:1 ^
-        /NFL ^
-        /NDL ^
-        /NJH ^
-        /NJS ^
-        /NP >NUL
-    
-    set "ROBOCOPY_RESULT=!ERRORLEVEL!"
-    
-    if !ROBOCOPY_RESULT! GEQ 8 (
-        echo [Updater] ERROR: Directory copy failed for %ITEM%
-    ) else (
-        echo [Updater] Directory copied: %ITEM%
-    )
-    
-    exit /B 0
-    
-    
-    REM ============================================================
-    REM FAILED
-    REM ============================================================
-    
-    :FAILED
-    
-    echo.
-    echo [Updater] ==========================================
-    echo [Updater] UPDATE FAILED
-    echo [Updater] ==========================================
-    echo.
-    
-    pause
-    
-    endlocal
-    exit /B 1
-    
-    
-    REM ============================================================
-    REM FINISHED
-    REM ============================================================
-    
-    :FINISHED
-    
-    echo [Updater] Updater finished successfully.
-    
-    endlocal
-    exit /B 0
-    """
-    
-        # ------------------------------------------------------------
-        # Write updater BAT
-        # ------------------------------------------------------------
-    
-        with open(
-            updater_bat,
-            "w",
-            encoding="utf-8",
-            newline="\r\n",
-        ) as f:
-            f.write(bat_text)
-            f.flush()
-            os.fsync(f.fileno())
-    
-        # ------------------------------------------------------------
-        # Launch updater through cmd.exe
-        # ------------------------------------------------------------
-    
-        subprocess.Popen(
-            ["cmd", "/c", str(updater_bat)],
-            cwd=str(base_dir),
-            creationflags=(
-                subprocess.CREATE_NEW_PROCESS_GROUP
-                | subprocess.CREATE_NO_WINDOW
-            ),
-        )
-    
-        sys.exit(0)
-
-    # ---- Source (.py) handling ----
-    else:
-        base_dir = Path(sys.executable).parent if is_portable() else Path(__file__).resolve().parent
-        print(f"[Update] Extracting files directly to {base_dir} ...")
-
-        try:
-            with zipfile.ZipFile(io.BytesIO(resp.content)) as z:
-                for member in z.namelist():
-                    if member.endswith("/"):
-                        continue  # skip directories
-
-                    relative_path = Path(member)
-                    target_path = base_dir / relative_path
-
-                    target_path.parent.mkdir(parents=True, exist_ok=True)
-                    backup_file(target_path)
-
-                    with z.open(member) as src, open(target_path, "wb") as dst:
-                        dst.write(src.read())
-
-                    print(f"[Update] Updated: {target_path}")
-
-            print("[Update] Update complete — restarting with original command...")
-            # Restart the main script/exe
-            python = sys.executable
-            script = Path(sys.executable).resolve() if is_portable() else Path(__file__).resolve().parent / "python_postar.py"
-            os.execv(python, [python, str(script), *ORIGINAL_ARGV[1:]])
-
-        except Exception as e:
-            print(f"[Update] Failed to extract ZIP: {e}")
-            return
+    from autoupdate import run_update
+    run_update()
 
 # -----------------------------
 # Processed tracking
@@ -861,10 +386,13 @@ def load_processed():
 
 def save_processed(data):
     try:
+        ensure_settings_dir()
         open(PROCESSED_FILE, "w", encoding="utf-8").write(json.dumps(data, indent=2))
     except Exception as e:
         print(f"Warning: could not save processed file ({e})")
 
+_processed_lock = threading.Lock()
+
 def mark_new(folder_basename, episode_label=None, filename=None):
     """
     Tracks processed episodes by filename and label.
@@ -874,7 +402,21 @@ def mark_new(folder_basename, episode_label=None, filename=None):
     episode_label: str, episode code like '01', 'SP1', 'ED', etc.
     filename: str, actual filename of the file being processed
     """
-    data = load_processed()
+    # Jobs running side by side must not lose each other's markers
+    with _processed_lock:
+        return _mark_new(folder_basename, episode_label, filename)
+
+def _mark_new(folder_basename, episode_label, filename):
+    # Previews (render daemon) show the markers without recording them: they
+    # work on a copy of processed.json kept for the one render
+    preview = job_value("preview")
+    data = job_value("processed") if preview else None
+    if data is None:
+        data = load_processed()
+        if preview:
+            set_job_value("processed", data)
+    save = (lambda data: None) if preview else save_processed
+
     show_entry = data.setdefault(folder_basename, {"episodes": [], "batch": False})
 
     # Migrate old entries if they are just strings
@@ -886,7 +428,7 @@ def mark_new(folder_basename, episode_label=None, filename=None):
     if episode_label is None:
         if not show_entry.get("batch", False):
             show_entry["batch"] = True
-            save_processed(data)
+            save(data)
             return True
         return False
 
@@ -901,11 +443,28 @@ def mark_new(folder_basename, episode_label=None, filename=None):
             "label": episode_label,
             "filename": filename
         })
-        save_processed(data)
+        save(data)
         return True
 
     return False
 
+def processed_entries(keys) -> dict:
+    """Copies of the processed.json entries for *keys* (None where there's none yet)."""
+    with _processed_lock:
+        data = load_processed()
+    return {key: json.loads(json.dumps(data[key])) if key in data else None for key in keys}
+
+def restore_processed(entries: dict):
+    """Put back entries taken with processed_entries(), undoing markers recorded since."""
+    with _processed_lock:
+        data = load_processed()
+        for key, entry in entries.items():
+            if entry is None:
+                data.pop(key, None)
+            else:
+                data[key] = entry
+        save_processed(data)
+
 # -----------------------------
 # Helpers
 # -----------------------------
@@ -916,45 +475,250 @@ def sanitize_display_name_from_folder(folder_name: str) -> str:
     s = s.replace('_', ' ').replace('.', ' ')
     return re.sub(r'\s+', ' ', s).strip()
 
-def find_episode_number(filename: str):
+def url_for_show_file(folder_basename: str, filename: str) -> str:
+    return get_settings()["B2_SHOWS_BASE"] + quote(f"{folder_basename}/{filename}", safe="/[]()")
+def torrent_url_for_folder(folder_basename: str) -> str:
+    return get_settings()["B2_TORRENTS_BASE"] + quote(f"{folder_basename}.torrent", safe="/[]()")
+def safe_txt_filename(folder_path: str) -> str:
+    s = sanitize_display_name_from_folder(Path(folder_path).name)
+    s = re.sub(r'[<>:"/\\|?*]+', '', s).strip()
+    return (s if s else "output") + ".txt"
+
+def write_text_atomic(path: Path, text: str):
+    """Written to a temporary file and renamed, so a reader or a crash never sees half a file."""
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+# ----------------------------
+# Link verification
+# ----------------------------
+LINK_CHECK_CACHE_FILE = SETTINGS_DIR / "link_check_cache.json"
+LINK_CHECK_CONCURRENCY = 32
+LINK_CHECK_CACHE_TTL = 24 * 3600  # seconds an OK result is trusted
+
+def pooled_session(pool_size: int) -> "requests.Session":
+    """requests.Session whose connection pool can keep pool_size connections alive per host."""
+    import requests
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def collect_post_links(folders) -> list[tuple[str, int | None]]:
     """
-    Extract the episode number from the filename.
-    Ignores series numbering, resolution numbers (720/1080), CRC hashes, 
-    release group tags, and properly handles v1/v2 suffixes.
+    Return (url, expected_size) for every link a post over *folders* will
+    contain: one per media file plus the batch torrent (size unknown).
     """
-    ignore_numbers = {720, 1080}
+    links = []
+    for folder in folders:
+        links.append((torrent_url_for_folder(folder.name), None))
+        for f in sorted(get_inventory().list_media_files(folder), key=lambda f: f.name):
+            links.append((url_for_show_file(folder.name, f.name), f.size))
+    return links
+
+def _check_one_link(session: "requests.Session", url: str, expected_size: int | None) -> dict:
+    try:
+        r = session.head(url, allow_redirects=True, timeout=10)
+        if r.status_code == 405:  # HEAD not allowed, fall back to a streamed GET
+            r = session.get(url, allow_redirects=True, timeout=10, stream=True)
+            r.close()
+    except Exception as e:
+        return {"status": "error", "detail": str(e)}
 
-    # Remove all parentheses blocks (CRC, resolution, release group)
-    filename_clean = re.sub(r'\([^\)]*\)', '', filename)
+    if r.status_code == 404:
+        return {"status": "missing", "detail": "404"}
+    if r.status_code >= 400:
+        return {"status": "error", "detail": f"HTTP {r.status_code}"}
 
-    # Focus on part after the last dash
-    last_dash_index = filename_clean.rfind('-')
-    search_str = filename_clean[last_dash_index + 1:] if last_dash_index != -1 else filename_clean
+    remote_size = r.headers.get("Content-Length")
+    if expected_size is not None and remote_size is not None and int(remote_size) != expected_size:
+        return {"status": "mismatch", "detail": f"remote {remote_size} bytes, local {expected_size} bytes"}
 
-    # Search for first number (episode) with optional v1/v2
-    match = re.search(r'(\d{1,4})(v\d)?', search_str)
-    if match:
-        val = int(match.group(1))
-        if val not in ignore_numbers and val < 10000:
-            return val
+    return {"status": "ok", "detail": ""}
 
-    # Fallback: last valid number in the whole filename
-    matches = re.findall(r'(\d{1,4})(v\d)?', filename_clean)
-    for number_str, _ in reversed(matches):
-        val = int(number_str)
-        if val not in ignore_numbers and val < 10000:
-            return val
+def check_links(links, concurrency: int = LINK_CHECK_CONCURRENCY, use_cache: bool = True) -> dict:
+    """
+    Issue concurrent HEAD requests over one pooled session for (url, size)
+    pairs. OK results are cached by URL + expected size for
+    LINK_CHECK_CACHE_TTL seconds. Returns {url: {"status", "detail", "expected"}}.
+    """
+    cache = {}
+    if use_cache and LINK_CHECK_CACHE_FILE.exists():
+        try:
+            cache = json.loads(LINK_CHECK_CACHE_FILE.read_text(encoding="utf-8"))
+        except Exception:
+            cache = {}
+
+    now = time.time()
+    results = {}
+    to_check = []
+    for url, size in links:
+        key = f"{url}|{size}"
+        if use_cache and now - cache.get(key, 0) < LINK_CHECK_CACHE_TTL:
+            results[url] = {"status": "ok", "detail": "cached", "expected": size}
+        else:
+            to_check.append((url, size))
+
+    if to_check:
+        session = pooled_session(concurrency)
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="link-check") as pool:
+            futures = {pool.submit(_check_one_link, session, url, size): (url, size) for url, size in to_check}
+            for future in futures:
+                url, size = futures[future]
+                result = future.result()
+                result["expected"] = size
+                results[url] = result
+                if result["status"] == "ok":
+                    cache[f"{url}|{size}"] = now
+        session.close()
+
+    if use_cache:
+        # Drop expired entries so the cache doesn't grow forever
+        cache = {k: v for k, v in cache.items() if now - v < LINK_CHECK_CACHE_TTL}
+        try:
+            ensure_settings_dir()
+            write_text_atomic(LINK_CHECK_CACHE_FILE, json.dumps(cache, indent=2))
+        except Exception as e:
+            print(f"[Links] Warning: could not save link cache ({e})")
 
-    return None
+    return results
 
-def url_for_show_file(folder_basename: str, filename: str) -> str:
-    return B2_SHOWS_BASE + quote(f"{folder_basename}/{filename}", safe="/[]()")
-def torrent_url_for_folder(folder_basename: str) -> str:
-    return B2_TORRENTS_BASE + quote(f"{folder_basename}.torrent", safe="/[]()")
-def safe_txt_filename(folder_path: str) -> str:
-    s = sanitize_display_name_from_folder(Path(folder_path).name)
-    s = re.sub(r'[<>:"/\\|?*]+', '', s).strip()
-    return (s if s else "output") + ".txt"
+def print_link_report(results: dict) -> bool:
+    """Print problems found by check_links(). Returns True when every link is OK."""
+    problems = {url: r for url, r in results.items() if r["status"] != "ok"}
+    cached = sum(1 for r in results.values() if r["detail"] == "cached")
+
+    print(f"[Links] Checked {len(results)} links ({cached} cached), {len(problems)} problem(s).")
+    for url, r in sorted(problems.items()):
+        print(f"[Links] {r['status'].upper():8} {url}" + (f" ({r['detail']})" if r["detail"] else ""))
+
+    return not problems
+
+# ----------------------------
+# Per-job state
+# ----------------------------
+# Batch jobs can run side by side in threads (--batch --jobs N). Whatever a
+# job swaps out for itself (settings, inventory, fragment cache, layout) is
+# kept per thread inside job_scope(), so jobs never see each other's
+# switches. Scopes nest: an inner one starts from the outer one's values
+# (with its own fragment counts), and the outer one is back when it ends.
+_job_state = threading.local()
+
+@contextlib.contextmanager
+def job_scope():
+    outer = getattr(_job_state, "values", None)
+    _job_state.values = {**(outer or {}), "fragment_counts": [0, 0]}  # reused, rendered
+    try:
+        yield _job_state.values
+    finally:
+        _job_state.values = outer
+
+def job_value(name: str, default=None):
+    values = getattr(_job_state, "values", None)
+    return default if values is None else values.get(name, default)
+
+def current_job():
+    """The current job's values, for attach_job() in worker threads (None outside job_scope())."""
+    return getattr(_job_state, "values", None)
+
+@contextlib.contextmanager
+def attach_job(values):
+    """Run the block (in a worker thread) as part of the job whose values these are."""
+    outer = getattr(_job_state, "values", None)
+    _job_state.values = values
+    try:
+        yield values
+    finally:
+        _job_state.values = outer
+
+def set_job_value(name: str, value) -> bool:
+    """Store *value* for the current job. False when not inside job_scope()."""
+    values = getattr(_job_state, "values", None)
+    if values is None:
+        return False
+    values[name] = value
+    return True
+
+# ----------------------------
+# Fast previews
+# ----------------------------
+# With the job value "placeholders" set (a [count] list), anything that
+# isn't known yet (a CRC32 that needs hashing, MediaInfo, a MAL synopsis)
+# is rendered as PENDING instead of being worked out, and counted. The
+# work itself is left to a background pipeline (pipeline.py).
+PENDING = "…"
+
+def placeholders_on() -> bool:
+    return job_value("placeholders") is not None
+
+def placeholder(value=PENDING):
+    """Count one placeholder in the current job and return *value*."""
+    job_value("placeholders")[0] += 1
+    return value
+
+# ----------------------------
+# Cancellation
+# ----------------------------
+# A render whose inputs have changed under it (a newer preview of the same
+# post, a client that went away) is cancelled through the CancelToken in
+# its job ("cancel"). The slow stages call check_cancelled() between files,
+# chunks and seasons, so it stops within one of those; whatever finished
+# before that (hashes, MAL lookups, fragments) stays in the caches.
+class Cancelled(BaseException):
+    """
+    Raised inside a cancelled job. A BaseException, so the stages' own
+    `except Exception` fallbacks let it through instead of recording a failure.
+    """
+
+class CancelToken:
+    __slots__ = ("event", "reason")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.reason = ""
+
+    def cancel(self, reason: str = "cancelled"):
+        if not self.event.is_set():
+            self.reason = reason
+            self.event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.event.is_set()
+
+    def check(self):
+        if self.event.is_set():
+            raise Cancelled(self.reason)
+
+def check_cancelled():
+    """Raise Cancelled if the current job has been cancelled."""
+    token = job_value("cancel")
+    if token is not None:
+        token.check()
+
+# ----------------------------
+# Shared resource limits
+# ----------------------------
+# Caps shared by every job in the process however many run at once: files
+# being read for CRC32s, MediaInfo parses and MAL requests in flight.
+RESOURCE_LIMITS = {"disk": 2, "mediainfo": os.cpu_count() or 2, "mal": 2}
+_resource_slots = {name: threading.BoundedSemaphore(n) for name, n in RESOURCE_LIMITS.items()}
+
+def set_resource_limits(**limits):
+    """Change the caps (disk=, mediainfo=, mal=). Call before any jobs start."""
+    for name, n in limits.items():
+        if n:
+            RESOURCE_LIMITS[name] = max(1, int(n))
+            _resource_slots[name] = threading.BoundedSemaphore(RESOURCE_LIMITS[name])
+
+def resource_slot(name: str) -> threading.BoundedSemaphore:
+    """with resource_slot("disk"): ... waits for a free slot."""
+    return _resource_slots[name]
 
 # ----------------------------
 # CRC32 Hash Extractor
@@ -962,25 +726,360 @@ def safe_txt_filename(folder_path: str) -> str:
 def compute_crc32(path: Path) -> str:
     """Return uppercase 8-digit CRC32."""
     crc = 0
-    with open(path, "rb") as f:
+    with resource_slot("disk"), open(path, "rb") as f:
         for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            check_cancelled()
             crc = zlib.crc32(chunk, crc)
     return f"{crc & 0xffffffff:08X}"   # <-- uppercase
 
-def extract_crc_from_filename(fname: str) -> str | None:
+# Hash cache keyed by path + size + mtime, so unchanged files are never re-read.
+# New CRC32s are kept in memory and written once by save_hash_cache().
+HASH_CACHE_FILE = SETTINGS_DIR / "hash_cache.json"
+_hash_cache = None
+_hash_cache_dirty = False
+_hash_cache_lock = threading.Lock()
+
+def _hash_cache_key(path: Path) -> str:
+    st = path.stat()
+    return f"{path.resolve()}|{st.st_size}|{st.st_mtime_ns}"
+
+def _read_hash_cache_file() -> dict:
+    try:
+        return json.loads(HASH_CACHE_FILE.read_text(encoding="utf-8")) if HASH_CACHE_FILE.exists() else {}
+    except Exception:
+        return {}
+
+def _load_hash_cache() -> dict:
+    global _hash_cache
+    if _hash_cache is None:
+        _hash_cache = _read_hash_cache_file()
+    return _hash_cache
+
+def _hash_cache_entry_current(key: str) -> bool:
+    """False for entries of files that have changed or were deleted since they were hashed."""
+    path, size, mtime_ns = key.rsplit("|", 2)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        # Kept while the folder is missing too: it may be on a drive that isn't mounted
+        return not os.path.isdir(os.path.dirname(path))
+    except OSError:
+        return True
+    return f"{st.st_size}|{st.st_mtime_ns}" == f"{size}|{mtime_ns}"
+
+def remember_crc32(path: Path, crc: str):
+    remember_crc32s({path: crc})
+
+def remember_crc32s(crcs: dict):
+    """Add CRC32s ({path: crc}) to the hash cache; save_hash_cache() writes them out."""
+    global _hash_cache_dirty
+    with _hash_cache_lock:
+        cache = _load_hash_cache()
+        for path, crc in crcs.items():
+            cache[_hash_cache_key(path)] = crc
+        _hash_cache_dirty = True
+
+def save_hash_cache():
     """
-    Match CRC inside brackets: [A1B2C3D4] or [a1b2c3d4]
+    Write the hash cache if anything was added since the last save. Entries
+    another process saved in the meantime are kept; entries for files that
+    changed or were deleted are dropped.
     """
-    m = re.search(r'\[([0-9A-Fa-f]{8})\]', fname)
-    return m.group(1).upper() if m else None   # <-- normalize to uppercase
+    global _hash_cache_dirty
+    with _hash_cache_lock:
+        if not _hash_cache_dirty:
+            return
+        cache = {**_read_hash_cache_file(), **_hash_cache}
+        cache = {key: crc for key, crc in cache.items() if _hash_cache_entry_current(key)}
+        try:
+            ensure_settings_dir()
+            write_text_atomic(HASH_CACHE_FILE, json.dumps(cache))
+            _hash_cache.clear()
+            _hash_cache.update(cache)
+            _hash_cache_dirty = False
+        except Exception as e:
+            print(f"Warning: could not save hash cache ({e})")
+
+def known_crc32(path: Path) -> str | None:
+    """The hash cache's CRC32 for *path*, without reading the file."""
+    with _hash_cache_lock:
+        return _load_hash_cache().get(_hash_cache_key(path))
+
+_crc_in_flight = {}  # hash cache key -> lock held while that file is read
+
+def cached_crc32(path: Path) -> str:
+    """compute_crc32() backed by the hash cache. A file being hashed by another thread is waited for, not read twice."""
+    key = _hash_cache_key(path)
+    with _hash_cache_lock:
+        crc = _load_hash_cache().get(key)
+        if crc:
+            return crc
+        reading = _crc_in_flight.setdefault(key, threading.Lock())
+    try:
+        with reading:
+            with _hash_cache_lock:
+                crc = _load_hash_cache().get(key)
+            if not crc:
+                crc = compute_crc32(path)
+                remember_crc32(path, crc)
+    finally:
+        with _hash_cache_lock:
+            _crc_in_flight.pop(key, None)
+    return crc
 
 # ----------------------------
-# Version Extractor
+# Inventory backends
 # ----------------------------
-def extract_version_suffix(name: str):
-    # Matches 01v2, 05v3, 12v10 etc.
-    m = re.search(r'(\d{1,4})(v\d{1,4})', name, re.IGNORECASE)
-    return m.group(2).lower() if m else ""
+# Folder contents (names, sizes, hashes) come from an inventory backend so
+# posts can be built from local files or from a remote bucket listing.
+class LocalMediaFile:
+    __slots__ = ("name", "size", "path", "version")
+
+    def __init__(self, path: Path):
+        st = path.stat()
+        self.name = path.name
+        self.size = st.st_size
+        self.path = path
+        self.version = st.st_mtime_ns
+
+class LocalInventory:
+    """Reads folder contents from the local filesystem."""
+
+    def discover(self, name: str) -> list[Path]:
+        root = Path(name)
+        return discover_media_folders(root) if root.is_dir() else []
+
+    def exists(self, folder) -> bool:
+        return Path(folder).exists()
+
+    def list_media_files(self, folder) -> list[LocalMediaFile]:
+        return [LocalMediaFile(p) for p in Path(folder).iterdir() if p.is_file() and p.suffix.lower() in (".mkv", ".rar", ".zip")]
+
+    def mkv_names(self, folder) -> list[str]:
+        return [p.name for p in sorted([p for p in Path(folder).iterdir() if p.is_file() and p.suffix.lower() == ".mkv"], key=lambda p: p.name.lower())]
+
+    def total_bytes(self, folder) -> int:
+        return sum((p.stat().st_size for p in Path(folder).rglob("*") if p.is_file()), 0)
+
+    def crc32(self, folder, media_file: LocalMediaFile) -> str | None:
+        return cached_crc32(media_file.path)
+
+    def known_crc32(self, folder, media_file: LocalMediaFile) -> tuple[bool, str | None]:
+        """(known, crc32) without reading anything; known is False when crc32() would have to work."""
+        crc = known_crc32(media_file.path)
+        return crc is not None, crc
+
+    def encoding_info(self, folder):
+        with resource_slot("mediainfo"):
+            return extract_encoding_info(Path(folder))
+
+_inventory = LocalInventory()
+
+def get_inventory():
+    return job_value("inventory", _inventory)
+
+def set_inventory(inventory):
+    """Inside job_scope() this only changes the current job's inventory."""
+    global _inventory
+    if not set_job_value("inventory", inventory):
+        _inventory = inventory
+
+def make_s3_client():
+    """S3 client for the bucket behind B2_SHOWS_BASE. Returns (client, shows_prefix)."""
+    from bucket import S3Client, bucket_location
+
+    settings = get_settings()
+    endpoint = settings.get("S3_ENDPOINT", "")
+    shows_bucket, shows_prefix = bucket_location(settings["B2_SHOWS_BASE"], settings.get("S3_BUCKET", ""))
+
+    if not endpoint or not shows_bucket:
+        raise RuntimeError("S3_ENDPOINT and a bucket (from B2_SHOWS_BASE or S3_BUCKET) must be configured")
+
+    client = S3Client(
+        endpoint,
+        shows_bucket,
+        settings.get("S3_KEY_ID", ""),
+        settings.get("S3_SECRET_KEY", ""),
+        region=settings.get("S3_REGION", "")
+    )
+    return client, shows_prefix
+
+def make_remote_inventory():
+    """Build a bucket-backed inventory for B2_SHOWS_BASE / B2_TORRENTS_BASE from the S3_* settings."""
+    from bucket import RemoteInventory, bucket_location
+
+    client, shows_prefix = make_s3_client()
+    torrents_bucket, torrents_prefix = bucket_location(get_settings()["B2_TORRENTS_BASE"], client.bucket)
+    if torrents_bucket != client.bucket:
+        print("[Bucket] Torrents live in a different bucket — batch torrents won't be verified.")
+        torrents_prefix = None
+
+    return RemoteInventory(client, shows_prefix, torrents_prefix, cache_file=ensure_settings_dir() / "bucket_cache.json")
+
+def upload_folders(folders) -> int:
+    """
+    Upload every media file in *folders* to the bucket behind B2_SHOWS_BASE,
+    reading each file once. The CRC32s computed on the way are stored in the
+    hash cache, so the post that follows doesn't hash anything again.
+    Returns the number of files uploaded.
+    """
+    from bucket import UploadState, upload_file
+
+    client, shows_prefix = make_s3_client()
+    prefix = shows_prefix.rstrip("/") + "/" if shows_prefix else ""
+    state = UploadState(ensure_settings_dir() / "upload_state.json")
+    uploaded = 0
+
+    for folder in folders:
+        for f in sorted(LocalInventory().list_media_files(folder), key=lambda f: f.name):
+            key = f"{prefix}{folder.name}/{f.name}"
+            start = time.perf_counter()
+            result = upload_file(client, f.path, key, state)
+            remember_crc32(f.path, result["crc32"])
+            elapsed = time.perf_counter() - start
+            print(f"[Upload] {key} ({human_size_bytes(f.size)}, CRC32 {result['crc32']}) in {elapsed:.1f}s")
+            uploaded += 1
+
+    return uploaded
+
+# ----------------------------
+# Fragment cache
+# ----------------------------
+# Rendered fragments (encoding tables, episode rows) keyed by a hash of
+# everything that goes into them, so a rerun only re-renders what changed.
+FRAGMENT_CACHE_FILE = SETTINGS_DIR / "fragment_cache.json"
+FRAGMENT_CACHE_MAX_ENTRIES = 2000
+
+class FragmentCache:
+    def __init__(self, cache_file: Path = None, max_entries: int = FRAGMENT_CACHE_MAX_ENTRIES, enabled: bool = True):
+        self.cache_file = cache_file
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+        if enabled and cache_file and cache_file.exists():
+            try:
+                self.entries = json.loads(cache_file.read_text(encoding="utf-8"))
+            except Exception:
+                self.entries = {}
+
+    def _count(self, hit: bool):
+        """Totals for the process, plus the running job's own (job_scope())."""
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        counts = job_value("fragment_counts")
+        if counts is not None:
+            counts[0 if hit else 1] += 1
+
+    def has(self, kind: str, inputs) -> bool:
+        """Whether render()/stream() would be a hit (without counting it as one)."""
+        with self.lock:
+            return self.enabled and self.key(kind, inputs) in self.entries
+
+    @staticmethod
+    def key(kind: str, inputs) -> str:
+        blob = json.dumps([kind, inputs], sort_keys=True, default=str, separators=(",", ":"))
+        return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+    def render(self, kind: str, inputs, build) -> str:
+        """Return the cached fragment for *inputs*, or build() it and remember the result."""
+        if not self.enabled:
+            return build()
+
+        key = self.key(kind, inputs)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry["used"] = time.time()
+                self._count(hit=True)
+                self.dirty = True
+                return entry["text"]
+
+        text = build()
+        with self.lock:
+            self.entries[key] = {"kind": kind, "text": text, "used": time.time()}
+            self._count(hit=False)
+            self.dirty = True
+        return text
+
+    def stream(self, kind: str, inputs, build_lines):
+        """
+        render() for fragments built line by line: yields the cached text on
+        a hit, otherwise the lines of build_lines() as each one is built,
+        remembering the joined text once the last one is done.
+        """
+        if not self.enabled:
+            yield from build_lines()
+            return
+
+        key = self.key(kind, inputs)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry["used"] = time.time()
+                self._count(hit=True)
+                self.dirty = True
+        if entry is not None:
+            yield entry["text"]
+            return
+
+        lines = []
+        for line in build_lines():
+            lines.append(line)
+            yield line
+        with self.lock:
+            self.entries[key] = {"kind": kind, "text": "\n".join(lines), "used": time.time()}
+            self._count(hit=False)
+            self.dirty = True
+
+    def save(self):
+        if not (self.enabled and self.dirty and self.cache_file):
+            return
+        with self.lock:
+            # Keep the most recently used fragments
+            if len(self.entries) > self.max_entries:
+                keep = sorted(self.entries.items(), key=lambda kv: kv[1]["used"], reverse=True)[:self.max_entries]
+                self.entries = dict(keep)
+            try:
+                self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+                write_text_atomic(self.cache_file, json.dumps(self.entries))
+                self.dirty = False
+            except Exception as e:
+                print(f"Warning: could not save fragment cache ({e})")
+
+_fragment_cache = None
+
+_fragment_cache_lock = threading.Lock()
+
+def get_fragment_cache() -> FragmentCache:
+    global _fragment_cache
+    cache = job_value("fragment_cache")
+    if cache is not None:
+        return cache
+    with _fragment_cache_lock:
+        if _fragment_cache is None:
+            _fragment_cache = FragmentCache(FRAGMENT_CACHE_FILE)
+        return _fragment_cache
+
+def set_fragment_cache(cache: FragmentCache):
+    """Inside job_scope() this only changes the current job's cache (-fresh)."""
+    global _fragment_cache
+    if not set_job_value("fragment_cache", cache):
+        _fragment_cache = cache
+
+def folder_fingerprint(folder, files=None) -> list:
+    """
+    (name, size, version) of every media file; version is the mtime locally
+    and the ETag remotely. Pass *files* if the folder was already listed.
+    """
+    if files is None:
+        files = get_inventory().list_media_files(folder)
+    return sorted((f.name, f.size, f.version) for f in files)
 
 # -----------------------------
 # Helper for HTML indentation
@@ -1022,7 +1121,8 @@ def _kbps_from_bitrate(br):
         except: return None
 
 def extract_encoding_info(folder: Path):
-    if not HAVE_PYMEDIAINFO:
+    MediaInfo = media_info()
+    if MediaInfo is None:
         return {"source": "Unknown", "video": "Unknown", "audio": [], "crfs": []}  # changed to list
 
     mkvs = sorted([p for p in folder.iterdir() if p.is_file() and p.suffix.lower() == ".mkv"], key=lambda p: p.name.lower())
@@ -1034,8 +1134,9 @@ def extract_encoding_info(folder: Path):
     try:
         # Extract CRFs for each MKV
         for mkv in mkvs:
-            media_info = MediaInfo.parse(str(mkv))
-            video_tracks = [t for t in media_info.tracks if getattr(t, "track_type", "").lower() == "video"]
+            check_cancelled()
+            mi = MediaInfo.parse(str(mkv))
+            video_tracks = [t for t in mi.tracks if getattr(t, "track_type", "").lower() == "video"]
             v = video_tracks[0] if video_tracks else None
             if v and getattr(v, "encoding_settings", None):
                 for part in v.encoding_settings.split(" / "):
@@ -1053,8 +1154,8 @@ def extract_encoding_info(folder: Path):
     # Video
     v = None
     try:
-        media_info = MediaInfo.parse(str(mkvs[0]))
-        video_tracks = [t for t in media_info.tracks if getattr(t, "track_type", "").lower() == "video"]
+        mi = MediaInfo.parse(str(mkvs[0]))
+        video_tracks = [t for t in mi.tracks if getattr(t, "track_type", "").lower() == "video"]
         v = video_tracks[0] if video_tracks else None
     except Exception:
         pass
@@ -1065,7 +1166,7 @@ def extract_encoding_info(folder: Path):
     # Audio
     audio_tracks = []
     try:
-        audio_tracks_all = [t for t in media_info.tracks if getattr(t, "track_type", "").lower() == "audio"]
+        audio_tracks_all = [t for t in mi.tracks if getattr(t, "track_type", "").lower() == "audio"]
         for a in audio_tracks_all:
             codec = getattr(a, "format", None) or getattr(a, "codec", None) or "Audio"
             lang = getattr(a, "language", None) or getattr(a, "language_string", None) or "und"
@@ -1116,9 +1217,39 @@ def extract_subgroup_from_filenames(filenames: list[str]) -> str:
 
 
 def build_encoding_table(folder_path: Path, display_name: str, heading_color: str):
-    info = extract_encoding_info(folder_path)
-    mkvs = sorted([p for p in folder_path.iterdir() if p.is_file() and p.suffix.lower() == ".mkv"], key=lambda p: p.name.lower())
-    subgroup_str = extract_subgroup_from_filenames([m.name for m in mkvs]) if mkvs else "Unknown"
+    return render_encoding_table(encoding_summary(folder_path), display_name, heading_color)
+
+def encoding_summary(folder_path: Path, files=None) -> dict:
+    """
+    Quality, source, video and audio description of a folder
+    ({"quality", "audio_label", "source", "video", "audio"}).
+    MediaInfo only runs when the folder's files changed since the last run.
+    *files* is the folder's media file listing, if the caller already has it.
+    """
+    inputs = encoding_inputs(folder_path, files)
+    if placeholders_on() and not get_fragment_cache().has("encoding_info", inputs) \
+            and str(folder_path) not in (job_value("encoding_info") or {}):
+        return placeholder({"quality": PENDING, "audio_label": PENDING, "source": PENDING, "video": PENDING, "audio": PENDING})
+    return json.loads(get_fragment_cache().render(
+        "encoding_info", inputs,
+        lambda: json.dumps(_encoding_summary(folder_path, files))
+    ))
+
+def encoding_inputs(folder_path: Path, files=None) -> list:
+    """What encoding_summary() is cached by."""
+    return [folder_path.name, folder_fingerprint(folder_path, files), get_settings()["ENCODER_NAME"]]
+
+def _encoding_summary(folder_path: Path, files=None) -> dict:
+    inventory = get_inventory()
+    # MediaInfo may already have been parsed ahead of the render (see pipeline.py)
+    parsed = job_value("encoding_info") or {}
+    info = parsed[str(folder_path)] if str(folder_path) in parsed else inventory.encoding_info(folder_path)
+    info = info or {"source": "Unknown", "video": "Unknown", "audio": [], "crfs": []}
+    if files is None:
+        mkv_names = inventory.mkv_names(folder_path)
+    else:
+        mkv_names = sorted((f.name for f in files if f.name.lower().endswith(".mkv")), key=str.lower)
+    subgroup_str = extract_subgroup_from_filenames(mkv_names) if mkv_names else "Unknown"
 
     # Video
     video_str = info.get("video", "Unknown").replace("HEVC", "x265")
@@ -1143,7 +1274,6 @@ def build_encoding_table(folder_path: Path, display_name: str, heading_color: st
 
     # --- Quality Detection ---
     folder_lower = folder_path.name.lower()
-    mkv_names = " ".join([m.name.lower() for m in mkvs]) if mkvs else ""
 
     # --- Tag-based BD detection ---
     m = re.search(r'[\(\[](?P<val>.*?)[\)\]]$', folder_lower)
@@ -1169,8 +1299,19 @@ def build_encoding_table(folder_path: Path, display_name: str, heading_color: st
 
     #print("Quality label:", quality_label)  # optional
 
-    title_extra = f"{quality_label}, {audio_label}"
-    source_str = f"{ENCODER_NAME} from {subgroup_str}"
+    return {
+        "quality": quality_label,
+        "audio_label": audio_label,
+        "source": f"{get_settings()['ENCODER_NAME']} from {subgroup_str}",
+        "video": video_str,
+        "audio": audio_str
+    }
+
+def render_encoding_table(summary: dict, display_name: str, heading_color: str) -> str:
+    title_extra = f"{summary['quality']}, {summary['audio_label']}"
+    source_str = summary["source"]
+    video_str = summary["video"]
+    audio_str = summary["audio"]
 
     return (
         '<table class="showInfoTable">\n'
@@ -1298,58 +1439,443 @@ def _parse_mal_data(data: dict) -> dict:
     }
 
 # =========================================================
-# OFFICIAL MAL API
+# MAL PROVIDERS
 # =========================================================
-def _fetch_official_mal_info(mal_id: str) -> dict:
-    _rate_limit()
-
-    headers = {
-        "X-MAL-CLIENT-ID": get_mal_client_id()
+# Each provider is a dict with a name, a URL template containing {mal_id} and
+# the response shape ("official" or "jikan"). MAL_PROVIDERS in the settings may
+# list preset names, custom dicts (e.g. a local stand-in server), or both.
+MAL_PROVIDER_PRESETS = {
+    "official": {
+        "name": "official",
+        "kind": "official",
+        "url": MAL_API_BASE + "/v2/anime/{mal_id}"
+    },
+    "jikan": {
+        "name": "jikan",
+        "kind": "jikan",
+        "url": JIKAN_API_BASE + "/v4/anime/{mal_id}"
     }
+}
 
-    fields = ",".join([
-        "title",
-        "alternative_titles",
-        "synopsis",
-        "start_season"
-    ])
+def get_mal_providers() -> list[dict]:
+    """Resolve the configured MAL_PROVIDERS setting into provider dicts."""
+    configured = get_settings().get("MAL_PROVIDERS") or DEFAULT_SETTINGS["MAL_PROVIDERS"]
+    providers = []
 
-    mal_url = f"https://api.myanimelist.net/v2/anime/{mal_id}"
+    for entry in configured:
+        if isinstance(entry, str):
+            preset = MAL_PROVIDER_PRESETS.get(entry.lower())
+            if not preset:
+                print(f"[MAL CONFIG] Unknown provider '{entry}' — skipping.")
+                continue
+            providers.append(dict(preset))
+        elif isinstance(entry, dict) and entry.get("url"):
+            providers.append({
+                "name": entry.get("name") or entry["url"],
+                "kind": entry.get("kind", "official"),
+                "url": entry["url"]
+            })
+        else:
+            print(f"[MAL CONFIG] Invalid provider entry {entry!r} — skipping.")
 
-    #print(f"[API] Trying OFFICIAL MAL API: {mal_url}")
+    return providers
 
-    r = requests.get(
-        mal_url,
-        headers=headers,
-        params={"fields": fields},
-        timeout=10
-    )
+def _fetch_provider_mal_info(provider: dict, mal_id: str, cancelled: threading.Event) -> dict:
+    """Fetch raw anime data from a single provider in a shape _parse_mal_data understands."""
+    if cancelled.is_set():
+        raise RuntimeError("cancelled")
+
+    url = provider["url"].format(mal_id=mal_id)
+
+    if provider["kind"] == "official":
+        client_id = get_mal_client_id()
+        if not client_id:
+            raise RuntimeError("no MAL client ID configured")
+
+        fields = ",".join([
+            "title",
+            "alternative_titles",
+            "synopsis",
+            "start_season"
+        ])
+
+        with resource_slot("mal"):
+            r = mal_session().get(
+                url,
+                headers={"X-MAL-CLIENT-ID": client_id},
+                params={"fields": fields},
+                timeout=10
+            )
+    else:
+        with resource_slot("mal"):
+            r = mal_session().get(url, timeout=10)
 
     r.raise_for_status()
+    data = r.json()
+
+    # Jikan wraps the entry in {"data": {...}}
+    if provider["kind"] == "jikan":
+        data = data.get("data") or {}
+
+    if not data.get("title"):
+        raise ValueError("response did not contain a title")
 
-    print("[API] Using OFFICIAL MAL API")
+    return data
 
-    return r.json()
+CANCEL_POLL_INTERVAL = 0.25  # seconds between cancellation checks while waiting on MAL
+
+def _fetch_hedged_mal_info(mal_id: str) -> dict:
+    """
+    Query the configured providers with hedging: the first provider starts
+    immediately and each following one starts after MAL_HEDGE_DELAY seconds
+    (or as soon as an earlier one fails). The first good answer wins and the
+    remaining requests are cancelled.
+    """
+    providers = get_mal_providers()
+    if not providers:
+        raise RuntimeError("no MAL providers configured")
+
+    check_cancelled()
+    _rate_limit()
+
+    hedge_delay = float(get_settings().get("MAL_HEDGE_DELAY", DEFAULT_SETTINGS["MAL_HEDGE_DELAY"]))
+    cancelled = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=len(providers), thread_name_prefix="mal-hedge")
+    queued = list(providers)
+    pending = {}
+    errors = []
+    job = current_job()
+
+    def fetch(provider):
+        # Part of the caller's job, so what a provider prints lands in its log (jobs.JobLog)
+        with attach_job(job):
+            return _fetch_provider_mal_info(provider, mal_id, cancelled)
+
+    try:
+        while queued or pending:
+            check_cancelled()
+            if queued:
+                provider = queued.pop(0)
+                pending[pool.submit(fetch, provider)] = provider
+
+            done, _ = wait(
+                pending,
+                timeout=hedge_delay if queued else CANCEL_POLL_INTERVAL,
+                return_when=FIRST_COMPLETED
+            )
+
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    data = future.result()
+                except Exception as e:
+                    errors.append(f"{provider['name']}: {e}")
+                    continue
+
+                print(f"[API] Using {provider['name'].upper()} MAL provider")
+                return data
+
+        raise RuntimeError("; ".join(errors) or "all providers failed")
+
+    finally:
+        # Late responses are discarded; queued requests never start
+        cancelled.set()
+        pool.shutdown(wait=False, cancel_futures=True)
 
 # =========================================================
 # MAIN API WRAPPER
 # =========================================================
+# Lookups are kept for the life of the process, so batch jobs and the
+# seasons of one post that share a MAL ID only fetch it once.
+_mal_info_cache = {}
+_mal_info_lock = threading.Lock()
+_mal_fetch_locks = {}  # MAL ID -> lock held while it's being fetched
+_mal_info_failures = {}  # MAL ID -> time of the last failed lookup
+MAL_FAILURE_TTL = 60  # seconds a failed lookup isn't retried (daemon previews, batches)
+_mal_session = None
+
+def mal_session() -> "requests.Session":
+    """Keep-alive session shared by every MAL provider request."""
+    global _mal_session
+    with _mal_info_lock:
+        if _mal_session is None:
+            _mal_session = pooled_session(8)
+        return _mal_session
+
 def get_mal_info(mal_id: str) -> dict:
+    if placeholders_on():
+        # Fast preview: only what's already known
+        info = known_mal_info(mal_id)
+        if info is not None:
+            return info
+        with _mal_info_lock:
+            failed_at = _mal_info_failures.get(str(mal_id), 0)
+        if time.time() - failed_at < MAL_FAILURE_TTL:
+            return _fallback_mal_info(mal_id)
+        return placeholder({**_fallback_mal_info(mal_id), "synopsis": PENDING})
+
+    with _mal_info_lock:
+        fetch_lock = _mal_fetch_locks.setdefault(str(mal_id), threading.Lock())
+
+    # Jobs asking for the same ID at once wait for the first one's answer
+    with fetch_lock:
+        return _get_mal_info(mal_id)
+
+def _get_mal_info(mal_id: str) -> dict:
+    with _mal_info_lock:
+        cached = _mal_info_cache.get(str(mal_id))
+        failed_at = _mal_info_failures.get(str(mal_id), 0)
+    if cached is not None:
+        return dict(cached)  # callers adjust short_title in place
+    if time.time() - failed_at < MAL_FAILURE_TTL:
+        return _fallback_mal_info(mal_id)
+
     try:
-        data = _fetch_official_mal_info(mal_id)
-        return _parse_mal_data(data)
+        data = _fetch_hedged_mal_info(mal_id)
+        info = _parse_mal_data(data)
+        remember_mal_entry(mal_id, info)
+        with _mal_info_lock:
+            _mal_info_cache[str(mal_id)] = dict(info)
+        return info
 
     except Exception as e:
         print(f"[ERROR] Failed to fetch MAL {mal_id}: {e}")
+        with _mal_info_lock:
+            _mal_info_failures[str(mal_id)] = time.time()
+        return _fallback_mal_info(mal_id)
+
+def known_mal_info(mal_id: str) -> dict | None:
+    """The remembered result of a successful lookup, without fetching anything."""
+    with _mal_info_lock:
+        cached = _mal_info_cache.get(str(mal_id))
+    return dict(cached) if cached is not None else None
+
+def prime_mal_info(mal_id: str, info: dict):
+    """Remember a lookup done elsewhere (a checkpointed queue job), so it isn't fetched again."""
+    with _mal_info_lock:
+        _mal_info_cache[str(mal_id)] = dict(info)
+
+def _fallback_mal_info(mal_id: str) -> dict:
+    return {
+        "short_title": f"Anime {mal_id}",
+        "full_title": f"Anime {mal_id}",
+        "english_title": None,
+        "synonyms": [],
+        "season_info": "",
+        "synopsis": "No synopsis available."
+    }
+
+# =========================================================
+# OFFLINE TITLE INDEX
+# =========================================================
+# Every successful MAL lookup is remembered in mal_title_index.json, and the
+# index can be bulk-seeded from a dump file. Folder names are then matched to
+# MAL IDs locally without any network search calls.
+MAL_INDEX_FILE = SETTINGS_DIR / "mal_title_index.json"
+MAL_MATCH_THRESHOLD = 0.75
+
+# New entries are kept in memory and written once by save_mal_index().
+_mal_index = None
+_mal_index_dirty = False
+_mal_index_lock = threading.Lock()
+
+def normalize_title(title: str) -> str:
+    """Lowercase, strip punctuation and normalise season markers to 's<N>'."""
+    s = title.lower().replace("&", " and ")
+    s = re.sub(r'[^a-z0-9]+', ' ', s)
+    s = re.sub(r'\b(\d+)(?:st|nd|rd|th) season\b', r's\1', s)
+    s = re.sub(r'\bseason (\d+)\b', r's\1', s)
+    s = re.sub(r'\bs0*(\d+)\b', r's\1', s)
+    return re.sub(r'\s+', ' ', s).strip()
+
+def _trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class MalTitleIndex:
+    """Searchable in-memory index over cached MAL entries."""
+
+    def __init__(self, entries: dict = None):
+        self.entries = {}   # mal_id -> {"title", "english_title", "synonyms", "season_info"}
+        self._titles = []   # (mal_id, normalized title)
+        self._grams = {}    # trigram -> set of positions in _titles
+        for mal_id, entry in (entries or {}).items():
+            self.add(mal_id, entry)
+
+    def add(self, mal_id, entry: dict):
+        mal_id = str(mal_id)
+        self.entries[mal_id] = entry
+
+        titles = [entry.get("title"), entry.get("english_title"), *(entry.get("synonyms") or [])]
+        seen = set()
+        for t in titles:
+            if not t:
+                continue
+            norm = normalize_title(t)
+            if not norm or norm in seen:
+                continue
+            seen.add(norm)
+            pos = len(self._titles)
+            self._titles.append((mal_id, norm))
+            for g in _trigrams(norm):
+                self._grams.setdefault(g, set()).add(pos)
+
+    def search(self, query: str, limit: int = 5) -> list[tuple[str, str, float]]:
+        """Return up to *limit* (mal_id, title, score) matches, best first."""
+        norm = normalize_title(query)
+        if not norm:
+            return []
+
+        # Shortlist by shared trigrams, then score with difflib
+        hits = {}
+        for g in _trigrams(norm):
+            for pos in self._grams.get(g, ()):
+                hits[pos] = hits.get(pos, 0) + 1
+        shortlist = sorted(hits, key=hits.get, reverse=True)[:200]
+
+        best = {}
+        matcher = difflib.SequenceMatcher(None, "", norm)
+        for pos in shortlist:
+            mal_id, title = self._titles[pos]
+            matcher.set_seq1(title)
+            score = matcher.ratio()
+            if score > best.get(mal_id, 0.0):
+                best[mal_id] = score
+
+        ranked = sorted(best.items(), key=lambda kv: kv[1], reverse=True)[:limit]
+        return [(mal_id, self.entries[mal_id].get("title", ""), round(score, 3)) for mal_id, score in ranked]
+
+def _load_mal_index_entries() -> dict:
+    try:
+        return json.loads(MAL_INDEX_FILE.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+    except ValueError as e:
+        # Saves are atomic, so this is a hand-edited file; keep it rather than overwrite it
+        backup = MAL_INDEX_FILE.with_name(MAL_INDEX_FILE.name + ".bad")
+        os.replace(MAL_INDEX_FILE, backup)
+        print(f"[MAL INDEX] Could not read {MAL_INDEX_FILE.name} ({e}), moved to {backup.name} — starting empty.")
+    except OSError as e:
+        print(f"[MAL INDEX] Could not read {MAL_INDEX_FILE.name} ({e}) — starting empty.")
+    return {}
+
+def get_mal_index() -> MalTitleIndex:
+    global _mal_index
+    with _mal_index_lock:
+        if _mal_index is None:
+            _mal_index = MalTitleIndex(_load_mal_index_entries())
+        return _mal_index
+
+def save_mal_index():
+    """
+    Write the title index if anything was added since the last save.
+    Entries another process saved in the meantime are kept.
+    """
+    global _mal_index_dirty
+    with _mal_index_lock:
+        if not _mal_index_dirty:
+            return
+        try:
+            on_disk = json.loads(MAL_INDEX_FILE.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            on_disk = {}
+        for mal_id, entry in on_disk.items():
+            if mal_id not in _mal_index.entries:
+                _mal_index.add(mal_id, entry)
+        try:
+            ensure_settings_dir()
+            write_text_atomic(MAL_INDEX_FILE, json.dumps(_mal_index.entries, ensure_ascii=False))
+            _mal_index_dirty = False
+        except Exception as e:
+            print(f"[MAL INDEX] Warning: could not save {MAL_INDEX_FILE.name} ({e})")
+
+def remember_mal_entry(mal_id, info: dict):
+    """Add a parsed get_mal_info() result to the offline index; save_mal_index() writes it out."""
+    global _mal_index_dirty
+    entry = {
+        "title": info.get("full_title") or info.get("short_title"),
+        "english_title": info.get("english_title"),
+        "synonyms": list(info.get("synonyms") or []),
+        "season_info": info.get("season_info", "")
+    }
+    index = get_mal_index()
+    with _mal_index_lock:
+        if index.entries.get(str(mal_id)) == entry:
+            return
+        index.add(mal_id, entry)
+        _mal_index_dirty = True
 
-        return {
-            "short_title": f"Anime {mal_id}",
-            "full_title": f"Anime {mal_id}",
+def _dump_entry_to_index(raw: dict):
+    """
+    Convert one dump record into (mal_id, entry). Understands the official API
+    shape, the Jikan shape and anime-offline-database records.
+    """
+    mal_id = raw.get("mal_id") or raw.get("id")
+    if not mal_id:
+        for src in raw.get("sources", []):
+            m = re.search(r'myanimelist\.net/anime/(\d+)', src)
+            if m:
+                mal_id = m.group(1)
+                break
+    if not mal_id or not raw.get("title"):
+        return None, None
+
+    anime_season = raw.get("animeSeason") or {}
+    if anime_season:
+        season = str(anime_season.get("season") or "")
+        year = anime_season.get("year") or ""
+        season_info = f"{season.capitalize()} {year}" if season and season != "UNDEFINED" and year else ""
+        info = {
+            "full_title": raw["title"],
             "english_title": None,
-            "synonyms": [],
-            "season_info": "",
-            "synopsis": "No synopsis available."
+            "synonyms": raw.get("synonyms", []),
+            "season_info": season_info
         }
+    else:
+        info = _parse_mal_data(raw)
+
+    return str(mal_id), {
+        "title": info["full_title"],
+        "english_title": info["english_title"],
+        "synonyms": list(info["synonyms"] or []),
+        "season_info": info["season_info"]
+    }
+
+def seed_mal_index(dump_path: Path) -> int:
+    """Bulk-load a JSON / JSON Lines dump into the offline index. Returns the number of entries added."""
+    global _mal_index_dirty
+    text = Path(dump_path).read_text(encoding="utf-8")
+    try:
+        data = json.loads(text)
+        records = data.get("data", []) if isinstance(data, dict) else data
+    except json.JSONDecodeError:
+        records = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    index = get_mal_index()
+    added = 0
+    with _mal_index_lock:
+        for raw in records:
+            mal_id, entry = _dump_entry_to_index(raw)
+            if mal_id and mal_id not in index.entries:
+                index.add(mal_id, entry)
+                added += 1
+        if added:
+            _mal_index_dirty = True
+    save_mal_index()
+
+    print(f"[MAL INDEX] Seeded {added} entries ({len(index.entries)} total).")
+    return added
+
+def suggest_mal_ids(folder_name: str, limit: int = 3) -> list[tuple[str, str, float]]:
+    """Fuzzy-match a media folder name against the offline index."""
+    return get_mal_index().search(sanitize_display_name_from_folder(folder_name), limit=limit)
+
+def resolve_mal_id(folder_name: str) -> str | None:
+    """Best offline MAL ID for a folder, or None if nothing clears MAL_MATCH_THRESHOLD."""
+    matches = suggest_mal_ids(folder_name)
+    if matches and matches[0][2] >= MAL_MATCH_THRESHOLD:
+        return matches[0][0]
+    return None
 
 # Export all functions to the main file
 __all__ = [
@@ -1361,14 +1887,15 @@ __all__ = [
     "KB", "MB", "GB",
     "FC_LC_PREFIX", "SPASTE_PREFIX", "OUO_PREFIX",
     "TORRENT_IMAGE", "DDL_IMAGE",
-    "ENCODER_NAME",
 
     # Settings
     "load_settings",
     "prompt_for_settings",
-    "SETTINGS",
-    "B2_SHOWS_BASE",
-    "B2_TORRENTS_BASE",
+    "ensure_settings",
+    "ensure_settings_dir",
+    "get_settings",
+    "set_settings",
+    "DEFAULT_SETTINGS",
 
     # Update system
     "print_startup_banner",
@@ -1379,6 +1906,8 @@ __all__ = [
     "load_processed",
     "save_processed",
     "mark_new",
+    "processed_entries",
+    "restore_processed",
 
     # Generic helpers
     "human_size_bytes",
@@ -1388,21 +1917,69 @@ __all__ = [
     "extract_version_suffix",
     "extract_crc_from_filename",
     "safe_txt_filename",
+    "write_text_atomic",
     "append_html",
 
     # URLs
     "url_for_show_file",
     "torrent_url_for_folder",
 
+    # Link verification
+    "collect_post_links",
+    "check_links",
+    "print_link_report",
+
     # CRC
     "compute_crc32",
+    "remember_crc32s",
+    "save_hash_cache",
+
+    # Inventory
+    "get_inventory",
+    "set_inventory",
+    "make_remote_inventory",
+    "upload_folders",
+    "cached_crc32",
+    "FragmentCache",
+    "get_fragment_cache",
+    "set_fragment_cache",
+    "folder_fingerprint",
+
+    # Batch jobs
+    "job_scope",
+    "job_value",
+    "current_job",
+    "attach_job",
+    "PENDING",
+    "placeholders_on",
+    "placeholder",
+    "Cancelled",
+    "CancelToken",
+    "check_cancelled",
+    "set_job_value",
+    "set_resource_limits",
+    "resource_slot",
 
     # Encoding / MediaInfo
     "detect_source_from_foldername",
     "extract_encoding_info",
+    "media_info",
+    "have_pymediainfo",
     "build_encoding_table",
+    "encoding_summary",
+    "encoding_inputs",
+    "render_encoding_table",
 
     # MAL
     "get_mal_info",
-    "get_mal_client_id"
+    "known_mal_info",
+    "prime_mal_info",
+    "get_mal_client_id",
+    "get_mal_providers",
+
+    # Offline MAL title index
+    "seed_mal_index",
+    "save_mal_index",
+    "suggest_mal_ids",
+    "resolve_mal_id"
 ]
@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+"""
+jobqueue.py
+
+Durable job queue in settings/postar_durable_queue.json, so a batch
+survives a crash or a reboot and picks up where it stopped. (The GUI keeps
+its own, unrelated queue in postar_job_queue.json.)
+
+Every change is a read-modify-write of the whole file under a lock file,
+written to a temporary file and renamed over the old one, so the queue on
+disk is always either the old or the new state. A job goes
+
+    queued -> running -> done
+                      -> queued again (retry policy) -> ... -> failed
+
+and records a checkpoint after each stage of its post:
+
+- discovered  the folders were found
+- hashed      CRC32s and MediaInfo are done (kept in the hash/fragment caches)
+- metadata    MAL data was fetched (kept in the checkpoint, along with the
+              New markers the folders had before rendering started)
+- rendered    the post was written; the job is done
+
+A job interrupted by a crash goes back to the queue when the next runner
+starts, and the stages it finished aren't redone: MAL data comes from the
+checkpoint, hashes and encoding tables from the caches, and the New
+markers are put back the way they were before the interrupted render.
+
+Failed attempts are retried up to the job's retries, waiting retry_delay
+seconds, doubled after each attempt. Only one process runs the queue at a
+time; it keeps a heartbeat in the file so a runner that died can be
+detected and replaced.
+"""
+
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from helper import SETTINGS_DIR
+from jobs import JobLog
+
+JOB_QUEUE_FILE = SETTINGS_DIR / "postar_durable_queue.json"
+STAGES = ("discovered", "hashed", "metadata", "rendered")
+DEFAULT_RETRIES = 2
+DEFAULT_RETRY_DELAY = 30.0  # seconds before the first retry, doubled after each
+HEARTBEAT_INTERVAL = 10
+HEARTBEAT_TIMEOUT = 60  # a runner silent for this long is assumed dead
+LOCK_TIMEOUT = 10
+LOCK_STALE_AFTER = 30
+LOG_TAIL_CHARS = 20_000
+
+class QueueBusy(Exception):
+    """Another live process is already running the queue."""
+
+class QueueFileError(ValueError):
+    """The queue file holds something other than a job queue."""
+
+# ----------------------
+# Queue file
+# ----------------------
+class JobQueue:
+    def __init__(self, path: Path = JOB_QUEUE_FILE):
+        self.path = Path(path)
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self.thread_lock = threading.RLock()
+
+    @contextmanager
+    def locked(self):
+        """Thread lock plus a lock file, so other postar processes wait too."""
+        with self.thread_lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            deadline = time.monotonic() + LOCK_TIMEOUT
+            while True:
+                try:
+                    fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                    os.close(fd)
+                    break
+                except FileExistsError:
+                    try:
+                        if time.time() - self.lock_path.stat().st_mtime > LOCK_STALE_AFTER:
+                            self.lock_path.unlink(missing_ok=True)  # left by a process that died holding it
+                            continue
+                    except FileNotFoundError:
+                        continue
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"{self.lock_path} is held by another process")
+                    time.sleep(0.05)
+            try:
+                yield
+            finally:
+                self.lock_path.unlink(missing_ok=True)
+
+    def read(self) -> dict:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            data = {}
+        except ValueError as e:
+            # Writes are atomic, so this is a hand-edited or foreign file; keep it for inspection
+            backup = self.path.with_name(self.path.name + ".bad")
+            os.replace(self.path, backup)
+            print(f"[Queue] {self.path.name} couldn't be read ({e}), moved to {backup.name}")
+            data = {}
+        if not isinstance(data, dict) or not isinstance(data.get("jobs", []), list):
+            # Left alone: it's most likely another tool's file (the GUI's queue is a list)
+            raise QueueFileError(f"{self.path} isn't a postar job queue file")
+        data.setdefault("version", 1)
+        data.setdefault("next_id", 1)
+        data.setdefault("runner", None)
+        data.setdefault("jobs", [])
+        return data
+
+    def write(self, data: dict):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def update(self, change):
+        """Apply change(data) to the queue file atomically; returns what change() returned."""
+        with self.locked():
+            data = self.read()
+            before = json.dumps(data, sort_keys=True)
+            result = change(data)
+            if json.dumps(data, sort_keys=True) != before:
+                self.write(data)
+            return result
+
+    def snapshot(self) -> dict:
+        with self.locked():
+            return self.read()
+
+    @staticmethod
+    def find(data: dict, job_id: str) -> dict:
+        for job in data["jobs"]:
+            if job["id"] == str(job_id):
+                return job
+        raise KeyError(f"no job {job_id} in the queue")
+
+    # ---- Jobs ----
+    def add(self, name: str, argv: list[str], keys=(), retries=DEFAULT_RETRIES, retry_delay=DEFAULT_RETRY_DELAY) -> dict:
+        def change(data):
+            job_id = str(data["next_id"])
+            data["next_id"] += 1
+            job = {
+                "id": job_id, "name": name or f"job{job_id}", "argv": list(argv), "keys": sorted(keys),
+                "status": "queued", "attempts": 0, "retries": int(retries), "retry_delay": float(retry_delay),
+                "next_attempt": 0, "stages": {}, "error": "", "result": {}, "log": "",
+                "created": time.time(), "updated": time.time()
+            }
+            data["jobs"].append(job)
+            return dict(job)
+        return self.update(change)
+
+    def get(self, job_id: str) -> dict:
+        return self.find(self.snapshot(), job_id)
+
+    def jobs(self) -> list[dict]:
+        return self.snapshot()["jobs"]
+
+    def claim(self) -> dict | None:
+        """
+        Mark the next runnable job running and return it. A job is runnable
+        once its retry wait is over and no running or earlier queued job
+        shares one of its keys (folders, output file), so jobs on the same
+        folders keep their queue order.
+        """
+        def change(data):
+            now = time.time()
+            taken = set()
+            for job in data["jobs"]:
+                if job["status"] == "running":
+                    taken.update(job["keys"])
+            for job in data["jobs"]:
+                if job["status"] != "queued":
+                    continue
+                keys = set(job["keys"])
+                if job["next_attempt"] <= now and not keys & taken:
+                    job.update(status="running", attempts=job["attempts"] + 1, started=now, updated=now)
+                    return dict(job)
+                taken |= keys
+            return None
+        return self.update(change)
+
+    def checkpoint(self, job_id: str, stage: str, data=None):
+        def change(queue):
+            job = self.find(queue, job_id)
+            job["stages"][stage] = {"at": time.time(), "data": data}
+            job["updated"] = time.time()
+        self.update(change)
+
+    def finish(self, job_id: str, result: dict, log: str = ""):
+        def change(data):
+            job = self.find(data, job_id)
+            job["stages"]["rendered"] = {"at": time.time(), "data": result}
+            job.update(status="done", result=result, error="", log=log[-LOG_TAIL_CHARS:], updated=time.time())
+        self.update(change)
+
+    def fail(self, job_id: str, error: str, log: str = "", retry=True) -> dict:
+        """Record a failed attempt: back to the queue if the retry policy allows, else failed."""
+        def change(data):
+            job = self.find(data, job_id)
+            job.update(error=error, log=log[-LOG_TAIL_CHARS:], updated=time.time())
+            if retry and job["attempts"] <= job["retries"]:
+                delay = job["retry_delay"] * 2 ** (job["attempts"] - 1)
+                job.update(status="queued", next_attempt=time.time() + delay)
+            else:
+                job["status"] = "failed"
+            return dict(job)
+        return self.update(change)
+
+    def retry(self, job_id: str = None) -> int:
+        """Queue failed jobs (one, or all of them) again from the start, with a fresh retry budget."""
+        def change(data):
+            count = 0
+            for job in data["jobs"]:
+                if job["status"] == "failed" and job_id in (None, job["id"]):
+                    job.update(status="queued", attempts=0, next_attempt=0, stages={}, error="", updated=time.time())
+                    count += 1
+            return count
+        return self.update(change)
+
+    def clear(self, statuses=("done",)) -> int:
+        def change(data):
+            before = len(data["jobs"])
+            data["jobs"] = [j for j in data["jobs"] if j["status"] not in statuses]
+            return before - len(data["jobs"])
+        return self.update(change)
+
+    def pending(self) -> tuple[int, float | None]:
+        """(jobs queued or running, seconds until the earliest retry wait is over)."""
+        jobs = self.jobs()
+        waiting = [j["next_attempt"] - time.time() for j in jobs if j["status"] == "queued"]
+        count = sum(1 for j in jobs if j["status"] in ("queued", "running"))
+        return count, max(0.0, min(waiting)) if waiting else None
+
+    # ---- Runner ----
+    def acquire_runner(self, runner_id: str):
+        """Become the process running the queue; jobs left running by a dead runner are queued again."""
+        def change(data):
+            runner = data.get("runner")
+            if runner and runner["id"] != runner_id and runner_alive(runner):
+                raise QueueBusy(f"the queue is being run by {runner['id']}")
+            data["runner"] = {"id": runner_id, "heartbeat": time.time()}
+            resumed = 0
+            for job in data["jobs"]:
+                if job["status"] == "running":
+                    # Interrupted, not failed: the attempt doesn't count
+                    job.update(status="queued", attempts=max(0, job["attempts"] - 1), next_attempt=0, updated=time.time())
+                    resumed += 1
+            return resumed
+        return self.update(change)
+
+    def heartbeat(self, runner_id: str):
+        def change(data):
+            if data.get("runner") and data["runner"]["id"] == runner_id:
+                data["runner"]["heartbeat"] = time.time()
+        self.update(change)
+
+    def release_runner(self, runner_id: str):
+        def change(data):
+            if data.get("runner") and data["runner"]["id"] == runner_id:
+                data["runner"] = None
+        self.update(change)
+
+def runner_alive(runner: dict) -> bool:
+    """A runner is alive while its heartbeat is fresh, unless it's a process on this machine that has exited."""
+    if time.time() - runner["heartbeat"] >= HEARTBEAT_TIMEOUT:
+        return False
+    host, _, pid = runner["id"].rpartition(":")
+    # os.kill(pid, 0) would terminate the process on Windows
+    if host == socket.gethostname() and pid.isdigit() and os.name != "nt":
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+    return True
+
+# ----------------------
+# Running the queue
+# ----------------------
+class QueueRunner:
+    """
+    Runs queued jobs with up to *workers* threads. run(args, checkpoint, done)
+    does one job: checkpoint(stage, data) records a stage, done maps the
+    stages an earlier attempt finished to their data. Used by --queue run
+    (until the queue is empty) and by the render daemon (until it stops).
+    """
+
+    def __init__(self, queue: JobQueue, parser, run, workers: int = 1):
+        self.queue = queue
+        self.parser = parser
+        self.run = run
+        self.workers = max(1, workers)
+        self.runner_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.log = None
+
+    def start(self) -> int:
+        """Take over the queue. Returns how many interrupted jobs were resumed."""
+        resumed = self.queue.acquire_runner(self.runner_id)
+        threading.Thread(target=self._heartbeat, name="queue-heartbeat", daemon=True).start()
+        if resumed:
+            print(f"[Queue] Resuming {resumed} interrupted job(s)")
+        return resumed
+
+    def stop(self):
+        self.stopping.set()
+        self.wakeup.set()
+
+    def _heartbeat(self):
+        while not self.stopping.wait(HEARTBEAT_INTERVAL):
+            try:
+                self.queue.heartbeat(self.runner_id)
+            except Exception as e:
+                print(f"[Queue] Heartbeat failed: {e}")
+
+    def run_jobs(self, until_empty=True):
+        """Work through the queue in worker threads; with until_empty=False, keep waiting for new jobs until stop()."""
+        threads = [threading.Thread(target=self._work, args=(until_empty,), name=f"queue-{i}", daemon=True)
+                   for i in range(self.workers)]
+        for t in threads:
+            t.start()
+        try:
+            for t in threads:
+                while t.is_alive():
+                    t.join(0.5)
+        finally:
+            self.stop()
+            self.queue.release_runner(self.runner_id)
+
+    def _work(self, until_empty: bool):
+        while not self.stopping.is_set():
+            job = self.queue.claim()
+            if job is None:
+                count, retry_in = self.queue.pending()
+                if until_empty and count == 0:
+                    return
+                self.wakeup.wait(min(1.0, retry_in) if retry_in is not None else 1.0)
+                self.wakeup.clear()
+                continue
+            self._run_job(job)
+            self.wakeup.set()  # jobs that waited on this one's folders can go
+
+    def _run_job(self, job: dict):
+        job_id, name = job["id"], job["name"]
+        done = {stage: entry["data"] for stage, entry in job["stages"].items()}
+        if done:
+            print(f"[Queue] {name}: attempt {job['attempts']}, resuming after {', '.join(s for s in STAGES if s in done)}")
+        else:
+            print(f"[Queue] {name}: attempt {job['attempts']}")
+
+        def checkpoint(stage, data=None):
+            self.queue.checkpoint(job_id, stage, data)
+            print(f"[Queue] {name}: {stage}")
+
+        outcome = {}
+
+        def attempt():
+            try:
+                args = self.parser.parse_args(job["argv"])
+            except (SystemExit, Exception):
+                outcome.update(error="invalid arguments", retry=False)
+                return
+            start = time.perf_counter()
+            try:
+                outcome["result"] = self.run(args, checkpoint, done) or {}
+            except SystemExit as e:
+                outcome.update(error=str(e.code), retry=True)
+            except Exception as e:
+                outcome.update(error=f"{type(e).__name__}: {e}", retry=True)
+            outcome["seconds"] = time.perf_counter() - start
+
+        log = capture_log(attempt)
+        if "result" in outcome:
+            self.queue.finish(job_id, outcome["result"], log)
+            print(f"[Queue] {name}: done in {outcome['seconds']:.2f}s")
+        else:
+            record = self.queue.fail(job_id, outcome["error"], log, retry=outcome["retry"])
+            if record["status"] == "queued":
+                wait = record["next_attempt"] - time.time()
+                print(f"[Queue] {name}: failed ({outcome['error']}), retrying in {wait:.0f}s")
+            else:
+                print(f"[Queue] {name}: failed ({outcome['error']})")
+                print(log, end="")
+
+_log_lock = threading.Lock()
+
+def capture_log(fn) -> str:
+    """Run fn() with its prints collected (see jobs.JobLog) and return them."""
+    with _log_lock:
+        if not isinstance(sys.stdout, JobLog):
+            sys.stdout = JobLog(sys.stdout)
+        log = sys.stdout
+    return log.capture(fn)
+
+# ----------------------
+# Inspecting
+# ----------------------
+def format_job_line(job: dict) -> str:
+    stages = ",".join(s for s in STAGES if s in job["stages"]) or "-"
+    retry = ""
+    if job["status"] == "queued" and job["next_attempt"] > time.time():
+        retry = f" (retry in {job['next_attempt'] - time.time():.0f}s)"
+    error = f"  {job['error']}" if job["error"] and job["status"] != "done" else ""
+    return f"  {job['id']:>4}  {job['status']:<8} {job['attempts']}/{job['retries'] + 1}  {stages:<35} {job['name']}{retry}{error}"
+
+def print_queue(queue: JobQueue):
+    data = queue.snapshot()
+    runner = data.get("runner")
+    if runner:
+        age = time.time() - runner["heartbeat"]
+        state = "alive" if runner_alive(runner) else "not responding"
+        print(f"[Queue] Runner {runner['id']} ({state}, last seen {age:.0f}s ago)")
+    if not data["jobs"]:
+        print(f"[Queue] {queue.path} is empty")
+        return
+    print("    id  status   try  stages                              name")
+    for job in data["jobs"]:
+        print(format_job_line(job))
+
+def print_job(queue: JobQueue, job_id: str):
+    job = queue.get(job_id)
+    print(format_job_line(job).strip())
+    print(f"  argv: {' '.join(job['argv'])}")
+    for stage in STAGES:
+        if stage in job["stages"]:
+            print(f"  {stage:<10} {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(job['stages'][stage]['at']))}")
+    if job["result"]:
+        print(f"  result: {json.dumps(job['result'])}")
+    if job["log"]:
+        print("  --- log of the last attempt ---")
+        print(job["log"], end="" if job["log"].endswith("\n") else "\n")
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+jobs.py
+
+Batch jobs: many post definitions run in one process (--batch jobs.json).
+
+A jobs file is JSON (or YAML, if PyYAML is installed) holding either a list
+of jobs or {"defaults": {...}, "jobs": [...]}. A job is one of:
+
+- a command line string:  "-p /media/Show -a IMG -d IMG -c blue -m 41623 -o show.txt"
+- a list of arguments:    ["-p", "/media/Show", "-a", "IMG", ...]
+- an object of options, keyed by their long names (dashes or underscores):
+  {"name": "show", "paths": ["/media/Show"], "airing_image": "IMG", "crc": true, ...}
+  An "args" entry (string or list) is appended to the options.
+
+"defaults" are options every job starts from; a job's own values win.
+Settings, the HTTP pools, MAL lookups, hashes and rendered fragments are
+loaded once and shared by every job, and a failing job doesn't stop the
+rest of the batch.
+
+With workers > 1 (--jobs N) jobs run side by side in threads. Jobs that
+share a resource (a folder, an output file) still run one after another in
+file order, so every output is the same as in a one-at-a-time run. Each
+job's log is printed in one piece when it finishes.
+"""
+
+import io
+import json
+import shlex
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+
+from helper import job_scope, job_value, set_job_value
+
+class Job:
+    __slots__ = ("name", "argv", "args", "status", "result", "error", "seconds")
+
+    def __init__(self, name: str, argv: list[str]):
+        self.name = name
+        self.argv = argv
+        self.args = None
+        self.status = "queued"
+        self.result = {}
+        self.error = ""
+        self.seconds = 0.0
+
+# ----------------------
+# Jobs file
+# ----------------------
+def read_jobs_file(path: Path):
+    text = Path(path).read_text(encoding="utf-8")
+    if Path(path).suffix.lower() in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("YAML jobs files need PyYAML (pip install pyyaml), or use JSON") from None
+        try:
+            return yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise ValueError(str(e)) from None
+    return json.loads(text)
+
+def option_flags(parser) -> dict:
+    """Option dest -> the flag to pass it with (the long one where there is one)."""
+    flags = {}
+    for action in parser._actions:
+        if action.option_strings:
+            long_flags = [o for o in action.option_strings if o.startswith("--")]
+            flags[action.dest] = (long_flags or action.option_strings)[0]
+    return flags
+
+def options_to_argv(parser, options: dict) -> list[str]:
+    flags = option_flags(parser)
+    argv = []
+    for key, value in options.items():
+        if key in ("name", "args"):
+            continue
+        flag = flags.get(key.replace("-", "_"))
+        if flag is None:
+            raise ValueError(f"unknown option '{key}'")
+        if value is True:
+            argv.append(flag)
+        elif value is False or value is None:
+            continue
+        elif isinstance(value, (list, tuple)):
+            argv += [flag, *map(str, value)]
+        else:
+            argv += [flag, str(value)]
+    return argv
+
+def job_argv(parser, entry, defaults: dict) -> tuple[str | None, list[str]]:
+    """(name, argv) of one jobs-file entry."""
+    if isinstance(entry, str):
+        return None, options_to_argv(parser, defaults) + shlex.split(entry)
+    if isinstance(entry, list):
+        return None, options_to_argv(parser, defaults) + [str(a) for a in entry]
+    if isinstance(entry, dict):
+        extra = entry.get("args") or []
+        extra = shlex.split(extra) if isinstance(extra, str) else [str(a) for a in extra]
+        return entry.get("name"), options_to_argv(parser, {**defaults, **entry}) + extra
+    raise ValueError(f"a job must be a string, a list or an object, not {type(entry).__name__}")
+
+def load_jobs(path: Path, parser) -> list[Job]:
+    data = read_jobs_file(path)
+    defaults = {}
+    if isinstance(data, dict):
+        defaults = data.get("defaults") or {}
+        data = data.get("jobs")
+    if not isinstance(data, list):
+        raise ValueError("expected a list of jobs (or {\"jobs\": [...]})")
+
+    jobs = []
+    for idx, entry in enumerate(data, 1):
+        try:
+            name, argv = job_argv(parser, entry, defaults)
+        except ValueError as e:
+            # Only this job fails; the rest of the batch still runs
+            name = entry.get("name") if isinstance(entry, dict) else None
+            job = Job(name or f"job{idx}", [])
+            job.status = "failed"
+            job.error = str(e)
+            jobs.append(job)
+            continue
+        jobs.append(Job(name or default_job_name(argv, idx), argv))
+    return jobs
+
+def default_job_name(argv: list[str], idx: int) -> str:
+    for flag in ("--output", "-o"):
+        if flag in argv[:-1]:
+            return Path(argv[argv.index(flag) + 1]).stem
+    return f"job{idx}"
+
+# ----------------------
+# Running
+# ----------------------
+def parse_job(job: Job, parser) -> Job:
+    try:
+        job.args = parser.parse_args(job.argv)
+    except SystemExit:
+        job.status = "failed"
+        job.error = "invalid arguments (see above)"
+    return job
+
+def run_job(job: Job, run) -> Job:
+    """Hand the job's parsed arguments to run(args). Failures are recorded on the job."""
+    job.status = "running"
+    start = time.perf_counter()
+    try:
+        job.result = run(job.args) or {}
+        job.status = "done"
+    except SystemExit as e:
+        # sys.exit("message") inside a post
+        job.status = "failed"
+        job.error = str(e.code)
+    except Exception as e:
+        job.status = "failed"
+        job.error = f"{type(e).__name__}: {e}"
+    job.seconds = time.perf_counter() - start
+    return job
+
+def print_job_summary(jobs: list[Job], elapsed: float):
+    done = sum(1 for j in jobs if j.status == "done")
+    failed = sum(1 for j in jobs if j.status == "failed")
+    print(f"\n[Batch] {len(jobs)} job(s): {done} done, {failed} failed in {elapsed:.2f}s")
+    width = max((len(j.name) for j in jobs), default=0)
+    for job in jobs:
+        if job.status == "done":
+            r = job.result
+            print(f"  ok    {job.name:<{width}}  {job.seconds:7.2f}s  {r.get('output', '')}  "
+                  f"({r.get('reused', 0)} fragment(s) reused, {r.get('rendered', 0)} rendered)")
+        else:
+            print(f"  FAIL  {job.name:<{width}}  {job.seconds:7.2f}s  {job.error}")
+
+class JobLog:
+    """
+    sys.stdout stand-in while jobs run in threads: whatever a job prints is
+    collected and handed back in one piece when it finishes, so the logs of
+    jobs running side by side don't interleave. That includes worker threads
+    running part of the job (helper.attach_job: MAL lookups, hashing and
+    MediaInfo in pipeline.py). Other threads, and a job's background work
+    that outlives it, write through.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def _buffer(self):
+        buffer = getattr(self.local, "buffer", None)
+        if buffer is None:
+            holder = job_value("log")
+            buffer = holder[0] if holder else None
+        return buffer
+
+    def write(self, text: str) -> int:
+        return (self._buffer() or self.stream).write(text)
+
+    def flush(self):
+        if self._buffer() is None:
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+    def capture(self, fn, *args) -> str:
+        """Call fn(*args) and return everything it printed."""
+        buffer = io.StringIO()
+        holder = [buffer]  # emptied when the job is over
+        self.local.buffer = buffer
+        try:
+            with job_scope():
+                set_job_value("log", holder)
+                fn(*args)
+            return buffer.getvalue()
+        finally:
+            holder[0] = None
+            self.local.buffer = None
+
+def job_dependencies(jobs: list[Job], resources) -> dict:
+    """Job -> the earlier jobs it shares a resource with (and has to wait for)."""
+    keys = {}
+    for job in jobs:
+        try:
+            keys[job] = set(resources(job.args)) if resources else set()
+        except Exception:
+            keys[job] = None  # unknown: wait for everything before it
+    return {
+        job: [other for other in jobs[:idx] if keys[job] is None or keys[other] is None or keys[job] & keys[other]]
+        for idx, job in enumerate(jobs)
+    }
+
+def run_parallel(jobs: list[Job], run, workers: int, resources=None):
+    """Run jobs in up to *workers* threads, holding each back until the jobs it depends on are finished."""
+    after = job_dependencies(jobs, resources)
+    waiting = list(jobs)
+    pending = {}
+    log = JobLog(sys.stdout)
+    sys.stdout = log
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job") as pool:
+            while waiting or pending:
+                for job in [j for j in waiting if all(d.status in ("done", "failed") for d in after[j])]:
+                    waiting.remove(job)
+                    job.status = "running"
+                    pending[pool.submit(log.capture, run_job, job, run)] = job
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = pending.pop(future)
+                    log.stream.write(f"\n[Batch] {job.name}\n{future.result()}")
+                    if job.status == "failed":
+                        log.stream.write(f"[Batch] {job.name} failed: {job.error}\n")
+                    log.stream.flush()
+    finally:
+        sys.stdout = log.stream
+
+def run_batch(path: Path, parser, run, workers: int = 1, resources=None) -> bool:
+    """
+    Run every job in the jobs file, *workers* at a time (one after another
+    by default). resources(args) names what a job works on, for ordering
+    jobs that share something. Returns True if they all succeeded.
+    """
+    try:
+        jobs = load_jobs(path, parser)
+    except (OSError, ValueError) as e:
+        print(f"[Batch] Can't read {path}: {e}")
+        return False
+
+    for job in jobs:
+        if job.status == "queued":
+            parse_job(job, parser)
+
+    workers = max(1, min(workers, len(jobs)))
+    print(f"[Batch] {len(jobs)} job(s) from {path}" + (f", {workers} at a time" if workers > 1 else ""))
+    start = time.perf_counter()
+    runnable = [j for j in jobs if j.status == "queued"]
+    if workers > 1:
+        run_parallel(runnable, run, workers, resources)
+    else:
+        for idx, job in enumerate(jobs, 1):
+            print(f"\n[Batch] ({idx}/{len(jobs)}) {job.name}")
+            if job in runnable:
+                run_job(job, run)
+            if job.status == "failed":
+                print(f"[Batch] {job.name} failed: {job.error}")
+
+    print_job_summary(jobs, time.perf_counter() - start)
+    return all(j.status == "done" for j in jobs)
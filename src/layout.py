@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+layout.py
+
+Row and pane templates for the post layouts (regular, CRC column, kage).
+
+Each layout variant is compiled once per run: constants such as the link
+prefixes and images are substituted up front, the variant's branches
+(CRC column, kage toggle) are resolved to a single template, and what's
+left is compiled into a function that the row loops call with a dict of
+per-row fields (strings) only.
+
+User templates: pass a folder with --layout. Any <name>.html file in it
+replaces the built-in template of the same name (see DEFAULT_TEMPLATES).
+Templates use str.format fields; write literal braces as {{ and }}.
+"""
+
+import re
+import string
+from pathlib import Path
+
+from helper import FC_LC_PREFIX, SPASTE_PREFIX, OUO_PREFIX, TORRENT_IMAGE, DDL_IMAGE, job_value, set_job_value
+
+# ----------------------
+# Built-in templates
+# ----------------------
+DEFAULT_TEMPLATES = {
+    # Fields: label, size, url
+    "episode_row": (
+        '            <tr>\n'
+        '                <td>{label}</td>\n'
+        '                <td>{size}</td>\n'
+        '                <td><a href="{spaste}{url}"><img src="{ddl_image}"></a></td>\n'
+        '                <td><a href="{ouo}{url}"><img src="{ddl_image}"></a></td>\n'
+        '                <td><a href="{fc_lc}{url}"><img src="{ddl_image}"></a></td>\n'
+        '            </tr>'
+    ),
+    # Fields: label, size, crc, url
+    "episode_row_crc": (
+        '            <tr>\n'
+        '                <td>{label}</td>\n'
+        '                <td>{size}</td>\n'
+        '                <td>{crc}</td>\n'
+        '                <td><a href="{spaste}{url}"><img src="{ddl_image}"></a></td>\n'
+        '                <td><a href="{ouo}{url}"><img src="{ddl_image}"></a></td>\n'
+        '                <td><a href="{fc_lc}{url}"><img src="{ddl_image}"></a></td>\n'
+        '            </tr>'
+    ),
+    "episode_header": (
+        '            <tr>\n'
+        '                <th>Episode</th>\n'
+        '                <th>Size</th>\n'
+        '                <th>Spaste</th>\n'
+        '                <th>Ouo.io</th>\n'
+        '                <th>Fc.lc</th>\n'
+        '            </tr>'
+    ),
+    "episode_header_crc": (
+        '            <tr>\n'
+        '                <th>Episode</th>\n'
+        '                <th>Size</th>\n'
+        '                <th>CRC32</th>\n'
+        '                <th>Spaste</th>\n'
+        '                <th>Ouo.io</th>\n'
+        '                <th>Fc.lc</th>\n'
+        '            </tr>'
+    ),
+    # Fields: quality, size, torrent
+    "batch_row": (
+        '        <tr>\n'
+        '            <td>{quality}</td>\n'
+        '            <td>{size}</td>\n'
+        '            <td><a href="{spaste}{torrent}"><img src="{torrent_image}"></a></td>\n'
+        '            <td><a href="{ouo}{torrent}"><img src="{torrent_image}"></a></td>\n'
+        '            <td><a href="{fc_lc}{torrent}"><img src="{torrent_image}"></a></td>\n'
+        '        </tr>'
+    ),
+    "batch_header": (
+        '        <tr>\n'
+        '            <th>Quality</th>\n'
+        '            <th>Size</th>\n'
+        '            <th>Spaste</th>\n'
+        '            <th>Ouo.io</th>\n'
+        '            <th>Fc.lc</th>\n'
+        '        </tr>'
+    ),
+    # Fields: folder, title
+    "toggle_open": (
+        '<p style="text-align:center;">\n'
+        '    <button class="button1" title="Click to Show / Hide Links" type="button" '
+        'onclick="var e=document.getElementById(\'{folder}_hidden\'); '
+        'e.style.display=(e.style.display==\'none\'?\'\':\'none\')">{title}</button>\n'
+        '</p>\n'
+        '<div id="{folder}_hidden" style="display:none; align:center">'
+    ),
+    "toggle_open_kage": '<div style="align:center">',
+    "toggle_close": '</div>',
+}
+
+# Substituted when a layout is compiled
+LAYOUT_CONSTANTS = {
+    "spaste": SPASTE_PREFIX,
+    "ouo": OUO_PREFIX,
+    "fc_lc": FC_LC_PREFIX,
+    "ddl_image": DDL_IMAGE,
+    "torrent_image": TORRENT_IMAGE,
+}
+
+# Per-row fields each template may use
+TEMPLATE_FIELDS = {
+    "episode_row": {"label", "size", "url"},
+    "episode_row_crc": {"label", "size", "crc", "url"},
+    "episode_header": set(),
+    "episode_header_crc": set(),
+    "batch_row": {"quality", "size", "torrent"},
+    "batch_header": set(),
+    "toggle_open": {"folder", "title"},
+    "toggle_open_kage": {"folder", "title"},
+    "toggle_close": set(),
+}
+
+def compile_template(name: str, text: str):
+    """
+    Bake the constants into *text* and turn it into a function of the
+    per-row fields dict. Plain templates become a str.join over the
+    literal chunks and field values, parsed once, which is cheaper per
+    row than formatting the whole template again.
+    """
+    try:
+        parsed = list(string.Formatter().parse(text))
+    except ValueError as e:
+        raise ValueError(f"[Layout] Template '{name}' is invalid: {e!r}") from None
+
+    # Fail now, not halfway through a post, if the template asks for a field it won't get
+    unknown = {field for _, field, _, _ in parsed if field is not None} - TEMPLATE_FIELDS[name] - LAYOUT_CONSTANTS.keys()
+    if unknown:
+        raise ValueError(f"[Layout] Template '{name}' uses unknown field(s): {', '.join(sorted(unknown))}")
+
+    # Format specs / conversions ({size:>10}, {title!r}) keep the slower generic path
+    if any(spec or conversion for _, field, spec, conversion in parsed if field is not None):
+        return lambda f: text.format_map({**LAYOUT_CONSTANTS, **f})
+
+    # (is_literal, text or field name); parsing already turned {{ and }} into single braces
+    parts = []
+    for literal, field, _, _ in parsed:
+        if field in LAYOUT_CONSTANTS:
+            literal += LAYOUT_CONSTANTS[field]
+            field = None
+        if literal:
+            if parts and parts[-1][0]:
+                literal = parts.pop()[1] + literal
+            parts.append((True, literal))
+        if field is not None:
+            parts.append((False, field))
+    parts = tuple(parts)
+    return lambda f: "".join([p if lit else f[p] for lit, p in parts])
+
+def load_templates(layout_dir=None) -> dict:
+    templates = dict(DEFAULT_TEMPLATES)
+    if layout_dir:
+        folder = Path(layout_dir)
+        if not folder.is_dir():
+            raise ValueError(f"[Layout] Template folder not found: {folder}")
+        for name in DEFAULT_TEMPLATES:
+            path = folder / f"{name}.html"
+            if path.is_file():
+                templates[name] = path.read_text(encoding="utf-8").rstrip("\r\n")
+                print(f"[Layout] Using {path.name} from {folder}")
+    return templates
+
+# ----------------------
+# Compiled layouts
+# ----------------------
+class Layout:
+    """Renderers for one layout variant. Each attribute is called with a dict of per-row fields."""
+    __slots__ = ("episode_row", "episode_header", "batch_row", "batch_header", "toggle_open", "toggle_close")
+
+    def __init__(self, templates: dict, crc_enabled=False, kage=False):
+        row = "episode_row_crc" if crc_enabled else "episode_row"
+        header = "episode_header_crc" if crc_enabled else "episode_header"
+        toggle = "toggle_open_kage" if kage else "toggle_open"
+        self.episode_row = compile_template(row, templates[row])
+        self.episode_header = compile_template(header, templates[header])
+        self.batch_row = compile_template("batch_row", templates["batch_row"])
+        self.batch_header = compile_template("batch_header", templates["batch_header"])
+        self.toggle_open = compile_template(toggle, templates[toggle])
+        self.toggle_close = compile_template("toggle_close", templates["toggle_close"])
+
+_templates = None
+_layouts = {}
+
+def set_layout_dir(layout_dir):
+    """
+    Load user templates (None for the built-in ones). Drops layouts compiled
+    so far. Inside helper.job_scope() only the current job's layout changes.
+    """
+    global _templates
+    templates = load_templates(layout_dir)
+    if set_job_value("layout", (templates, {})):
+        return
+    _templates = templates
+    _layouts.clear()
+
+def get_layout(crc_enabled=False, kage=False) -> Layout:
+    global _templates
+    key = (bool(crc_enabled), bool(kage))
+    job_layout = job_value("layout")
+    if job_layout is not None:
+        templates, layouts = job_layout
+        if key not in layouts:
+            layouts[key] = Layout(templates, crc_enabled=crc_enabled, kage=kage)
+        return layouts[key]
+
+    layout = _layouts.get(key)
+    if layout is None:
+        if _templates is None:
+            _templates = load_templates()
+        layout = _layouts[key] = Layout(_templates, crc_enabled=crc_enabled, kage=kage)
+    return layout
+
+# ----------------------
+# Compact output
+# ----------------------
+# Inline handlers/styles repeated on every toggle are shortened, not moved:
+# post hosts often strip <script>/<style> blocks, and the toggles have to
+# keep working wherever the regular post does. Element ids are left alone,
+# so the BD pane switching in playcools_js_code.js keeps working.
+_COMPACT_TOGGLE = ('onclick="var e=document.getElementById(\'\\2\');'
+                   'e.style.display=e.style.display==\'none\'?\'\':\'none\'">')
+
+COMPACT_REWRITES = [
+    # Episode show/hide button
+    (re.compile(r'<button class="button1" (title="[^"]*" type="button") onclick="var e=document\.getElementById\(\'([^\']*)\'\); '
+                r'e\.style\.display=\(e\.style\.display==\'none\'\?\'\':\'none\'\)">'),
+     r'<button class="button1" \1 ' + _COMPACT_TOGGLE),
+    # Donate banner button
+    (re.compile(r'<button (title="[^"]*" type="button") onclick="if\(document\.getElementById\(\'([^\']*)\'\)\.style\.display==\'none\'\) '
+                r'\{document\.getElementById\(\'[^\']*\'\)\.style\.display=\'\'\} '
+                r'else\{document\.getElementById\(\'[^\']*\'\)\.style\.display=\'none\'\}">'),
+     r'<button \1 ' + _COMPACT_TOGGLE),
+    # align isn't a CSS property, so dropping it changes nothing
+    (re.compile(r' style="display:none; align:center"'), ' style="display:none"'),
+    (re.compile(r'<(p|div) style="(?:width: 100%; )?text-align: ?center;">'), r'<\1 style="text-align:center">'),
+    (re.compile(r'<div style="align:center">'), '<div>'),
+]
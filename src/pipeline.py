@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+pipeline.py
+
+Overlaps the slow parts of a post instead of doing them season by season.
+Every season is a small task graph run on an asyncio event loop in a
+background thread:
+
+    season:  MAL lookup ────────────────────────┐
+             folder: listing ──┬── MediaInfo ───┴──> season ready
+                               └── CRC32s (one task per file)
+
+Waiting on the network (MAL, bucket listings) happens in the I/O pool,
+file reads for CRC32s in the disk pool and MediaInfo parses in the CPU
+pool, so the three overlap across seasons and folders. The shared
+resource caps (helper.resource_slot) still apply on top.
+
+The post itself is still built in order by iter_post_blocks(), which waits
+for each season to be ready before building it. Results reach it through
+the usual places: the MAL memo, the hash cache (rows still being hashed
+are waited for, not read twice) and the job's parsed MediaInfo. The post
+comes out byte for byte as it would sequentially, and New markers are
+recorded in the same order.
+
+For fast previews (fill_caches=True) nothing waits for the pipeline: it
+works out what the preview showed as placeholders and leaves the results
+in the shared caches (MAL memo, hash cache, fragment cache), so the next
+render of the post has them.
+
+Tasks run as part of the job that started the pipeline, so its cancel
+token (helper.CancelToken) stops them too: queued tasks don't start and
+running ones stop at their next file or chunk. A background fill of a
+preview that has been superseded doesn't keep reading files.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from classify import classify_filename
+from helper import (RESOURCE_LIMITS, attach_job, check_cancelled, current_job, encoding_inputs, encoding_summary,
+                    get_fragment_cache, get_inventory, get_mal_info, job_value, set_job_value)
+
+IO_WORKERS = 4
+
+class SeasonWork:
+    """One season of the post: its MAL ID and folders (the 720p one too, for BD toggles)."""
+    __slots__ = ("mal_id", "folders", "ready")
+
+    def __init__(self, mal_id: str, folders: list[Path]):
+        self.mal_id = mal_id
+        self.folders = folders
+        self.ready = threading.Event()
+
+# Background pipelines of fast previews of the same folders parse each one once
+_encoding_locks = {}
+_encoding_locks_lock = threading.Lock()
+
+class PostPipeline:
+    """
+    wait(index) blocks until a season is ready; progress counts finished
+    tasks and done is set once everything has finished.
+    """
+
+    def __init__(self, seasons: list[SeasonWork], crc_enabled=False, fill_caches=False):
+        self.seasons = seasons
+        self.crc_enabled = crc_enabled
+        self.fill_caches = fill_caches
+        self.pools = {
+            "io": ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="post-io"),
+            "disk": ThreadPoolExecutor(max_workers=RESOURCE_LIMITS["disk"], thread_name_prefix="post-disk"),
+            "cpu": ThreadPoolExecutor(max_workers=RESOURCE_LIMITS["mediainfo"], thread_name_prefix="post-cpu"),
+        }
+        self.hashing = []
+        self.job = None
+        self.thread = None
+        self.progress = 0
+        self.progress_lock = threading.Lock()  # tasks finish on several pool threads
+        self.done = threading.Event()
+
+    def start(self):
+        if self.fill_caches:
+            # The real lookups and parses, not the preview's placeholders
+            self.job = {**(current_job() or {}), "fragment_counts": [0, 0]}
+            self.job.pop("placeholders", None)
+        else:
+            # MediaInfo parsed ahead of the render, by folder (used by helper._encoding_summary)
+            set_job_value("encoding_info", {})
+            self.job = current_job()
+        self.thread = threading.Thread(target=self._main, name="post-pipeline", daemon=True)
+        self.thread.start()
+        return self
+
+    def wait(self, index: int):
+        """Block until season *index* (BD seasons first, then the rest) is ready to build."""
+        if index < len(self.seasons):
+            self.seasons[index].ready.wait()
+
+    def close(self):
+        """Drop work that hasn't started (the post is done or failed). Files being read are finished."""
+        for pool in self.pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        if self.thread:
+            self.thread.join()
+
+    # ---- Event loop ----
+    def _main(self):
+        try:
+            asyncio.run(self._run())
+        finally:
+            # Whatever happened, the render goes on (and redoes anything missing itself)
+            for season in self.seasons:
+                season.ready.set()
+            for pool in self.pools.values():
+                pool.shutdown(wait=False)
+            self.done.set()
+
+    async def _run(self):
+        await asyncio.gather(*(self._season(s) for s in self.seasons), return_exceptions=True)
+        await asyncio.gather(*self.hashing, return_exceptions=True)
+
+    def _call(self, pool: str, fn, *args):
+        def work():
+            try:
+                with attach_job(self.job):
+                    check_cancelled()
+                    return fn(*args)
+            finally:
+                with self.progress_lock:
+                    self.progress += 1
+        return asyncio.get_running_loop().run_in_executor(self.pools[pool], work)
+
+    async def _season(self, season: SeasonWork):
+        try:
+            await asyncio.gather(self._call("io", get_mal_info, season.mal_id),
+                                 *(self._folder(f) for f in season.folders),
+                                 return_exceptions=True)
+        finally:
+            season.ready.set()
+
+    async def _folder(self, folder: Path):
+        files = await self._call("io", lambda: get_inventory().list_media_files(folder))
+        if self.crc_enabled:
+            for f in files:
+                # Same rule as the episode rows: only names without a CRC tag are hashed
+                if not classify_filename(f.name).crc:
+                    self.hashing.append(self._call("disk", lambda f=f: get_inventory().crc32(folder, f)))
+        await self._call("cpu", self._encoding_info, folder, files)
+
+    def _encoding_info(self, folder: Path, files):
+        if self.fill_caches:
+            with _encoding_locks_lock:
+                lock = _encoding_locks.setdefault(str(folder), threading.Lock())
+            with lock:
+                encoding_summary(folder, files)
+            return
+        if get_fragment_cache().has("encoding_info", encoding_inputs(folder, files)):
+            return
+        job_value("encoding_info")[str(folder)] = get_inventory().encoding_info(folder)
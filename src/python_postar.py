@@ -12,39 +12,72 @@ v0.55:
 # --- Imports and constants ---
 from datetime import date
 import time
+_imports_started = time.perf_counter()
 import sys
 import os, re, json, argparse
+import contextlib
+import io
+import threading
 from pathlib import Path
 from helper import *
+from document import Post, Season, Pane, Table, Row, LazyLines, QualitySection, render, write_stream, CompactWriter, STREAM_BUFFER_SIZE
+from layout import get_layout, set_layout_dir, COMPACT_REWRITES
+from formats import FORMAT_WRITERS, FORMAT_EXTENSIONS
+from classify import sorted_episodes, classify_filename
+from jobs import run_batch, load_jobs, parse_job
+from jobqueue import JobQueue, QueueRunner, QueueBusy, QueueFileError, print_queue, print_job, DEFAULT_RETRIES, DEFAULT_RETRY_DELAY
+from worker import write_manifest, merge_results, worker_main
+# daemon.py (http.server) and pipeline.py (asyncio) are imported where they're used
+
+# Time taken by the imports above (--import-time); -v and the first post start after them
+IMPORT_SECONDS = time.perf_counter() - _imports_started
+IMPORT_TIME_BUDGET = 0.06  # seconds
 
 #ORIGINAL_ARGV = sys.argv.copy()
 #if SETTINGS.get("AUTO_UPDATE", True):
     #check_for_github_update()
 
+# A post opens its [s2If] block once, in its first season. Tracked per thread
+# since batch jobs can build several posts at the same time.
+_post_state = threading.local()
+
 # -----------------------------
 # BD / season block
 # -----------------------------
-def build_season_block(folder1080: Path, folder720: Path, heading_color: str, season_index: int, mal_id: str, bd_toggle=False, bd_images=None, is_airing=False, crc_enabled=False, kage=False):
+def build_synopsis_table(mal_id: str, mal_info: dict, heading_color: str) -> Table:
+    header_title = mal_info.get("english_title") or mal_info["full_title"]
+    return Table(
+        ['<table class="kshowSynopsisTable"><thead><tr>',
+         f'<th colspan="1"><span style="color: {heading_color};">'
+         f'<a style="color: {heading_color};" href="https://myanimelist.net/anime/{mal_id}" target="_blank" rel="noopener noreferrer">'
+         f'<strong>{header_title}</strong></a></span> | {mal_info["short_title"]}</th></tr></thead>'],
+        [f'<tbody><tr><td>{mal_info["synopsis"]}<!--more--></td></tr></tbody></table>']
+    )
+
+def season_info(mal_id: str, mal_info: dict) -> dict:
+    return {
+        "mal_id": mal_id,
+        "mal_url": f"https://myanimelist.net/anime/{mal_id}",
+        "title": mal_info.get("english_title") or mal_info["full_title"],
+        "short_title": mal_info["short_title"],
+        "synopsis": mal_info["synopsis"]
+    }
+
+def build_season_block(folder1080: Path, folder720: Path, heading_color: str, season_index: int, mal_id: str, bd_toggle=False, bd_images=None, is_airing=False, crc_enabled=False, kage=False) -> Season:
     idx_name = ["first", "second", "third", "fourth", "fifth", "sixth", "seventh", "eighth", "ninth", "tenth"]
     season_id = idx_name[season_index] if season_index < len(idx_name) else f"season{season_index + 1}"
-    out_lines = []
+    season = Season()
     mal_info = get_mal_info(mal_id)
-    header_title = mal_info.get("english_title") or mal_info["full_title"]
     if mal_info["season_info"]:
         mal_info["short_title"] += f" ({mal_info['season_info']})"
 
-    if not globals().get("_s2if_opened", False):
-        out_lines.append('[s2If is_user_logged_in()]')
-        globals()["_s2if_opened"] = True
+    if not getattr(_post_state, "s2if_opened", False):
+        season.add('[s2If is_user_logged_in()]')
+        _post_state.s2if_opened = True
 
     # Synopsis table
-    out_lines.append('<table class="kshowSynopsisTable"><thead><tr>')
-    out_lines.append(
-        f'<th colspan="1"><span style="color: {heading_color};">'
-        f'<a style="color: {heading_color};" href="https://myanimelist.net/anime/{mal_id}" target="_blank" rel="noopener noreferrer">'
-        f'<strong>{header_title}</strong></a></span> | {mal_info["short_title"]}</th></tr></thead>'
-    )
-    out_lines.append(f'<tbody><tr><td>{mal_info["synopsis"]}<!--more--></td></tr></tbody></table>')
+    season.add(build_synopsis_table(mal_id, mal_info, heading_color))
+    season.info = season_info(mal_id, mal_info)
 
     # BD toggle buttons
     if bd_toggle:
@@ -54,295 +87,70 @@ def build_season_block(folder1080: Path, folder720: Path, heading_color: str, se
             bd1080_img = bd_images[season_index*2]
         if bd_images and len(bd_images) > season_index*2 + 1:
             bd720_img = bd_images[season_index*2 + 1]
-        out_lines.append('<div style="width: 100%; text-align: center;">')
-        out_lines.append(
+
+        # The merged batch table goes ABOVE the buttons
+        season.batch_at = len(season.children)
+        season.add('<div style="width: 100%; text-align: center;">')
+        season.add(
             f'<div style="margin: 0px 0px 25px 0px; display: infline-flex;">'
             f'<a id="{season_id}_season_bd1080" href="#"><img id="{season_id}_season_bd1080on" src="{bd1080_img}" alt="BD 1080p" style="width:50%;"></a>'
             f'<a id="{season_id}_season_bd720" href="#"><img id="{season_id}_season_bd720on" src="{bd720_img}" alt="BD 720p" style="width:50%;"></a>'
             '</div></div>'
         )
-        out_lines.append(f'<div id="{season_id}_season_bd1080pane">')
-        out_lines.extend(build_quality_table(folder1080, mal_info, heading_color, is_airing=is_airing, crc_enabled=crc_enabled, kage=kage))
-        out_lines.append('</div>')
-        out_lines.append(f'<div id="{season_id}_season_bd720pane">')
-        out_lines.extend(build_quality_table(folder720, mal_info, heading_color, is_airing=is_airing, crc_enabled=crc_enabled, kage=kage))
-        out_lines.append('</div>')
+        for folder, pane_id in ((folder1080, "bd1080pane"), (folder720, "bd720pane")):
+            section = build_quality_table(folder, mal_info, heading_color, is_airing=is_airing, crc_enabled=crc_enabled, kage=kage)
+            season.sections.append(section)
+            season.add(Pane([f'<div id="{season_id}_season_{pane_id}">'], [section], ['</div>']))
     else:
         # Non-BD normal table
-        out_lines.extend(build_quality_table(folder1080, mal_info, heading_color, crc_enabled=crc_enabled, kage=kage))
-
-    # -------------------------
-    # REORDER: Batch table vs Button block
-    # If bd_toggle/args.bd is True → batch table goes ABOVE the buttons
-    # -------------------------
-    if bd_toggle:  # or args.bd if passed in directly
-        # Find first </table> (end of batch table)
-        batch_end = None
-        for i, line in enumerate(out_lines):
-            if "</table>" in line:
-                batch_end = i + 1
-                break
-
-        if batch_end:
-            batch_block = out_lines[:batch_end]
-
-            # Button block is always the next 2–3 lines (<p> + <div>)
-            # We detect the <p> that contains the BD toggle button
-            button_start = None
-            for i in range(batch_end, len(out_lines)):
-                if "<p" in out_lines[i] and "hide" in out_lines[i]:
-                    button_start = i
-                    break
-
-            if button_start:
-                # button block = <p>...</p> AND <div ...>
-                button_block = out_lines[button_start:button_start + 2]
-                episode_block = out_lines[button_start + 2:]
-
-                # Rebuild in the new order
-                out_lines[:] = batch_block + button_block + episode_block
-
-    return "\n".join(out_lines)
+        section = build_quality_table(folder1080, mal_info, heading_color, crc_enabled=crc_enabled, kage=kage)
+        season.sections.append(section)
+        season.add(section)
+
+    return season
 
 # -----------------------------
 # Non-BD block with MAL synopsis
 # -----------------------------
-def build_nonbd_block(folder_path: Path, heading_color: str, mal_id: str, is_airing=False, crc_enabled=False, kage=False):
-    out_lines = []
+def build_nonbd_block(folder_path: Path, heading_color: str, mal_id: str, is_airing=False, crc_enabled=False, kage=False) -> Season:
+    season = Season()
     mal_info = get_mal_info(mal_id)
-    header_title = mal_info.get("english_title") or mal_info["full_title"]
     if mal_info["season_info"]:
         mal_info["short_title"] += f" ({mal_info['season_info']})"
 
-    if not globals().get("_s2if_opened", False):
-        out_lines.append('[s2If is_user_logged_in()]')
-        globals()["_s2if_opened"] = True
+    if not getattr(_post_state, "s2if_opened", False):
+        season.add('[s2If is_user_logged_in()]')
+        _post_state.s2if_opened = True
 
     # Synopsis table
-    out_lines.append('<table class="kshowSynopsisTable"><thead><tr>')
-    out_lines.append(
-        f'<th colspan="1"><span style="color: {heading_color};">'
-        f'<a style="color: {heading_color};" href="https://myanimelist.net/anime/{mal_id}" target="_blank" rel="noopener noreferrer">'
-        f'<strong>{header_title}</strong></a></span> | {mal_info["short_title"]}</th></tr></thead>'
-    )
-    out_lines.append(f'<tbody><tr><td>{mal_info["synopsis"]}<!--more--></td></tr></tbody></table>')
+    season.add(build_synopsis_table(mal_id, mal_info, heading_color))
+    season.info = season_info(mal_id, mal_info)
 
     # Episode table
-    out_lines.extend(build_quality_table(folder_path, mal_info, heading_color, is_airing=is_airing, crc_enabled=crc_enabled, kage=kage))
-    return "\n".join(out_lines)
+    section = build_quality_table(folder_path, mal_info, heading_color, is_airing=is_airing, crc_enabled=crc_enabled, kage=kage)
+    season.sections.append(section)
+    season.add(section)
+    return season
 
 # -----------------------------
 # Episode tables
 # -----------------------------
 def build_quality_table(folder_path: Path, mal_info=None, heading_color="#000000", is_airing=False, crc_enabled=False, kage=False):
-    mkv_files = [p for p in folder_path.iterdir() if p.is_file() and p.suffix.lower() in (".mkv", ".rar", ".zip")]
-    episodes = []
+    inventory = get_inventory()
     folder_basename = folder_path.name
 
-    # --- Helper functions ---
-    def is_op_ed(fname: str):
-        return bool(re.search(r'(?<![A-Za-z0-9])(OP|ED)[ _-]?\d{1,2}(?![A-Za-z0-9])', fname, re.IGNORECASE))
-
-    def op_ed_label(fname: str):
-        m = re.search(r'(OP|ED)[ _-]?\d{1,2}', fname, re.IGNORECASE)
-        return m.group(0).upper().replace("_", "").replace("-", "") if m else fname
-
-    def is_special(name: str, tag: str):
-        return bool(re.search(rf'(?<![A-Za-z0-9]){tag}(?:[ _\-]*?(\d{{1,3}}))?(?![A-Za-z0-9])', name, re.IGNORECASE))
-
-    def special_label(name: str, tag: str):
-        m = re.search(rf'(?<![A-Za-z0-9]){tag}(?:[ _\-]*?(\d{{1,3}}))?(?![A-Za-z0-9])', name, re.IGNORECASE)
-        num = m.group(1) if m else None
-        return tag.upper() + (num if num else "")
-
-    def is_extras(name: str):
-        return "extras" in name.lower()
-
-    def is_movie(name: str):
-        return bool(re.search(r'(?<![A-Za-z0-9])movie(?![A-Za-z0-9])', name, re.IGNORECASE))
-
-    def extract_special_label(name: str):
-        """
-        Extracts full special label for OVA / ONA / OAD / SP
-        only when it appears after the '_-_' separator.
-        """
-
-        m = re.search(
-            r'_-_(?P<label>'
-            r'(?P<tag>OVA|ONA|OAD|SP)'
-            r'(?:[ _\-]*\d{1,3}(?:\.\d)?)?'
-            r'(?:_[^()]+)?'
-            r')',
-            name,
-            re.IGNORECASE
-        )
-
-        if not m:
-            return None
-
-        return m.group("label").rstrip('_')
+    # --- Episode records, in table order ---
+    episodes_sorted = sorted_episodes(inventory.list_media_files(folder_path), is_airing=is_airing)
 
-    def extract_movie_label(name: str):
-        """
-        Extracts full movie label, including decimals:
-        Movie_08.5_vs_Detective_Conan_Special
-        """
-
-        m = re.search(
-            r'-_\s*(Movie(?:[ _\-]?\d{1,2}(?:\.\d)?)?(?:_[^_()]+)*)',
-            name,
-            re.IGNORECASE
-        )
-        if not m:
-            return None
-
-        return m.group(1).rstrip('_')
-
-    def extract_dash_label(name: str):
-        # Original regex but we capture the label
-        m = re.search(r'-_([A-Za-z0-9_]*[A-Za-z][A-Za-z0-9_]*)(?=_\(|$)', name)
-        if not m:
-            return None
-
-        label = m.group(1).strip()
-
-        # Reject things that start with a number → it's an episode, not dash label
-        # Examples: 01, 01v2, 12, 24a
-        if re.match(r'^\d', label):
-            return None
-
-        return label
-        return None
-
-    # --- Build episodes list ---
-    for p in mkv_files:
-        fname = p.name
-        fsize = p.stat().st_size
-        dash_label = extract_dash_label(fname)
-
-        if is_op_ed(fname):
-            raw = op_ed_label(fname)
-            category = "op" if raw.startswith("OP") else "ed"
-            label = raw
-            epnum = None
-        elif is_special(fname, "OVA"):
-            category = "ova"
-            label = extract_special_label(fname) or "OVA"
-            epnum = None
-        elif is_special(fname, "ONA"):
-            category = "ona"
-            label = extract_special_label(fname) or "ONA"
-            epnum = None
-        elif is_special(fname, "OAD"):
-            category = "oad"
-            label = extract_special_label(fname) or "OAD"
-            epnum = None
-        elif is_special(fname, "SP"):
-            category = "sp"
-            label = extract_special_label(fname) or "SP"
-            epnum = None
-        elif is_extras(fname):
-            category = "extras"
-            label = "Extras"
-            epnum = None
-        elif is_movie(fname):
-            category = "dash"
-            movie_dash = extract_movie_label(fname)
-            if movie_dash:
-                label = movie_dash
-            else:
-                label = "MOVIE"
-            epnum = None
-        elif dash_label:
-            category = "dash"
-            label = dash_label.upper()
-            epnum = None
-        else:
-            epnum = find_episode_number(fname)
-            if isinstance(epnum, int):
-                category = "episode"
-
-                # Detect v2/v3/etc
-                ver = extract_version_suffix(fname)
-
-                if ver:
-                    label = f"{epnum:02d}{ver}"
-                else:
-                    label = f"{epnum:02d}"
-            else:
-                category = "extras"
-                label = fname
-                epnum = None
-
-        series_name = re.split(r'_-\s*\d{1,3}', fname)[0].strip()
-        crc_in_name = extract_crc_from_filename(fname)
-        crc_val = crc_in_name if crc_in_name else compute_crc32(p)
-
-        episodes.append({
-            "series": series_name,
-            "filename": fname,
-            "size_bytes": fsize,
-            "size_human": human_size_bytes(fsize),
-            "episode": epnum,
-            "label": label,
-            "category": category,
-            "crc32": crc_val,
-            "crc_from_name": bool(crc_in_name)
-        })
-
-    #for x in episodes:
-        #print(x["filename"], "=>", x["category"])
-
-    # --- Sorting ---
-    def build_sorted_episodes(episodes, is_airing=False):
-        if is_airing:
-            def ep_sort_key(item):
-                cat = item["category"].lower()
-                if cat in ("ova", "oad", "ona", "sp"):
-                    cat = "special"
-                order = {"episode": 0, "special": 1, "ed": 2, "op": 3, "dash": 4, "extras": 5}
-                cat_order = order.get(cat, 999)
-                return (item["series"].lower(), cat_order, item.get("episode", 9999), item["filename"].lower())
-            return sorted(episodes, key=ep_sort_key)
-        else:
-            def ep_sort_key(item):
-                cat = item["category"].lower()
-                if cat in ("ova", "oad", "ona", "sp"):
-                    cat = "special"
-                order = {"episode": 0, "special": 1, "ed": 2, "op": 3, "dash": 4, "extras": 5}
-                cat_order = order.get(cat, 999)
-                if cat == "episode":
-                    return (cat_order, item.get("episode", 9999))
-                else:
-                    return (cat_order, item["filename"].lower())
-            return sorted(episodes, key=ep_sort_key)
-
-    episodes_sorted = build_sorted_episodes(episodes, is_airing=is_airing)
-
-    # --- HTML Generation with proper indentation ---
-    total_bytes = sum((p.stat().st_size for p in folder_path.rglob("*") if p.is_file()), 0)
+    # --- Document nodes ---
+    total_bytes = inventory.total_bytes(folder_path)
     total_size_str = total_size_gb_str(total_bytes)
     batch_is_new = mark_new(folder_basename)
     batch_sup = "<sup>New</sup>" if batch_is_new else ""
     torrent_path_for_folder = torrent_url_for_folder(folder_basename)
     anime_title = mal_info.get("english_title") if mal_info else sanitize_display_name_from_folder(folder_path.name)
 
-    out_lines = []
-
     # Batch torrent table
-    out_lines.append('<table class="batchLinksTable">')
-    out_lines.append('    <thead>')
-    out_lines.append(f'        <tr><th colspan="5"><span style="color: {heading_color};"><strong>{anime_title} Batch Torrent</strong></span></th></tr>')
-    out_lines.append('    </thead>')
-    out_lines.append('    <tbody>')
-    out_lines.append('        <tr>')
-    out_lines.append('            <th>Quality</th>')
-    out_lines.append('            <th>Size</th>')
-    out_lines.append('            <th>Spaste</th>')
-    out_lines.append('            <th>Ouo.io</th>')
-    out_lines.append('            <th>Fc.lc</th>')
-    out_lines.append('        </tr>')
-    out_lines.append('        <tr>')
     quality_label = (
         "BD 1080p" if "bd" in (re.search(r'[\(\[](.*?)[\)\]]$', folder_basename.lower()) or [None,""])[1].lower() 
                       and "1080" in (re.search(r'[\(\[](.*?)[\)\]]$', folder_basename.lower()) or [None,""])[1].lower() else
@@ -352,227 +160,228 @@ def build_quality_table(folder_path: Path, mal_info=None, heading_color="#000000
         "720p"     if "720"  in (re.search(r'[\(\[](.*?)[\)\]]$', folder_basename.lower()) or [None,""])[1].lower() else
         "Unknown Quality"
     )
-    out_lines.append(f'            <td>{quality_label}{batch_sup}</td>')
-    out_lines.append(f'            <td>{total_size_str}</td>')
-    out_lines.append(f'            <td><a href="{SPASTE_PREFIX}{torrent_path_for_folder}"><img src="{TORRENT_IMAGE}"></a></td>')
-    out_lines.append(f'            <td><a href="{OUO_PREFIX}{torrent_path_for_folder}"><img src="{TORRENT_IMAGE}"></a></td>')
-    out_lines.append(f'            <td><a href="{FC_LC_PREFIX}{torrent_path_for_folder}"><img src="{TORRENT_IMAGE}"></a></td>')
-    out_lines.append('        </tr>')
-    out_lines.append('    </tbody>')
-    out_lines.append('</table>')
-
-    # Episodes table (toggle unless -kage is used)
-    if not kage:
-        out_lines.append('<p style="text-align:center;">')
-        out_lines.append(
-            f'    <button class="button1" title="Click to Show / Hide Links" '
-            f'type="button" '
-            f'onclick="var e=document.getElementById(\'{folder_basename}_hidden\'); '
-            f'e.style.display=(e.style.display==\'none\'?\'\':\'none\')">'
-            f'{anime_title}</button>'
-        )
-        out_lines.append('</p>')
-        out_lines.append(f'<div id="{folder_basename}_hidden" style="display:none; align:center">')
-    else:
-        # No toggle, no hidden div
-        out_lines.append('<div style="align:center">')
-
-    out_lines.append('    <table class="showLinksTable">')
-    out_lines.append('        <thead>')
-    out_lines.append(f'            <tr><th colspan="6"><span style="color: {heading_color};"><strong>{anime_title}</strong></span></th></tr>')
-    out_lines.append('        </thead>')
-    out_lines.append('        <thead>')
-    out_lines.append('            <tr>')
-    out_lines.append('                <th>Episode</th>')
-    out_lines.append('                <th>Size</th>')
-    if crc_enabled:
-        out_lines.append('                <th>CRC32</th>')
-    out_lines.append('                <th>Spaste</th>')
-    out_lines.append('                <th>Ouo.io</th>')
-    out_lines.append('                <th>Fc.lc</th>')
-    out_lines.append('            </tr>')
-    out_lines.append('        </thead>')
-    out_lines.append('        <tbody>')
-
+    layout = get_layout(crc_enabled=crc_enabled, kage=kage)
+    batch_table = build_batch_table(layout, anime_title, heading_color)
+    batch_table.add(batch_row(layout, f"{quality_label}{batch_sup}", total_size_str, torrent_path_for_folder))
+
+    # Episodes table (show/hide toggle unless -kage is used)
+    toggle = {"folder": folder_basename, "title": str(anime_title)}
+    pane = Pane([layout.toggle_open(toggle)], tail=[layout.toggle_close(toggle)])
+
+    episode_table = pane.add(Table(
+        ['    <table class="showLinksTable">',
+         '        <thead>',
+         f'            <tr><th colspan="6"><span style="color: {heading_color};"><strong>{anime_title}</strong></span></th></tr>',
+         '        </thead>',
+         '        <thead>'],
+        [Row(layout.episode_header),
+         '        </thead>',
+         '        <tbody>'],
+        ['        </tbody>',
+         '    </table>']
+    ))
+
+    # New markers are recorded for every row, cached or not
     for e in episodes_sorted:
-        #print(f"{e['filename']} -> CRC32: {e['crc32']}")
-        label = e["label"]
-        filename = e["filename"]
-        if mark_new(folder_basename, label, filename):
-            label += "<sup>New</sup>"
-        file_url = url_for_show_file(folder_basename, filename)
-
-        out_lines.append('            <tr>')
-        out_lines.append(f'                <td>{label}</td>')
-        out_lines.append(f'                <td>{e["size_human"]}</td>')
-        if crc_enabled:
-            out_lines.append(f'                <td>{e["crc32"]}</td>')
-        out_lines.append(f'                <td><a href="{SPASTE_PREFIX}{file_url}"><img src="{DDL_IMAGE}"></a></td>')
-        out_lines.append(f'                <td><a href="{OUO_PREFIX}{file_url}"><img src="{DDL_IMAGE}"></a></td>')
-        out_lines.append(f'                <td><a href="{FC_LC_PREFIX}{file_url}"><img src="{DDL_IMAGE}"></a></td>')
-        out_lines.append('            </tr>')
-
-    out_lines.append('        </tbody>')
-    out_lines.append('    </table>')
-    out_lines.append('</div>')
-
-    return out_lines
+        e.new = mark_new(folder_basename, e.label, e.name)
+    labels = [e.label + "<sup>New</sup>" if e.new else e.label for e in episodes_sorted]
+
+    def crc_for(e):
+        # Only hash (or ask the bucket) when the CRC column is shown
+        if not e.crc and crc_enabled:
+            check_cancelled()
+            e.crc = inventory.crc32(folder_path, e.file) or "Unknown"
+        return e.crc
+
+    # Fast previews show CRC32s that aren't known yet as placeholders
+    pending_crcs = False
+    if crc_enabled and placeholders_on():
+        for e in episodes_sorted:
+            if not e.crc:
+                known, crc = inventory.known_crc32(folder_path, e.file)
+                e.crc = (crc or "Unknown") if known else placeholder()
+                pending_crcs = pending_crcs or not known
+
+    def render_rows():
+        # Rows are rendered (and hashed) one at a time, as the post is written
+        render_row = layout.episode_row
+        for e, label in zip(episodes_sorted, labels):
+            #print(f"{e.name} -> CRC32: {e.crc}")
+            fields = {"label": label, "size": human_size_bytes(e.size), "url": url_for_show_file(folder_basename, e.name)}
+            if crc_enabled:
+                fields["crc"] = crc_for(e)
+            yield render_row(fields)
+
+    if episodes_sorted and pending_crcs:
+        # Not cached: the placeholders would outlive the preview
+        episode_table.add(LazyLines(render_rows()))
+    elif episodes_sorted:
+        inputs = [
+            folder_basename,
+            [(e.name, e.size, e.file.version, label) for e, label in zip(episodes_sorted, labels)],
+            crc_enabled,
+            url_for_show_file(folder_basename, ""),
+            layout.episode_row({"label": "", "size": "", "crc": "", "url": ""})
+        ]
+        episode_table.add(LazyLines(get_fragment_cache().stream("episodes", inputs, render_rows)))
+
+    def episode_records():
+        return [{
+            "label": e.label,
+            "new": e.new,
+            "category": e.category,
+            "filename": e.name,
+            "size": human_size_bytes(e.size),
+            "size_bytes": e.size,
+            "crc32": crc_for(e),
+            "url": url_for_show_file(folder_basename, e.name)
+        } for e in episodes_sorted]
+
+    info = {
+        "folder": folder_basename,
+        "title": anime_title,
+        "quality": quality_label,
+        "size": total_size_str,
+        "size_bytes": total_bytes,
+        "torrent": torrent_path_for_folder,
+        "new": batch_is_new,
+        "encoding": None
+    }
+    return QualitySection(batch_table, episode_table, pane, info=info, records=episode_records, files=episodes_sorted)
+
+def build_batch_table(layout, title: str, heading_color: str, merged=False) -> Table:
+    """Batch torrent table without its data rows. Merged BD tables keep the header row in its own <tbody>."""
+    children = [Row(layout.batch_header)]
+    if merged:
+        children += ['    </tbody>', '    <tbody>']
+    return Table(
+        ['<table class="batchLinksTable">',
+         '    <thead>',
+         f'        <tr><th colspan="5"><span style="color: {heading_color};"><strong>{title} Batch Torrent</strong></span></th></tr>',
+         '    </thead>',
+         '    <tbody>'],
+        children,
+        ['    </tbody>',
+         '</table>']
+    )
+
+def batch_row(layout, quality: str, size: str, torrent_path: str) -> Row:
+    return Row(layout.batch_row, {"quality": quality, "size": size, "torrent": torrent_path})
 
 # -----------------------------
 # Build HTML block (modified to use single s2If and add href to donations)
 # Also integrated encoding table generation before cover images.
 # -----------------------------
-def build_html_block(folders1080, folders720, non_bd_folders, mal_ids, span_colors, airing_img, donate_imgs, bd_toggle, bd_images, is_airing=False, crc_enabled=False, kage=False):
-    out_lines = []
-
-    # single s2If opens once for all show content
-    s2if_opened = False
+def post_mal_ids(mal_ids, bd_seasons: int, other_seasons: int) -> list:
+    """
+    The -m IDs spread over the seasons in post order: BD seasons take them
+    in turn and fall back to the first, the other seasons cycle through
+    them from the start.
+    """
+    season_mal_ids = [mal_ids[i] if i < len(mal_ids) else mal_ids[0] for i in range(bd_seasons)]
+    return season_mal_ids + [mal_ids[i % len(mal_ids)] for i in range(other_seasons)]
+
+def iter_post_blocks(folders1080, folders720, non_bd_folders, season_mal_ids, span_colors, airing_img, donate_imgs, bd_toggle, bd_images, is_airing=False, crc_enabled=False, kage=False, pipeline=None):
+    """
+    Yield the post's top-level blocks (cover images, seasons, footer) as each
+    one is finished, so they can be written out before the next is built.
+    *season_mal_ids* has one MAL ID per season, BD seasons first.
+    With a *pipeline* (pipeline.py) each season waits for its lookups,
+    hashes and MediaInfo, which run ahead in the background.
+    """
+    # Each post opens its own [s2If] block (batch runs build several posts)
+    _post_state.s2if_opened = False
 
     # BD seasons
     for idx, folder1080 in enumerate(folders1080):
         folder720 = folders720[idx] if idx < len(folders720) else Path()
-        mal_id = mal_ids[idx] if idx < len(mal_ids) else mal_ids[0]
+        mal_id = season_mal_ids[idx]
         heading_color = span_colors[idx % len(span_colors)]
         airing_src = airing_img[idx] if isinstance(airing_img, list) and idx < len(airing_img) else airing_img[0] if isinstance(airing_img, list) else airing_img
         display_name = sanitize_display_name_from_folder(folder1080.name)
 
         # --- Cover image ---
-        out_lines.append(f'<a class="coverImage"><img title="{display_name}" src="{airing_src}"></a>')
+        yield (f'<a class="coverImage"><img title="{display_name}" src="{airing_src}"></a>')
 
         # --- Full season block ---
-        season_block = build_season_block(folder1080, folder720, heading_color, idx, mal_id, bd_toggle, bd_images, is_airing=is_airing, crc_enabled=crc_enabled, kage=kage)
-
-        # --- 1080p encoding table ---
-        enc_1080 = build_encoding_table(folder1080, display_name, heading_color)
-        if enc_1080:
-            season_block = season_block.replace(
-                '<table class="showLinksTable">',
-                f'{enc_1080}\n<table class="showLinksTable">', 1
-            )
+        check_cancelled()
+        if pipeline:
+            pipeline.wait(idx)
+        season = build_season_block(folder1080, folder720, heading_color, idx, mal_id, bd_toggle, bd_images, is_airing=is_airing, crc_enabled=crc_enabled, kage=kage)
+        season.info.update(cover=airing_src, display_name=display_name)
+
+        # --- 1080p encoding table above the episodes ---
+        summary_1080 = encoding_summary(folder1080, season.sections[0].media_files())
+        season.sections[0].info["encoding"] = summary_1080
+        season.sections[0].episodes.prefix = render_encoding_table(summary_1080, display_name, heading_color)
 
         # --- 720p encoding table inside bd720pane ---
-        if folder720.exists():
-            enc_720 = build_encoding_table(folder720, display_name, heading_color)
-            if enc_720:
-                def insert_720_table(match):
-                    div_id = match.group(1)
-                    div_content = match.group(2)
-                    new_content = re.sub(
-                        r'(<table class="showLinksTable">)',
-                        f'{enc_720}\n\\1',
-                        div_content,
-                        count=1
-                    )
-                    return f'<div id="{div_id}">{new_content}</div>'
-
-                season_block = re.sub(
-                    r'<div id="([^"]*_bd720pane)">(.*?)</div>',
-                    insert_720_table,
-                    season_block,
-                    flags=re.DOTALL
-                )
+        if len(season.sections) > 1 and get_inventory().exists(folder720):
+            summary_720 = encoding_summary(folder720, season.sections[1].media_files())
+            season.sections[1].info["encoding"] = summary_720
+            season.sections[1].episodes.prefix = render_encoding_table(summary_720, display_name, heading_color)
 
         # ----------------------------------------------------------
-        # Build single batch table with BD 1080p and BD 720p
+        # Single batch table with BD 1080p and BD 720p
         # ----------------------------------------------------------
         if bd_toggle:
-            # Remove any existing batch table for this season
-            start_tag = '<table class="batchLinksTable">'
-            end_tag = '</table>'
-            start_idx = season_block.find(start_tag)
-            while start_idx != -1:
-                end_idx = season_block.find(end_tag, start_idx)
-                if end_idx == -1:
-                    break
-                season_block = season_block[:start_idx] + season_block[end_idx + len(end_tag):]
-                start_idx = season_block.find(start_tag)
-
-            # Build new batch table
-            batch_lines = []
-            batch_lines.append('<table class="batchLinksTable">')
-            batch_lines.append('    <thead>')
-            batch_lines.append(f'        <tr><th colspan="5"><span style="color: {heading_color};"><strong>{display_name} Batch Torrent</strong></span></th></tr>')
-            batch_lines.append('    </thead>')
-            batch_lines.append('    <tbody>')
-            batch_lines.append('        <tr>')
-            batch_lines.append('            <th>Quality</th>')
-            batch_lines.append('            <th>Size</th>')
-            batch_lines.append('            <th>Spaste</th>')
-            batch_lines.append('            <th>Ouo.io</th>')
-            batch_lines.append('            <th>Fc.lc</th>')
-            batch_lines.append('        </tr>')
-            batch_lines.append('    </tbody>')
-            batch_lines.append('    <tbody>')
+            # Drop the per-pane batch tables for this season
+            for section in season.sections:
+                section.detach_batch()
+
+            layout = get_layout(crc_enabled=crc_enabled, kage=kage)
+            batch_table = build_batch_table(layout, display_name, heading_color, merged=True)
 
             # 1080p row
-            total_bytes_1080 = sum((p.stat().st_size for p in folder1080.rglob("*") if p.is_file()), 0)
-            total_size_1080 = total_size_gb_str(total_bytes_1080)
-            torrent_path_1080 = torrent_url_for_folder(folder1080.name)
-            new_tag = "<sup>New</sup>" if mark_new(str(folder1080)) else ""
-            batch_lines.append(f'        <tr>')
-            batch_lines.append(f'            <td>BD 1080p{new_tag}</td>')
-            batch_lines.append(f'            <td>{total_size_1080}</td>')
-            batch_lines.append(f'            <td><a href="{SPASTE_PREFIX}{torrent_path_1080}"><img src="{TORRENT_IMAGE}"></a></td>')
-            batch_lines.append(f'            <td><a href="{OUO_PREFIX}{torrent_path_1080}"><img src="{TORRENT_IMAGE}"></a></td>')
-            batch_lines.append(f'            <td><a href="{FC_LC_PREFIX}{torrent_path_1080}"><img src="{TORRENT_IMAGE}"></a></td>')
-            batch_lines.append(f'        </tr>')
+            total_bytes_1080 = get_inventory().total_bytes(folder1080)
+            season.sections[0].info["new"] = mark_new(str(folder1080))
+            new_tag = "<sup>New</sup>" if season.sections[0].info["new"] else ""
+            batch_table.add(batch_row(layout, f"BD 1080p{new_tag}", total_size_gb_str(total_bytes_1080), torrent_url_for_folder(folder1080.name)))
 
             # 720p row (only if exists)
-            if folder720.exists():
-                total_bytes_720 = sum((p.stat().st_size for p in folder720.rglob("*") if p.is_file()), 0)
-                total_size_720 = total_size_gb_str(total_bytes_720)
-                torrent_path_720 = torrent_url_for_folder(folder720.name)
-                new_tag = "<sup>New</sup>" if mark_new(str(folder720)) else ""
-                batch_lines.append(f'        <tr>')
-                batch_lines.append(f'            <td>BD 720p{new_tag}</td>')
-                batch_lines.append(f'            <td>{total_size_720}</td>')
-                batch_lines.append(f'            <td><a href="{SPASTE_PREFIX}{torrent_path_720}"><img src="{TORRENT_IMAGE}"></a></td>')
-                batch_lines.append(f'            <td><a href="{OUO_PREFIX}{torrent_path_720}"><img src="{TORRENT_IMAGE}"></a></td>')
-                batch_lines.append(f'            <td><a href="{FC_LC_PREFIX}{torrent_path_720}"><img src="{TORRENT_IMAGE}"></a></td>')
-                batch_lines.append(f'        </tr>')
-
-            batch_lines.append('    </tbody>')
-            batch_lines.append('</table>')
-
-            batch_table = "\n".join(batch_lines)
-
-            # Insert **once** after the synopsis but before the BD buttons
-            insert_pos = season_block.find('<div style="width: 100%; text-align: center;">')
-            season_block = season_block[:insert_pos] + batch_table + "\n" + season_block[insert_pos:]
-                
-        out_lines.append(season_block)
+            if get_inventory().exists(folder720):
+                total_bytes_720 = get_inventory().total_bytes(folder720)
+                season.sections[1].info["new"] = mark_new(str(folder720))
+                new_tag = "<sup>New</sup>" if season.sections[1].info["new"] else ""
+                batch_table.add(batch_row(layout, f"BD 720p{new_tag}", total_size_gb_str(total_bytes_720), torrent_url_for_folder(folder720.name)))
+
+            # Once, after the synopsis but before the BD buttons
+            season.children.insert(season.batch_at, batch_table)
+
+        yield (season)
 
     # Non-BD folders
     for idx, folder in enumerate(non_bd_folders):
         heading_color = span_colors[idx % len(span_colors)]
-        mal_id = mal_ids[idx % len(mal_ids)]
+        mal_id = season_mal_ids[len(folders1080) + idx]
         airing_src = airing_img[idx] if isinstance(airing_img, list) and idx < len(airing_img) else airing_img
         display_name = sanitize_display_name_from_folder(folder.name)
 
         # --- Cover image ---
-        out_lines.append(f'<a class="coverImage"><img title="{display_name}" src="{airing_src}"></a>')
+        yield (f'<a class="coverImage"><img title="{display_name}" src="{airing_src}"></a>')
 
         # --- Full non-BD block ---
-        nonbd_block = build_nonbd_block(folder, heading_color, mal_id, is_airing=is_airing, crc_enabled=crc_enabled, kage=kage)
+        check_cancelled()
+        if pipeline:
+            pipeline.wait(len(folders1080) + idx)
+        season = build_nonbd_block(folder, heading_color, mal_id, is_airing=is_airing, crc_enabled=crc_enabled, kage=kage)
+        season.info.update(cover=airing_src, display_name=display_name)
 
         # --- Encoding table for non-BD above episodes ---
-        enc_table = build_encoding_table(folder, display_name, heading_color)
-        if enc_table:
-            nonbd_block = nonbd_block.replace(
-                '<table class="showLinksTable">',
-                f'{enc_table}\n<table class="showLinksTable">', 1
-            )
+        summary = encoding_summary(folder, season.sections[0].media_files())
+        season.sections[0].info["encoding"] = summary
+        season.sections[0].episodes.prefix = render_encoding_table(summary, display_name, heading_color)
 
-        out_lines.append(nonbd_block)
+        yield (season)
 
     # Close single s2If before donations
-    out_lines.append('[/s2If]')
+    yield ('[/s2If]')
 
     # ----------------------------------------
     # Donation section (disabled when kage)
     # ----------------------------------------
     if donate_imgs and not kage:
-        out_lines.append(
+        yield (
             f'<a class="donateImage" href="https://hi10anime.com/?page_id=70">'
             f'<img src="{donate_imgs[0]}" alt="Please Donate" title="Please Donate">'
             f'</a>'
@@ -580,21 +389,21 @@ def build_html_block(folders1080, folders720, non_bd_folders, mal_ids, span_colo
 
         if len(donate_imgs) > 1:
             donate_id = "Donate_Global"
-            out_lines.append(
+            yield (
                 f'<p style="text-align: center;"><button title="Click to show / hide Donate Banners" type="button" '
                 f'onclick="if(document.getElementById(\'{donate_id}\').style.display==\'none\') '
                 f'{{document.getElementById(\'{donate_id}\').style.display=\'\'}} '
                 f'else{{document.getElementById(\'{donate_id}\').style.display=\'none\'}}">'
                 'Donate</button></p>'
             )
-            out_lines.append(f'<div id="{donate_id}" style="display:none; align:center">')
+            yield (f'<div id="{donate_id}" style="display:none; align:center">')
             for img in donate_imgs[1:]:
-                out_lines.append(
+                yield (
                     f'<a class="donateImage" href="https://hi10anime.com/?page_id=70">'
                     f'<img src="{img}" alt="Please Donate" title="Please Donate">'
                     f'</a>'
                 )
-            out_lines.append("</div>")
+            yield ("</div>")
 
     # ----------------------------------------
     # Kage Discord widget (end of post)
@@ -623,9 +432,9 @@ def build_html_block(folders1080, folders720, non_bd_folders, mal_ids, span_colo
             )
 
         if banner_html:
-            out_lines.append(banner_html)
+            yield (banner_html)
 
-        out_lines.append(
+        yield (
             '<div style="margin-left: auto; margin-right: auto; text-align: center;'
             'padding-top: 10px; padding-bottom: 10px; background-color: #7289da;'
             'border-radius: 10px; color: white; font-weight: 600;'
@@ -639,12 +448,19 @@ def build_html_block(folders1080, folders720, non_bd_folders, mal_ids, span_colo
         )
 
     # JS include
-    out_lines.append('<script type="text/javascript" src="https://xlordnoro.github.io/playcools_js_code.js"></script>')
+    yield ('<script type="text/javascript" src="https://xlordnoro.github.io/playcools_js_code.js"></script>')
 
-    # Default output filename
-    txt_name = safe_txt_filename(str(folders1080[0] if folders1080 else (non_bd_folders[0] if non_bd_folders else "output")))
 
-    return "\n".join(out_lines), txt_name
+def default_output_name(folders1080, non_bd_folders) -> str:
+    return safe_txt_filename(str(folders1080[0] if folders1080 else (non_bd_folders[0] if non_bd_folders else "output")))
+
+def build_html_block(folders1080, folders720, non_bd_folders, mal_ids, span_colors, airing_img, donate_imgs, bd_toggle, bd_images, is_airing=False, crc_enabled=False, kage=False):
+    season_mal_ids = post_mal_ids(mal_ids, len(folders1080), len(non_bd_folders))
+    post = Post(children=iter_post_blocks(
+        folders1080, folders720, non_bd_folders, season_mal_ids, span_colors, airing_img, donate_imgs, bd_toggle, bd_images,
+        is_airing=is_airing, crc_enabled=crc_enabled, kage=kage
+    ))
+    return render(post), default_output_name(folders1080, non_bd_folders)
 
 # --------------------
 # Metadata Version
@@ -663,15 +479,82 @@ def print_version_and_exit():
 # -----------------------------
 # CLI
 # -----------------------------
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Generate html posts for hi10anime")
+    parser.add_argument("-p1080", nargs="+", help="Paths to BD 1080p anime folders")
+    parser.add_argument("-p720", nargs="+", help="Paths to BD 720p anime folders")
+    parser.add_argument("--paths", "-p", nargs="+", help="Paths to non-BD anime folders")
+    parser.add_argument("--mal-id", "-m", nargs="+", help="MAL ID(s)")
+    parser.add_argument("--auto-mal", "-am", action="store_true", help="Fill missing MAL IDs from the offline title index")
+    parser.add_argument("--span-color", "-c", nargs="+", required=True, help="List of colors for table headings")
+    parser.add_argument("--airing-image", "-a", nargs="+", required=True, help="URL to airing image")
+    parser.add_argument("--donation-image", "-d", nargs="+", required=True, help="Donation image URLs")
+    parser.add_argument("--bd", "-b", action="store_true", help="Enable BD 1080p/720p toggle")
+    parser.add_argument("--bd-image", "-bi", nargs="+", metavar="BD_IMG", help="BD image URLs in pairs (1080p,720p) per season")
+    parser.add_argument("--seasonal", "-s", action="store_true", help="When set, group episodes by series (airing-style)")
+    parser.add_argument("--output", "-o", help="Output TXT filename (optional, - for stdout)")
+    parser.add_argument("--version", "-v", action="store_true", help="Shows the version of the script")
+    parser.add_argument("--crc", "-crc", action="store_true", help="Show CRC32 column in the episode table")
+    parser.add_argument("--configure", "-configure", action="store_true", help="Reconfigure postar settings and overwrite postar_settings.json")
+    parser.add_argument("--kage", "-kage", action="store_true", help="Modifies the post layout to include the discord widget and various minor changes in the layout")
+    parser.add_argument("--update", "-u", action="store_true", help="Manually checks updates for postar")
+    parser.add_argument("--disable-auto-update", "-du", action="store_true", help="Disable automatic updates permanently")
+    parser.add_argument("--remote", "-r", action="store_true", help="Read folder contents from the B2 bucket listing instead of local files (paths are folder names in the bucket)")
+    parser.add_argument("--upload", "-up", action="store_true", help="Upload the media files to the B2 bucket (hashing them on the way) before building the post")
+    parser.add_argument("--formats", "-fmt", nargs="+", choices=sorted(FORMAT_WRITERS), help="Also write the post as a JSON manifest, Markdown and/or BBCode")
+    parser.add_argument("--compact", "-min", action="store_true", help="Write a minified post: no indentation, class hooks instead of repeated inline handlers/styles")
+    parser.add_argument("--layout", "-layout", metavar="DIR", help="Folder of user layout templates (<name>.html) replacing the built-in ones")
+    parser.add_argument("--fresh", "-fresh", action="store_true", help="Ignore cached fragments and re-render every table")
+    parser.add_argument("--check-links", "-cl", action="store_true", help="Verify every generated B2 link exists with the expected size before writing the post")
+    parser.add_argument("--sequential", "-seq", action="store_true", help="Do MAL lookups, hashing and MediaInfo one season at a time instead of overlapping them")
+    parser.add_argument("--export-manifest", metavar="FILE", help="Write the files that still need CRC32s/MediaInfo to a work manifest for `worker` instead of building the post")
+    parser.add_argument("--merge-results", nargs="+", metavar="FILE", help="Merge `worker` result files into the hash and fragment caches before building the post")
+    return parser
+
+def startup(configure=False, update_check=True):
+    """Load settings, run the daily update check and print the banner. Done once per process."""
+    SETTINGS = load_settings(force_reconfigure=configure)
+
+    # Daily Auto Update Check
+    if SETTINGS.get("AUTO_UPDATE", True) and update_check:
+        ORIGINAL_ARGV = sys.argv.copy()
+        check_for_github_update()
+
+    # Print the version info of the script on startup    
+    print_startup_banner()
+
+    # The reloaded (or reconfigured) settings are what every post uses from now on
+    set_settings(SETTINGS)
+    return SETTINGS
+
 def main():
+    # ---- Storage-side worker (worker.py): no settings, no update check ----
+    if len(sys.argv) > 1 and sys.argv[1] == "worker":
+        sys.exit(0 if worker_main(sys.argv[2:]) else 1)
+
     # ---- Parser for shortcuts ----
     shortcut_parser = argparse.ArgumentParser(add_help=False)
     shortcut_parser.add_argument("--update", "-u", action="store_true", help="Check updates")
     shortcut_parser.add_argument("--version", "-v", action="store_true", help="Show version")
+    shortcut_parser.add_argument("--seed-mal-index", metavar="DUMP", help="Seed the offline MAL title index")
+    shortcut_parser.add_argument("--batch", metavar="JOBS", help="Run every post in a jobs file (JSON or YAML) in this process")
+    shortcut_parser.add_argument("--jobs", "-j", type=int, default=1, metavar="N", help="Batch jobs to run at the same time")
+    shortcut_parser.add_argument("--disk-readers", type=int, metavar="N", help="Files read for CRC32s at the same time, across all jobs")
+    shortcut_parser.add_argument("--mediainfo-workers", type=int, metavar="N", help="MediaInfo parses at the same time, across all jobs")
+    shortcut_parser.add_argument("--mal-requests", type=int, metavar="N", help="MAL requests in flight at the same time, across all jobs")
+    shortcut_parser.add_argument("--serve", nargs="?", const="", metavar="ADDRESS", help="Run the render daemon on HOST:PORT (default 127.0.0.1:8731) or a Unix socket path")
+    shortcut_parser.add_argument("--queue", nargs="+", metavar="ACTION", help="Durable job queue: add JOBS | run | list | show ID | retry [ID] | clear [all]")
+    shortcut_parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES, metavar="N", help="Times a failed queued job is tried again")
+    shortcut_parser.add_argument("--retry-delay", type=float, default=DEFAULT_RETRY_DELAY, metavar="SECONDS", help="Wait before the first retry (doubled after each)")
+    shortcut_parser.add_argument("--import-time", action="store_true", help="Show how long postar's imports took and check them against the budget")
 
     # First, parse only shortcut flags
     shortcut_args, remaining = shortcut_parser.parse_known_args()
 
+    if shortcut_args.import_time:
+        print(f"[Startup] Imports took {IMPORT_SECONDS * 1000:.1f} ms (budget {IMPORT_TIME_BUDGET * 1000:.0f} ms)")
+        sys.exit(0 if IMPORT_SECONDS <= IMPORT_TIME_BUDGET else 1)
+
     if shortcut_args.update:
         print("[Update] Manually checking updates...")
         check_for_github_update(force=True)
@@ -680,28 +563,54 @@ def main():
     if shortcut_args.version:
         print_version_and_exit()
 
-    # ---- Main parser for everything else ----
-    parser = argparse.ArgumentParser(description="Generate html posts for hi10anime")
-    parser.add_argument("-p1080", nargs="+", help="Paths to BD 1080p anime folders")
-    parser.add_argument("-p720", nargs="+", help="Paths to BD 720p anime folders")
-    parser.add_argument("--paths", "-p", nargs="+", help="Paths to non-BD anime folders")
-    parser.add_argument("--mal-id", "-m", nargs="+", required=True, help="MAL ID(s)")
-    parser.add_argument("--span-color", "-c", nargs="+", required=True, help="List of colors for table headings")
-    parser.add_argument("--airing-image", "-a", nargs="+", required=True, help="URL to airing image")
-    parser.add_argument("--donation-image", "-d", nargs="+", required=True, help="Donation image URLs")
-    parser.add_argument("--bd", "-b", action="store_true", help="Enable BD 1080p/720p toggle")
-    parser.add_argument("--bd-image", "-bi", nargs="+", metavar="BD_IMG", help="BD image URLs in pairs (1080p,720p) per season")
-    parser.add_argument("--seasonal", "-s", action="store_true", help="When set, group episodes by series (airing-style)")
-    parser.add_argument("--output", "-o", help="Output TXT filename (optional)")
-    parser.add_argument("--version", "-v", action="store_true", help="Shows the version of the script")
-    parser.add_argument("--crc", "-crc", action="store_true", help="Show CRC32 column in the episode table")
-    parser.add_argument("--configure", "-configure", action="store_true", help="Reconfigure postar settings and overwrite postar_settings.json")
-    parser.add_argument("--kage", "-kage", action="store_true", help="Modifies the post layout to include the discord widget and various minor changes in the layout")
-    parser.add_argument("--update", "-u", action="store_true", help="Manually checks updates for postar")
-    parser.add_argument("--disable-auto-update", "-du", action="store_true", help="Disable automatic updates permanently")
+    if shortcut_args.seed_mal_index:
+        seed_mal_index(Path(shortcut_args.seed_mal_index))
+        sys.exit(0)
+
+    if shortcut_args.queue and shortcut_args.queue[0] != "run":
+        sys.exit(0 if queue_command(shortcut_args) else 1)
+
+    if shortcut_args.batch or shortcut_args.serve is not None or shortcut_args.queue:
+        startup()
+        set_resource_limits(
+            disk=shortcut_args.disk_readers,
+            mediainfo=shortcut_args.mediainfo_workers,
+            mal=shortcut_args.mal_requests
+        )
 
+    if shortcut_args.serve is not None:
+        from daemon import PostarService, serve, DEFAULT_DAEMON_ADDRESS
+        # Compile the layouts up front so the first preview is as quick as the rest
+        for crc_enabled in (False, True):
+            for kage in (False, True):
+                get_layout(crc_enabled=crc_enabled, kage=kage)
+        service = PostarService(build_parser, preview_post, run_batch_post, validate_post, JobQueue(), run_queued_post,
+                                resources=post_resources, workers=shortcut_args.jobs,
+                                retries=shortcut_args.retries, retry_delay=shortcut_args.retry_delay,
+                                progressive=progressive_preview)
+        sys.exit(0 if serve(shortcut_args.serve or DEFAULT_DAEMON_ADDRESS, service) else 1)
+
+    if shortcut_args.queue:
+        sys.exit(0 if queue_command(shortcut_args) else 1)
+
+    if shortcut_args.batch:
+        ok = run_batch(Path(shortcut_args.batch), build_parser(), run_batch_post,
+                       workers=shortcut_args.jobs, resources=post_resources)
+        sys.exit(0 if ok else 1)
+
+    # ---- Main parser for everything else ----
+    parser = build_parser()
     args = parser.parse_args(remaining)
 
+    # "-o -" streams the post to stdout, so everything else is logged to stderr
+    post_stream = None
+    if args.output == "-":
+        post_stream = sys.stdout
+        sys.stdout = sys.stderr
+
+    if not args.mal_id and not args.auto_mal:
+        parser.error("the following arguments are required: --mal-id/-m (or use --auto-mal/-am)")
+
     # ---- Print Release Version With Metadata ----
     if args.version:
         print_version_and_exit()
@@ -709,22 +618,7 @@ def main():
     # ----------------------------------------
     # Load settings (with forced reconfigure)
     # ----------------------------------------
-    SETTINGS = load_settings(force_reconfigure=args.configure)
-
-    # Daily Auto Update Check
-    if SETTINGS.get("AUTO_UPDATE", True) and not args.update and not args.version:
-        ORIGINAL_ARGV = sys.argv.copy()
-        check_for_github_update()
-
-    # Print the version info of the script on startup    
-    print_startup_banner()
-
-    # Override globals after loading settings
-    global B2_SHOWS_BASE, B2_TORRENTS_BASE, ENCODER_NAME, AUTO_UPDATE
-    B2_SHOWS_BASE = SETTINGS["B2_SHOWS_BASE"]
-    B2_TORRENTS_BASE = SETTINGS["B2_TORRENTS_BASE"]
-    ENCODER_NAME = SETTINGS["ENCODER_NAME"]
-    AUTO_UPDATE = SETTINGS["AUTO_UPDATE"]
+    SETTINGS = startup(configure=args.configure, update_check=not args.update and not args.version)
 
     # ---- DISABLE AUTO UPDATES ----
     if args.disable_auto_update:
@@ -733,7 +627,277 @@ def main():
             json.dumps(SETTINGS, indent=2), encoding="utf-8"
         )
         print("[Settings] Auto-update has been disabled.")
-    
+
+    with job_scope():
+        try:
+            run_post(args, post_stream)
+        finally:
+            save_hash_cache()
+            save_mal_index()
+
+def run_batch_post(args) -> dict:
+    """run_post() for one --batch job. Per-job switches (-r, -fresh, -layout) only apply to that job."""
+    if args.output == "-":
+        sys.exit("-o - can't be used in a batch")
+    if not args.mal_id and not args.auto_mal:
+        sys.exit("--mal-id/-m is required (or use --auto-mal/-am)")
+
+    with job_scope():
+        try:
+            return run_post(args)
+        finally:
+            save_hash_cache()
+            save_mal_index()
+
+def run_queued_post(args, checkpoint, done) -> dict:
+    """
+    run_batch_post() for the durable queue (jobqueue.py): checkpoint(stage,
+    data) records each stage, done holds the stages an earlier attempt
+    already finished.
+    """
+    if args.output == "-":
+        sys.exit("-o - can't be used in the queue")
+    if not args.mal_id and not args.auto_mal:
+        sys.exit("--mal-id/-m is required (or use --auto-mal/-am)")
+
+    with job_scope():
+        set_job_value("checkpoint", checkpoint)
+        set_job_value("resume", done)
+        try:
+            return run_post(args)
+        finally:
+            save_hash_cache()
+            save_mal_index()
+
+def run_queue_stages(folders, mal_ids, crc_enabled, checkpoint, done):
+    """
+    The slow parts of a post, done up front so each can be checkpointed:
+    hashing and MediaInfo (results land in the hash and fragment caches),
+    then the MAL lookups (kept in the checkpoint together with the folders'
+    New markers as they were before rendering). Stages in *done* are
+    skipped; a resumed render gets the MAL data and markers back from the
+    checkpoint.
+    """
+    inventory = get_inventory()
+    if "discovered" not in done:
+        checkpoint("discovered", {"folders": [str(f) for f in folders]})
+
+    if "hashed" not in done:
+        files = hashed = 0
+        for folder in folders:
+            media_files = inventory.list_media_files(folder)
+            files += len(media_files)
+            encoding_summary(folder, media_files)
+            if crc_enabled:
+                for f in media_files:
+                    if not classify_filename(f.name).crc:
+                        inventory.crc32(folder, f)
+                        hashed += 1
+        get_fragment_cache().save()
+        save_hash_cache()
+        checkpoint("hashed", {"files": files, "hashed": hashed})
+
+    metadata = done.get("metadata")
+    if metadata is None:
+        metadata = {"mal": {}, "processed": processed_entries(sorted({k for f in folders for k in (f.name, str(f))}))}
+        for mal_id in dict.fromkeys(mal_ids):
+            get_mal_info(mal_id)
+            info = known_mal_info(mal_id)
+            if info is not None:
+                metadata["mal"][str(mal_id)] = info
+        save_mal_index()
+        checkpoint("metadata", metadata)
+    else:
+        for mal_id, info in metadata["mal"].items():
+            prime_mal_info(mal_id, info)
+        # The interrupted render may have recorded some of its New markers already
+        restore_processed(metadata["processed"])
+
+def queue_command(shortcut_args) -> bool:
+    """--queue ACTION [ARG]: add a jobs file to the durable queue, run it or inspect it."""
+    action, *rest = shortcut_args.queue
+    queue = JobQueue()
+    try:
+        queue.snapshot()
+    except QueueFileError as e:
+        print(f"[Queue] {e}")
+        return False
+
+    if action == "add" and len(rest) == 1:
+        parser = build_parser()
+        try:
+            jobs = load_jobs(Path(rest[0]), parser)
+        except (OSError, ValueError) as e:
+            print(f"[Queue] Can't read {rest[0]}: {e}")
+            return False
+        added = 0
+        for job in jobs:
+            if job.status == "queued":
+                parse_job(job, parser)
+            if job.status == "failed":
+                print(f"[Queue] Skipping {job.name}: {job.error}")
+                continue
+            record = queue.add(job.name, job.argv, post_resources(job.args),
+                               retries=shortcut_args.retries, retry_delay=shortcut_args.retry_delay)
+            print(f"[Queue] Added {record['id']}: {job.name}")
+            added += 1
+        print(f"[Queue] {added} of {len(jobs)} job(s) queued. Run them with --queue run")
+        return added == len(jobs)
+
+    if action == "run" and not rest:
+        runner = QueueRunner(queue, build_parser(), run_queued_post, workers=shortcut_args.jobs)
+        try:
+            runner.start()
+        except QueueBusy as e:
+            print(f"[Queue] {e}")
+            return False
+        runner.run_jobs()
+        print()
+        print_queue(queue)
+        return not any(j["status"] == "failed" for j in queue.jobs())
+
+    if action == "list" and not rest:
+        print_queue(queue)
+        return True
+
+    if action == "show" and len(rest) == 1:
+        try:
+            print_job(queue, rest[0])
+        except KeyError:
+            print(f"[Queue] No job {rest[0]}")
+            return False
+        return True
+
+    if action == "retry" and len(rest) <= 1:
+        print(f"[Queue] {queue.retry(*rest)} failed job(s) queued again")
+        return True
+
+    if action == "clear" and rest in ([], ["all"]):
+        statuses = ("done", "failed") if rest else ("done",)
+        print(f"[Queue] Removed {queue.clear(statuses)} {' and '.join(statuses)} job(s)")
+        return True
+
+    print("[Queue] Usage: --queue add JOBS | run | list | show ID | retry [ID] | clear [all]")
+    return False
+
+def preview_post(args, placeholders=False) -> tuple[str, dict]:
+    """
+    Render a post for a daemon preview. Nothing is written: no output files,
+    no New markers and no cache save per request (the daemon saves the
+    fragment cache every so often).
+
+    With *placeholders* it's a fast preview: CRC32s, encoding info and
+    synopses that aren't known yet are shown as PENDING (summary["pending"]
+    counts them) and worked out in the background instead.
+    """
+    if args.upload:
+        sys.exit("-up can't be used in a preview")
+    if not args.mal_id and not args.auto_mal:
+        sys.exit("--mal-id/-m is required (or use --auto-mal/-am)")
+    args.formats = None
+    args.check_links = False
+    if placeholders:
+        # The background work fills the shared fragment cache
+        args.fresh = False
+
+    stream = io.StringIO()
+    with job_scope():
+        set_job_value("preview", True)
+        if placeholders:
+            set_job_value("placeholders", [0])
+        summary = run_post(args, stream)
+        if placeholders:
+            summary["pending"] = job_value("placeholders")[0]
+    return stream.getvalue(), summary
+
+PREVIEW_UPDATE_INTERVAL = 0.25  # seconds between progressive preview renders
+
+def progressive_preview(args):
+    """
+    Fast preview that fills itself in: yields (html, summary) right away
+    with placeholders, then again whenever the background work has changed
+    the post, at most every PREVIEW_UPDATE_INTERVAL. The last one has
+    summary["final"] set. Closing the generator early drops the background
+    work that hasn't started.
+    """
+    background = []
+
+    def render():
+        with job_scope():
+            set_job_value("background", background)
+            return preview_post(args, placeholders=True)
+
+    html, summary = render()
+    summary["final"] = not summary["pending"]
+    yield html, summary
+    if summary["final"]:
+        return
+
+    pipeline = background[0]
+    seen = pipeline.progress
+    try:
+        while True:
+            done = pipeline.done.wait(PREVIEW_UPDATE_INTERVAL)
+            if not done and pipeline.progress == seen:
+                continue
+            seen = pipeline.progress
+            update, summary = render()
+            summary["final"] = done or not summary["pending"]
+            if update != html or summary["final"]:
+                html = update
+                yield html, summary
+            if summary["final"]:
+                return
+    finally:
+        pipeline.close()
+
+def validate_post(args) -> list[str]:
+    """Problems that would stop or spoil a post, found without rendering it."""
+    errors = []
+    if not args.mal_id and not args.auto_mal:
+        errors.append("--mal-id/-m is required (or use --auto-mal/-am)")
+    if not (args.p1080 or args.paths):
+        errors.append("no folders given (-p1080 or -p)")
+    if args.output == "-":
+        errors.append("-o - can't be used with the daemon")
+    if args.upload and args.remote:
+        errors.append("-up needs local folders and can't be combined with -r")
+    if args.remote:
+        errors.append("-r can't read MediaInfo from the bucket, so the encoding tables would show Unknown")
+    if not args.remote:
+        for name in (args.p1080 or []) + (args.p720 or []) + (args.paths or []):
+            if not get_inventory().discover(name):
+                errors.append(f"no media folders found in {name}")
+    if args.layout:
+        with job_scope():
+            try:
+                set_layout_dir(args.layout)
+                get_layout(crc_enabled=args.crc, kage=args.kage)
+            except ValueError as e:
+                errors.append(str(e))
+    return errors
+
+def post_resources(args) -> set:
+    """
+    What a batch job works on that another job mustn't touch at the same
+    time: its folders (New markers, hashing) and its output files. Jobs
+    sharing any of these run one after another, in jobs file order, so the
+    results are the same however many jobs run at once.
+    """
+    def folders(paths):
+        found = []
+        for p in paths or []:
+            found.extend(([] if args.remote else get_inventory().discover(p)) or [Path(p)])
+        return found
+
+    folders_1080, folders_720, non_bd = folders(args.p1080), folders(args.p720), folders(args.paths)
+    out_name = args.output or default_output_name(folders_1080, non_bd)
+    keys = {f"folder:{f.name.lower()}" for f in folders_1080 + folders_720 + non_bd}
+    keys.add(f"output:{Path(out_name).stem.lower()}")
+    return keys
+
+def run_post(args, post_stream=None) -> dict:
+    """Build and write one post. Returns a summary for batch runs."""
     # --- DEBUG ---
     #print("DEBUG: args.bd =", args.bd)
     print("DEBUG: --seasonal flag is set to:", args.seasonal)
@@ -743,23 +907,110 @@ def main():
     early_out = args.output if args.output else "insert_something_here.txt"
     print(f"Processing TXT: {early_out}")
 
+    if args.layout:
+        try:
+            set_layout_dir(args.layout)
+            get_layout(crc_enabled=args.crc, kage=args.kage)
+        except ValueError as e:
+            sys.exit(str(e))
+
+    if args.fresh:
+        set_fragment_cache(FragmentCache(enabled=False))
+    cache = get_fragment_cache()
+
+    # ---- Remote bucket inventory ----
+    if args.remote:
+        try:
+            set_inventory(make_remote_inventory())
+        except Exception as e:
+            sys.exit(f"[Bucket] {e}")
+        names = (args.p1080 or []) + (args.p720 or []) + (args.paths or [])
+        print(f"[Bucket] Listing {len(names)} folder(s)...")
+        get_inventory().prefetch(names)
+
     def expand_paths(paths):
         folders = []
         for p in paths:
-            root = Path(p)
-            if root.is_dir():
-                folders.extend(discover_media_folders(root))
+            folders.extend(get_inventory().discover(p))
         return folders
 
     folders_1080 = expand_paths(args.p1080) if args.p1080 else []
     folders_720  = expand_paths(args.p720) if args.p720 else []
     non_bd       = expand_paths(args.paths) if args.paths else []
 
-    output_text, default_filename = build_html_block(
+    if args.remote:
+        for folder in folders_1080 + folders_720 + non_bd:
+            if not get_inventory().has_torrent(folder):
+                print(f"[Bucket] No batch torrent found for {folder.name}")
+
+    # ---- Work manifests: hashing and MediaInfo on the storage hosts (worker.py) ----
+    if (args.export_manifest or args.merge_results) and args.remote:
+        sys.exit("[Manifest] Work manifests need local folders and can't be combined with -r")
+    if args.merge_results:
+        try:
+            merge_results(args.merge_results)
+        except ValueError as e:
+            sys.exit(f"[Manifest] {e}")
+    if args.export_manifest:
+        write_manifest(Path(args.export_manifest), folders_1080 + folders_720 + non_bd, crc_enabled=args.crc)
+        elapsed = time.perf_counter() - start_time
+        return {"output": args.export_manifest, "seconds": elapsed, "reused": 0, "rendered": 0}
+
+    # ---- Streaming upload ----
+    if args.upload:
+        if args.remote:
+            sys.exit("[Upload] -up needs local folders and can't be combined with -r")
+        try:
+            count = upload_folders(folders_1080 + folders_720 + non_bd)
+        except Exception as e:
+            sys.exit(f"[Upload] Upload failed: {e}")
+        print(f"[Upload] {count} file(s) uploaded.")
+
+    # ---- Link verification ----
+    if args.check_links:
+        print("[Links] Verifying generated B2 links...")
+        print_link_report(check_links(collect_post_links(folders_1080 + folders_720 + non_bd)))
+
+    # ---- MAL ID of every season, in post order (BD seasons, then the rest) ----
+    if args.auto_mal:
+        # -m IDs go to the first seasons, the offline index fills in the others
+        season_mal_ids = list(args.mal_id or [])[:len(folders_1080) + len(non_bd)]
+        unresolved = []
+        for folder in (folders_1080 + non_bd)[len(season_mal_ids):]:
+            resolved = resolve_mal_id(folder.name)
+            if resolved:
+                print(f"[MAL INDEX] {folder.name} -> {resolved}")
+                season_mal_ids.append(resolved)
+            else:
+                unresolved.append(folder)
+        for folder in unresolved:
+            print(f"[MAL INDEX] No confident match for {folder.name}.")
+            for mal_id, title, score in suggest_mal_ids(folder.name):
+                print(f"            {mal_id:>8}  {title}  ({score:.2f})")
+        if unresolved:
+            sys.exit("Pass the MAL ID(s) with -m for the folders above.")
+    else:
+        season_mal_ids = post_mal_ids(args.mal_id, len(folders_1080), len(non_bd))
+
+    # ---- Durable queue: checkpointed stages ahead of rendering ----
+    checkpoint = job_value("checkpoint")
+    if checkpoint:
+        run_queue_stages(folders_1080 + folders_720 + non_bd, season_mal_ids, args.crc, checkpoint, job_value("resume") or {})
+
+    # ---- Lookups, hashing and MediaInfo for every season at once ----
+    from pipeline import PostPipeline, SeasonWork
+    seasons = [SeasonWork(mal_id, [folder] + ([folders_720[idx]] if args.bd and idx < len(folders_720) else []))
+               for idx, (mal_id, folder) in enumerate(zip(season_mal_ids, folders_1080))]
+    seasons += [SeasonWork(mal_id, [folder]) for mal_id, folder in zip(season_mal_ids[len(folders_1080):], non_bd)]
+    pipeline = None
+    if not args.sequential and not placeholders_on():
+        pipeline = PostPipeline(seasons, crc_enabled=args.crc).start()
+
+    blocks = iter_post_blocks(
         folders_1080,
         folders_720,
         non_bd,
-        args.mal_id,
+        season_mal_ids,
         args.span_color,
         args.airing_image,
         args.donation_image,
@@ -767,22 +1018,71 @@ def main():
         args.bd_image,
         is_airing=args.seasonal,
         crc_enabled=args.crc,
-        kage=args.kage
+        kage=args.kage,
+        pipeline=pipeline
     )
 
-    OUTPUT_DIR = Path.cwd() / "output"
+    out_name = args.output or default_output_name(folders_1080, non_bd)
+
+    OUTPUT_DIR = Path(job_value("output_dir") or Path.cwd() / "output")
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
-    out_name = args.output or default_filename
-    out_file = OUTPUT_DIR / out_name
-    
-    with open(out_file, "w", encoding="utf-8") as f:
-        f.write(output_text)
+    # Extra formats are written from the same blocks, next to the HTML
+    stem = Path(default_output_name(folders_1080, non_bd) if out_name == "-" else out_name).stem
+    with contextlib.ExitStack() as stack:
+        if pipeline:
+            stack.callback(pipeline.close)
+        sinks = []
+        for fmt in args.formats or []:
+            path = OUTPUT_DIR / f"{stem}{FORMAT_EXTENSIONS[fmt]}"
+            sinks.append(FORMAT_WRITERS[fmt](stack.enter_context(open(path, "w", encoding="utf-8", buffering=STREAM_BUFFER_SIZE))))
+            print(f"[Formats] Writing {path}")
+
+        # Blocks are written as soon as they're built
+        if post_stream:
+            out_file = "<stdout>"
+            f = post_stream
+        else:
+            out_file = OUTPUT_DIR / out_name
+            f = stack.enter_context(open(out_file, "w", encoding="utf-8", buffering=STREAM_BUFFER_SIZE))
+
+        writer = CompactWriter(f, COMPACT_REWRITES) if args.compact else None
+        try:
+            write_stream(blocks, f, sinks, writer=writer)
+        except Cancelled:
+            # Fragments finished before the cancel are kept for the next render
+            if not job_value("preview"):
+                cache.save()
+            raise
+
+        if writer:
+            saved = writer.raw_chars - writer.chars
+            print(f"[Compact] {writer.raw_chars / 1024:.1f} KB -> {writer.chars / 1024:.1f} KB "
+                  f"({saved / 1024:.1f} KB saved, {saved / max(writer.raw_chars, 1):.0%} smaller)")
+
+        for sink in sinks:
+            sink.close()
+
+    if not job_value("preview"):
+        cache.save()
+    reused, rendered = job_value("fragment_counts", [0, 0])
+    if reused or rendered:
+        print(f"[Cache] {reused} fragment(s) reused, {rendered} rendered")
+
+    # ---- Fast preview: work out the placeholders in the background ----
+    pending = job_value("placeholders")
+    if pending and pending[0]:
+        background = job_value("background")
+        if not background:
+            started = PostPipeline(seasons, crc_enabled=args.crc, fill_caches=True).start()
+            if background is not None:
+                background.append(started)
 
     # Records the time taken to build the html code
     end_time = time.perf_counter()
     elapsed = end_time - start_time
     print(f"{out_file} completed in {elapsed:.3f} seconds")
+    return {"output": str(out_file), "seconds": elapsed, "reused": reused, "rendered": rendered}
 
 if __name__ == "__main__":
     main()
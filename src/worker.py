@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+worker.py
+
+Hashing and MediaInfo next to the storage instead of over a network mount.
+
+1. The coordinator (the machine that builds the post) exports a work
+   manifest: the files that still need a CRC32 and the folders that still
+   need MediaInfo, with what it saw of each (size, mtime):
+
+       python_postar.py -p /mnt/nas1/Show ... -crc --export-manifest work.json
+
+2. A worker runs on each storage host, reads the files locally and writes
+   a result file:
+
+       python_postar.py worker work.json -o nas1.json --map /mnt/nas1=/srv/media
+
+   --map translates the coordinator's paths to the host's own (repeatable).
+   Items whose folder isn't on the host are left to the other workers;
+   --shard K/N splits the rest between several workers on one host.
+
+3. The coordinator merges the result files before rendering:
+
+       python_postar.py -p /mnt/nas1/Show ... -crc --merge-results nas1.json nas2.json
+
+   CRC32s go into the hash cache and MediaInfo into the fragment cache,
+   for files that are still the way the manifest saw them; anything that
+   changed since is skipped (and worked out locally as usual).
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from classify import classify_filename
+from helper import (RESOURCE_LIMITS, compute_crc32, encoding_inputs, encoding_summary, extract_encoding_info,
+                    folder_fingerprint, get_fragment_cache, get_inventory, have_pymediainfo, job_scope, job_value,
+                    known_crc32, remember_crc32s, save_hash_cache, set_job_value, set_resource_limits)
+
+MANIFEST_KIND = "postar-work-manifest"
+RESULTS_KIND = "postar-work-results"
+FORMAT_VERSION = 1
+
+def _write_json(path: Path, data: dict):
+    """Written to a temporary file and renamed, so a reader never sees half a file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+def _read_json(path: Path, kind: str) -> dict:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        raise ValueError(f"can't read {path}: {e}") from None
+    if not isinstance(data, dict) or data.get("kind") != kind:
+        raise ValueError(f"{path} is not a {kind} file")
+    if data.get("version") != FORMAT_VERSION:
+        raise ValueError(f"{path} has format version {data.get('version')}, expected {FORMAT_VERSION}")
+    return data
+
+# ----------------------
+# Coordinator
+# ----------------------
+def build_manifest(folders, crc_enabled=False) -> dict:
+    """
+    The work the post still needs: files without a CRC tag in their name
+    and not in the hash cache (with -crc), and folders whose MediaInfo
+    isn't in the fragment cache.
+    """
+    inventory = get_inventory()
+    items = []
+    for folder in folders:
+        files = inventory.list_media_files(folder)
+        hash_files = []
+        if crc_enabled:
+            # Same rule as the episode rows and pipeline.py
+            hash_files = [f for f in files if not classify_filename(f.name).crc and known_crc32(f.path) is None]
+        mediainfo = any(f.name.lower().endswith(".mkv") for f in files) \
+            and not get_fragment_cache().has("encoding_info", encoding_inputs(folder, files))
+        if not hash_files and not mediainfo:
+            continue
+        items.append({
+            "id": len(items),
+            "folder": str(Path(folder).resolve()),
+            "files": [{"name": f.name, "size": f.size, "mtime_ns": f.version} for f in hash_files],
+            "mediainfo": mediainfo,
+            "fingerprint": folder_fingerprint(folder, files),
+        })
+    return {"kind": MANIFEST_KIND, "version": FORMAT_VERSION, "created": time.time(),
+            "coordinator": socket.gethostname(), "items": items}
+
+def write_manifest(path: Path, folders, crc_enabled=False) -> dict:
+    manifest = build_manifest(folders, crc_enabled=crc_enabled)
+    _write_json(path, manifest)
+    files = sum(len(item["files"]) for item in manifest["items"])
+    parses = sum(item["mediainfo"] for item in manifest["items"])
+    print(f"[Manifest] Wrote {path}: {files} file(s) to hash, {parses} folder(s) to parse")
+    return manifest
+
+def merge_results(paths) -> dict:
+    """
+    Put the workers' CRC32s and MediaInfo into the hash and fragment caches.
+    Returns counts: hashes, parses, stale (changed since the manifest), errors.
+    """
+    counts = {"hashes": 0, "parses": 0, "stale": 0, "errors": 0}
+    crcs = {}
+    for path in paths:
+        results = _read_json(Path(path), RESULTS_KIND)
+        for item in results["items"]:
+            folder = Path(item["folder"])
+            for error in item.get("errors", []):
+                print(f"[Manifest] {results.get('worker', '?')}: {folder.name}: {error}")
+                counts["errors"] += 1
+
+            for f in item.get("files", []):
+                local = folder / f["name"]
+                try:
+                    st = local.stat()
+                except OSError:
+                    counts["stale"] += 1
+                    continue
+                if (st.st_size, st.st_mtime_ns) != (f["size"], f["mtime_ns"]):
+                    counts["stale"] += 1
+                    continue
+                crcs[local] = f["crc"]
+
+            info = item.get("encoding_info")
+            if info is None:
+                continue
+            files = get_inventory().list_media_files(folder)
+            if json.dumps(folder_fingerprint(folder, files)) != json.dumps(item["fingerprint"]):
+                counts["stale"] += 1
+                continue
+            # Summarised (and cached) the usual way, from the worker's parse
+            with job_scope():
+                set_job_value("encoding_info", {str(folder): info})
+                encoding_summary(folder, files)
+            counts["parses"] += 1
+
+    if crcs:
+        remember_crc32s(crcs)
+        save_hash_cache()
+    counts["hashes"] = len(crcs)
+    if counts["parses"] and not job_value("preview"):
+        get_fragment_cache().save()
+    print(f"[Manifest] Merged {counts['hashes']} CRC32(s) and {counts['parses']} MediaInfo result(s) "
+          f"from {len(paths)} file(s)" + (f", {counts['stale']} changed since and skipped" if counts["stale"] else ""))
+    return counts
+
+# ----------------------
+# Worker
+# ----------------------
+def map_folder(folder: str, mappings) -> Path:
+    """The coordinator's *folder* as this host sees it ((from, to) prefixes, first match wins)."""
+    for source, target in mappings:
+        if folder == source or folder.startswith(source.rstrip("/\\") + ("\\" if "\\" in source else "/")):
+            rest = folder[len(source):].replace("\\", "/").strip("/")
+            return Path(target) / rest if rest else Path(target)
+    return Path(folder)
+
+def run_worker(manifest: dict, mappings=(), shard=(1, 1)) -> dict:
+    """Do the manifest's work that's on this host (and in this shard). Returns the results document."""
+    index, count = shard
+    mine = [item for n, item in enumerate(manifest["items"]) if n % count == index - 1]
+    if any(item["mediainfo"] for item in mine) and not have_pymediainfo():
+        print("[Worker] pymediainfo isn't installed here; MediaInfo is left to the coordinator")
+
+    def hash_file(local_folder: Path, f: dict):
+        local = local_folder / f["name"]
+        try:
+            size = local.stat().st_size
+        except OSError as e:
+            return None, f"{f['name']}: {e.strerror or e}"
+        if size != f["size"]:
+            return None, f"{f['name']}: changed since the manifest was made"
+        # The coordinator keeps the hashes; nothing is cached on the storage host
+        return {**f, "crc": compute_crc32(local)}, None
+
+    results = []
+    skipped = 0
+    with ThreadPoolExecutor(max_workers=RESOURCE_LIMITS["disk"], thread_name_prefix="worker-disk") as pool:
+        for item in mine:
+            local_folder = map_folder(item["folder"], mappings)
+            if not local_folder.is_dir():
+                skipped += 1  # on another storage host
+                continue
+            started = time.perf_counter()
+            result = {"id": item["id"], "folder": item["folder"], "fingerprint": item["fingerprint"],
+                      "files": [], "errors": []}
+            for done, error in pool.map(lambda f: hash_file(local_folder, f), item["files"]):
+                if done:
+                    result["files"].append(done)
+                else:
+                    result["errors"].append(error)
+            if item["mediainfo"] and have_pymediainfo():
+                result["encoding_info"] = extract_encoding_info(local_folder)
+            results.append(result)
+            print(f"[Worker] {local_folder.name}: {len(result['files'])} file(s) hashed"
+                  f"{', MediaInfo parsed' if 'encoding_info' in result else ''}"
+                  f" in {time.perf_counter() - started:.2f}s")
+
+    if skipped:
+        print(f"[Worker] {skipped} folder(s) aren't on this host; left to other workers")
+    return {"kind": RESULTS_KIND, "version": FORMAT_VERSION, "worker": socket.gethostname(),
+            "created": time.time(), "items": results}
+
+def _mapping(value: str) -> tuple[str, str]:
+    source, sep, target = value.partition("=")
+    if not sep or not source or not target:
+        raise argparse.ArgumentTypeError(f"expected FROM=TO, got {value!r}")
+    return source, target
+
+def _shard(value: str) -> tuple[int, int]:
+    try:
+        index, count = (int(n) for n in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected K/N, got {value!r}") from None
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard {value} is out of range")
+    return index, count
+
+def build_worker_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python_postar.py worker",
+                                     description="Hash files and parse MediaInfo from a work manifest, next to the storage")
+    parser.add_argument("manifest", help="Work manifest written by --export-manifest")
+    parser.add_argument("--output", "-o", required=True, help="Result file for --merge-results")
+    parser.add_argument("--map", type=_mapping, action="append", default=[], metavar="FROM=TO",
+                        help="Read the coordinator's FROM folder as TO on this host (repeatable)")
+    parser.add_argument("--shard", type=_shard, default=(1, 1), metavar="K/N",
+                        help="Only do every Nth folder, starting with the Kth (several workers on one host)")
+    parser.add_argument("--disk-readers", type=int, metavar="N", help="Files read for CRC32s at the same time")
+    return parser
+
+def worker_main(argv) -> bool:
+    args = build_worker_parser().parse_args(argv)
+    set_resource_limits(disk=args.disk_readers)
+    try:
+        manifest = _read_json(Path(args.manifest), MANIFEST_KIND)
+    except ValueError as e:
+        print(f"[Worker] {e}")
+        return False
+    started = time.perf_counter()
+    results = run_worker(manifest, mappings=args.map, shard=args.shard)
+    _write_json(Path(args.output), results)
+    files = sum(len(item["files"]) for item in results["items"])
+    errors = sum(len(item["errors"]) for item in results["items"])
+    print(f"[Worker] Wrote {args.output}: {files} CRC32(s) for {len(results['items'])} folder(s)"
+          f"{f', {errors} error(s)' if errors else ''} in {time.perf_counter() - started:.2f}s")
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if worker_main(sys.argv[1:]) else 1)
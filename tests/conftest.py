@@ -0,0 +1,112 @@
+"""
+Shared fixtures. Every test that runs postar gets its own copy of src/
+(so settings/, caches and New markers start empty and never touch the
+real ones), a small show folder tree and the stub MAL server from
+tools/stub_server.py, so nothing goes to the network.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+SRC = ROOT / "src"
+TOOLS = ROOT / "tools"
+
+for folder in (SRC, TOOLS):
+    if str(folder) not in sys.path:
+        sys.path.insert(0, str(folder))
+
+TEST_SETTINGS = {
+    "B2_SHOWS_BASE": "https://b2.example/shows/",
+    "B2_TORRENTS_BASE": "https://b2.example/torrents/",
+    "ENCODER_NAME": "Enc",
+    "AUTO_UPDATE": False,
+    "MAL_PROVIDERS": ["jikan"],
+    "MAL_HEDGE_DELAY": 0.3,
+}
+
+# folder -> {file name: size}
+SHOW_FILES = {
+    "(Hi10)_Cyberpunk_Edgerunners_(BD_1080p)": {
+        "(Hi10)_Cyberpunk_Edgerunners_-_01_(BD_1080p)_(Enc)_[ABCD1234].mkv": 3000,
+        "(Hi10)_Cyberpunk_Edgerunners_-_02_(BD_1080p)_(Enc).mkv": 2048,
+        "(Hi10)_Cyberpunk_Edgerunners_-_02v2_(BD_1080p)_(Enc).mkv": 2049,
+        "(Hi10)_Cyberpunk_Edgerunners_-_NCOP1_(BD_1080p)_(Enc).mkv": 512,
+    },
+    "(Hi10)_Cyberpunk_Edgerunners_(BD_720p)": {
+        "(Hi10)_Cyberpunk_Edgerunners_-_01_(BD_720p)_(Enc).mkv": 1500,
+        "(Hi10)_Cyberpunk_Edgerunners_-_02_(BD_720p)_(Enc).mkv": 1024,
+    },
+}
+
+def make_media(root: Path) -> Path:
+    for folder, files in SHOW_FILES.items():
+        (root / folder).mkdir(parents=True)
+        for name, size in files.items():
+            (root / folder / name).write_bytes(bytes(i % 251 for i in range(size)))
+    return root
+
+def post_argv(output: str) -> list[str]:
+    """A BD post over the fixture folders, with CRC32s."""
+    names = list(SHOW_FILES)
+    return ["-p1080", names[0], "-p720", names[1], "-b", "-bi", "IMG1", "IMG2", "-crc",
+            "-a", "A1", "-d", "D1", "-c", "blue", "-m", "42310", "-o", output]
+
+@pytest.fixture(scope="session")
+def stub():
+    from stub_server import start_stub_server, stub_environment
+    server = start_stub_server()
+    yield stub_environment(server.base_url)
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def app(tmp_path):
+    """A copy of src/ with its own settings folder."""
+    app_dir = tmp_path / "app"
+    app_dir.mkdir()
+    for path in SRC.iterdir():
+        if path.is_file() and path.suffix in (".py", ".tsv"):
+            shutil.copy2(path, app_dir)
+    (app_dir / "settings").mkdir()
+    (app_dir / "settings" / ".postar_settings.json").write_text(json.dumps(TEST_SETTINGS), encoding="utf-8")
+    return app_dir
+
+@pytest.fixture
+def media(tmp_path):
+    """Show folders to post; also the working directory postar runs in (output/ lands here)."""
+    return make_media(tmp_path / "media")
+
+@pytest.fixture
+def postar(app, media, stub):
+    """postar(*args) runs python_postar.py from the app copy, in the media folder."""
+    env = {**os.environ, **stub, "PYTHONDONTWRITEBYTECODE": "1"}
+
+    def run(*args, check=True, **kwargs) -> subprocess.CompletedProcess:
+        result = subprocess.run([sys.executable, str(app / "python_postar.py"), *args], cwd=media, env=env,
+                                capture_output=True, text=True, timeout=120, **kwargs)
+        if check and result.returncode != 0:
+            pytest.fail(f"postar {' '.join(args)} exited with {result.returncode}:\n{result.stdout}\n{result.stderr}")
+        return result
+
+    run.env = env
+    return run
+
+@pytest.fixture
+def library(postar, app, media):
+    """library(script, *argv) runs a Python script against the app copy's modules, in the media folder; returns stdout."""
+    def run(script: str, *argv, timeout=120) -> str:
+        result = subprocess.run([sys.executable, "-c", textwrap.dedent(script), *argv], cwd=media,
+                                env={**postar.env, "PYTHONPATH": str(app)}, capture_output=True, text=True, timeout=timeout)
+        if result.returncode != 0:
+            pytest.fail(f"script exited with {result.returncode}:\n{result.stdout}\n{result.stderr}")
+        return result.stdout
+
+    return run
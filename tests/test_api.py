@@ -0,0 +1,51 @@
+"""The library API (api.Postar): isolation between Postars and how failures surface."""
+
+import json
+import re
+
+import pytest
+
+from conftest import TEST_SETTINGS, post_argv
+
+def test_postars_with_different_settings_are_isolated(library):
+    # Renders of two Postars interleave on a thread pool; each must only ever see its own settings
+    script = """
+        import json, sys, threading
+        from concurrent.futures import ThreadPoolExecutor
+        from api import Postar
+
+        settings, job = json.loads(sys.argv[1]), json.loads(sys.argv[2])
+        postars = {name: Postar(settings={**settings, "B2_SHOWS_BASE": f"https://{name}.example/shows/",
+                                          "B2_TORRENTS_BASE": f"https://{name}.example/torrents/"})
+                   for name in ("a", "b")}
+        alone = {name: postar.render(job)[0] for name, postar in postars.items()}
+        start = threading.Barrier(8)
+
+        def render(name):
+            start.wait()
+            return name, postars[name].render(job)[0]
+
+        with ThreadPoolExecutor(8) as pool:
+            together = list(pool.map(render, ["a", "b"] * 4))
+        print(json.dumps({"alone": alone, "together": together}))
+    """
+    output = library(script, json.dumps(TEST_SETTINGS), json.dumps(post_argv("post.txt")))
+    result = json.loads(output.splitlines()[-1])  # after the renders' own log lines
+    alone = result["alone"]
+    assert "https://a.example/shows/" in alone["a"] and "b.example" not in alone["a"]
+    assert "https://b.example/shows/" in alone["b"] and "a.example" not in alone["b"]
+    assert len(result["together"]) == 8
+    for name, html in result["together"]:
+        assert html == alone[name]
+
+@pytest.mark.parametrize("job, message", [
+    (["-p", "Show", "-m", "42310"], "invalid arguments: the following arguments are required"),
+    ({"paths": ["Show"], "mal_id": [42310], "span_color": ["blue"], "airing_image": ["A"], "donation_image": ["D"],
+      "no_such_option": True}, "unknown option 'no_such_option'"),
+    (["-p", "Show", "-m", "42310", "-c", "blue", "-a", "A", "-d", "D", "-up"], "-up can't be used in a preview"),
+    (["-p", "Show", "-c", "blue", "-a", "A", "-d", "D"], "--mal-id/-m is required"),
+])
+def test_bad_arguments_raise_postar_error(job, message):
+    from api import Postar, PostarError
+    with pytest.raises(PostarError, match=re.escape(message)):
+        Postar(settings=TEST_SETTINGS).render(job)
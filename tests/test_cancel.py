@@ -0,0 +1,63 @@
+"""Cancelling a render from another thread (helper.CancelToken)."""
+
+import json
+
+from conftest import TEST_SETTINGS, post_argv
+
+def test_cancelled_write_keeps_earlier_cache_entries(library, media):
+    # Two new episodes to hash; the token is cancelled from another thread once the first is done
+    folder = media / "(Hi10)_Cyberpunk_Edgerunners_(BD_1080p)"
+    new_files = [folder / f"(Hi10)_Cyberpunk_Edgerunners_-_{n:02d}_(BD_1080p)_(Enc).mkv" for n in (3, 4)]
+    script = """
+        import json, sys, threading
+        from pathlib import Path
+        import helper
+        from api import Postar
+        from helper import CancelToken, Cancelled
+
+        settings, job, new_files = (json.loads(arg) for arg in sys.argv[1:])
+        helper.set_resource_limits(disk=1)  # one file read at a time
+        postar = Postar(settings=settings)
+        postar.write(job)
+
+        def cache_files():
+            return {name: json.loads((helper.SETTINGS_DIR / name).read_text(encoding="utf-8"))
+                    for name in ("hash_cache.json", "fragment_cache.json")}
+
+        before = cache_files()
+        for i, name in enumerate(new_files):
+            Path(name).write_bytes(bytes([i]) * 4096)
+
+        token = CancelToken()
+        hashed = []
+        compute_crc32 = helper.compute_crc32
+
+        def compute_then_cancel(path):
+            crc = compute_crc32(path)
+            hashed.append(path.name)
+            canceller = threading.Thread(target=token.cancel, args=("stopped by the test",))
+            canceller.start()
+            canceller.join()
+            return crc
+
+        helper.compute_crc32 = compute_then_cancel
+        try:
+            postar.write(job, cancel=token)
+            outcome = "finished"
+        except Cancelled as e:
+            outcome = str(e)
+        print(json.dumps({"outcome": outcome, "hashed": hashed, "before": before, "after": cache_files()}))
+    """
+    output = library(script, json.dumps(TEST_SETTINGS), json.dumps(post_argv("post.txt")),
+                     json.dumps([str(f) for f in new_files]))
+    result = json.loads(output.splitlines()[-1])
+    assert result["outcome"] == "stopped by the test"
+    [first] = result["hashed"]  # the other file was never finished
+
+    before, after = result["before"], result["after"]
+    assert before["hash_cache.json"].items() <= after["hash_cache.json"].items()
+    # Reused fragments only get a newer "used" time
+    assert all(after["fragment_cache.json"][key]["text"] == entry["text"]
+               for key, entry in before["fragment_cache.json"].items())
+    # The CRC32 worked out before the cancel is kept too
+    assert any(key.startswith(str((folder / first).resolve()) + "|") for key in after["hash_cache.json"])
@@ -0,0 +1,57 @@
+"""Filename classification and table order (classify.py)."""
+
+import pytest
+
+from classify import Episode, classify_filename, sorted_episodes, verify_corpus
+from helper import LocalMediaFile
+
+def test_golden_corpus():
+    assert verify_corpus() == []
+
+@pytest.mark.parametrize("name, category, label, episode, version, crc", [
+    ("(Hi10)_Show_-_05_(BD_1080p)_(Enc).mkv", "episode", "05", 5, "", None),
+    ("(Hi10)_Show_-_05v2_(BD_1080p)_(Enc).mkv", "episode", "05v2", 5, "v2", None),
+    ("(Hi10)_Show_-_05v2_(BD_1080p)_(Enc)_[0a1b2c3d].mkv", "episode", "05v2", 5, "v2", "0A1B2C3D"),
+    ("(Hi10)_Show_-_12_(1080p)_[DEADBEEF].mkv", "episode", "12", 12, "", "DEADBEEF"),
+    ("(Hi10)_Show_-_NCOP1_(BD_1080p).mkv", "dash", "NCOP1", None, "", None),
+    ("(Hi10)_Show_-_NCED_(BD_1080p).mkv", "dash", "NCED", None, "", None),
+    ("(Hi10)_Show_-_OP_1_(BD_1080p).mkv", "op", "OP1", None, "", None),
+    ("(Hi10)_Show_-_ED_2_(BD_1080p)_[ABCD1234].mkv", "ed", "ED2", None, "", "ABCD1234"),
+    ("(Hi10)_Show_-_OVA_(BD_1080p).mkv", "ova", "OVA", None, "", None),
+    ("(Hi10)_Show_-_OVA_02_(BD_1080p).mkv", "ova", "OVA_02", None, "", None),
+])
+def test_classify_filename(name, category, label, episode, version, crc):
+    result = classify_filename(name)
+    assert (result.category, result.label, result.episode, result.version, result.crc) == \
+        (category, label, episode, version, crc)
+    assert classify_filename(name) is result  # memoized
+
+NAMES = [
+    "(Hi10)_Show_-_NCOP1_(BD_1080p).mkv",
+    "(Hi10)_Show_-_10_(BD_1080p).mkv",
+    "(Hi10)_Show_-_OP_1_(BD_1080p).mkv",
+    "(Hi10)_Show_-_Extras_(BD_1080p).mkv",
+    "(Hi10)_Show_-_ED_1_(BD_1080p).mkv",
+    "(Hi10)_Show_-_02v2_(BD_1080p).mkv",
+    "(Hi10)_Show_-_OVA_(BD_1080p).mkv",
+    "(Hi10)_Show_-_01_(BD_1080p)_[ABCD1234].mkv",
+]
+
+def media_files(tmp_path, names):
+    for name in names:
+        (tmp_path / name).write_bytes(b"x")
+    return [LocalMediaFile(tmp_path / name) for name in names]
+
+def test_table_order(tmp_path):
+    # Episodes by number (not by name: 10 after 02), then specials, EDs, OPs, dash labels, extras
+    assert [e.label for e in sorted_episodes(media_files(tmp_path, NAMES))] == \
+        ["01", "02v2", "10", "OVA", "ED1", "OP1", "NCOP1", "Extras"]
+
+def test_sort_keys(tmp_path):
+    episode, nc_op = (Episode(f) for f in media_files(tmp_path, NAMES[1::-1]))
+    assert episode.sort_key == (0, 10)
+    assert nc_op.sort_key == (4, NAMES[0].lower())
+
+    # Airing posts group by series first
+    airing = Episode(media_files(tmp_path, ["(Hi10)_Show_B_-07_(720p).mkv"])[0], is_airing=True)
+    assert airing.sort_key == ("(hi10)_show_b", 0, 7, "(hi10)_show_b_-07_(720p).mkv")
@@ -0,0 +1,33 @@
+"""Compact posts (-min) and the rewrites they use (layout.COMPACT_REWRITES)."""
+
+import re
+
+import pytest
+
+from conftest import post_argv
+from layout import COMPACT_REWRITES
+
+def bd_post(postar, media, output, *extra) -> str:
+    argv = post_argv(output)
+    argv[argv.index("-d") + 1:argv.index("-d") + 2] = ["D1", "D2"]  # two banners get a show/hide button
+    postar(*argv, *extra)
+    return (media / "output" / output).read_text(encoding="utf-8")
+
+def test_every_rewrite_matches_the_generated_post(postar, media):
+    # The regular post and a -kage one between them emit everything the rewrites target
+    html = bd_post(postar, media, "post.txt") + bd_post(postar, media, "kage.txt", "-kage")
+    for pattern, _ in COMPACT_REWRITES:
+        assert pattern.search(html), f"{pattern.pattern} matches nothing the generator writes"
+
+@pytest.mark.parametrize("extra", [(), ("-kage",)])
+def test_compact_post_keeps_working_toggles(postar, media, extra):
+    regular = bd_post(postar, media, "post.txt", *extra)
+    compact = bd_post(postar, media, "compact.txt", "-min", *extra)
+    assert len(compact) < len(regular)
+    # Nothing is moved into script or style blocks, which hosts often strip
+    assert compact.count("<script") == regular.count("<script")
+    assert "<style" not in compact
+    assert compact.count("<button") == regular.count("<button")
+    assert compact.count("<button") == len(re.findall(r"<button [^>]*onclick=\"var e=document\.getElementById\('[^']+'\);", compact))
+    assert compact.count('style="display:none') == regular.count('style="display:none')
+    assert re.findall(r'id="([^"]+)"', compact) == re.findall(r'id="([^"]+)"', regular)
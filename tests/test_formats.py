@@ -0,0 +1,100 @@
+"""The JSON manifest, Markdown and BBCode writers (formats.py)."""
+
+import io
+import json
+import zlib
+from types import SimpleNamespace
+
+from conftest import SHOW_FILES, post_argv
+from formats import FORMAT_EXTENSIONS, BBCodeWriter, JsonManifestWriter, MarkdownWriter, bb_escape, bb_link, md_escape, md_link
+
+def test_links_are_escaped_for_their_markup():
+    url = "https://b2.example/shows/(Hi10)_Show/[ABCD1234].mkv"
+    assert md_link("Spaste", url) == "[Spaste](https://b2.example/shows/%28Hi10%29_Show/[ABCD1234].mkv)"
+    assert bb_link("Spaste", url) == "[url=https://b2.example/shows/(Hi10)_Show/%5BABCD1234%5D.mkv]Spaste[/url]"
+
+def test_text_is_escaped_for_its_markup():
+    assert md_escape("*Re_Zero* [S2] `x` #1 <b> a|b ~c~ \\") == r"\*Re\_Zero\* \[S2\] \`x\` \#1 \<b\> a\|b \~c\~ \\"
+    assert md_escape("- not a list") == r"\- not a list"
+    assert md_escape("1. not a list") == r"1\. not a list"
+    assert md_escape("Cyberpunk: Edgerunners") == "Cyberpunk: Edgerunners"
+    assert bb_escape("see [url=https://evil.example]here[/url]") == "see &#91;url=https://evil.example&#93;here&#91;/url&#93;"
+    assert md_link("[Oshi no Ko]", "https://x/(1)") == r"[\[Oshi no Ko\]](https://x/%281%29)"
+    assert bb_link("[Oshi no Ko]", "https://x/[1]") == "[url=https://x/%5B1%5D]&#91;Oshi no Ko&#93;[/url]"
+
+def hostile_season():
+    """A season whose MAL data and file names are full of markup characters."""
+    section = SimpleNamespace(
+        info={"folder": "f", "quality": "BD 1080p", "size": "1.00 GB", "new": False, "torrent": "https://b2/t.torrent",
+              "encoding": {"source": "BD", "video": "x265_10bit", "audio": "FLAC [2.0]"}},
+        records=lambda: [{"label": "OVA_02", "new": False, "size": "300 MB", "crc32": "ABCD1234",
+                          "url": "https://b2/ep.mkv"}])
+    info = {"title": "[Oshi no Ko]", "short_title": "*Oshi*", "mal_url": "https://myanimelist.net/anime/52034",
+            "synopsis": "- Ai is an _idol_ [url=https://evil.example]click[/url] with **secrets**."}
+    return SimpleNamespace(info=info, sections=[section])
+
+def test_markdown_escapes_mal_text_and_labels():
+    stream = io.StringIO()
+    MarkdownWriter(stream).write_season(hostile_season())
+    markdown = stream.getvalue()
+    assert markdown.startswith(r"## [\[Oshi no Ko\]](https://myanimelist.net/anime/52034) | \*Oshi\*")
+    assert r"\- Ai is an \_idol\_ \[url=https://evil.example\]click\[/url\] with \*\*secrets\*\*." in markdown
+    assert r"x265\_10bit · FLAC \[2.0\]" in markdown
+    assert r"- **OVA\_02** · 300 MB · `ABCD1234`" in markdown
+
+def test_bbcode_neutralises_brackets_in_text():
+    stream = io.StringIO()
+    BBCodeWriter(stream).write_season(hostile_season())
+    bbcode = stream.getvalue()
+    assert bbcode.startswith("[b][url=https://myanimelist.net/anime/52034]&#91;Oshi no Ko&#93;[/url][/b] | *Oshi*")
+    assert "[quote]- Ai is an _idol_ &#91;url=https://evil.example&#93;click&#91;/url&#93; with **secrets**.[/quote]" in bbcode
+    assert "FLAC &#91;2.0&#93;" in bbcode
+    assert "[url=https://evil" not in bbcode
+
+def test_empty_manifest_is_valid_json():
+    stream = io.StringIO()
+    writer = JsonManifestWriter(stream)
+    writer.add("<p>not a season</p>")
+    writer.close()
+    assert json.loads(stream.getvalue())["seasons"] == []
+
+def test_blocks_other_than_seasons_are_skipped():
+    stream = io.StringIO()
+    writer = BBCodeWriter(stream)
+    writer.add("<p>not a season</p>")
+    writer.close()
+    assert stream.getvalue() == ""
+
+def test_post_in_every_format(postar, media):
+    postar(*post_argv("post.txt"), "--formats", "json", "md", "bbcode")
+    output = media / "output"
+    folders = list(SHOW_FILES)
+    computed_crc = f"{zlib.crc32(bytes(i % 251 for i in range(2048))) & 0xffffffff:08X}"
+
+    manifest = json.loads((output / f"post{FORMAT_EXTENSIONS['json']}").read_text(encoding="utf-8"))
+    [season] = manifest["seasons"]
+    assert season["mal_id"] == "42310"
+    assert season["title"] == "Cyberpunk: Edgerunners"
+    assert [s["folder"] for s in season["sections"]] == folders
+    assert [s["quality"] for s in season["sections"]] == ["BD 1080p", "BD 720p"]
+    for section in season["sections"]:
+        assert sorted(r["filename"] for r in section["episodes"]) == sorted(SHOW_FILES[section["folder"]])
+        assert set(section["torrent_links"]) == {"Spaste", "Ouo.io", "Fc.lc"}
+        assert section["encoding"]["source"]
+        for episode in section["episodes"]:
+            assert episode["url"].endswith(episode["filename"])
+            assert all(link.endswith(episode["url"]) for link in episode["links"].values())
+    crcs = {r["crc32"] for r in season["sections"][0]["episodes"]}
+    assert {"ABCD1234", computed_crc} <= crcs
+
+    markdown = (output / f"post{FORMAT_EXTENSIONS['md']}").read_text(encoding="utf-8")
+    assert markdown.startswith("## [Cyberpunk: Edgerunners](https://myanimelist.net/anime/42310)")
+    assert markdown.count("### BD ") == 2
+    assert f"`{computed_crc}`" in markdown
+    assert "/(Hi10)" not in markdown  # parentheses in link targets are escaped
+
+    bbcode = (output / f"post{FORMAT_EXTENSIONS['bbcode']}").read_text(encoding="utf-8")
+    assert bbcode.startswith("[b][url=https://myanimelist.net/anime/42310]Cyberpunk: Edgerunners[/url][/b]")
+    assert bbcode.count("[list]") == bbcode.count("[/list]") == 2
+    assert bbcode.count("[*]") == sum(len(files) for files in SHOW_FILES.values())
+    assert f"[{computed_crc}]" in bbcode
@@ -0,0 +1,99 @@
+"""Rendered fragments cached by input hash (helper.FragmentCache)."""
+
+import re
+import zlib
+
+from conftest import SHOW_FILES, TEST_SETTINGS, post_argv
+from helper import DEFAULT_SETTINGS, FragmentCache, encoding_inputs, job_scope, set_job_value
+
+def test_render_builds_once_per_inputs(tmp_path):
+    cache = FragmentCache(tmp_path / "fragments.json")
+    built = []
+
+    def build(text):
+        return lambda: built.append(text) or text
+
+    assert cache.render("episodes", ["Show", 1], build("a")) == "a"
+    assert cache.render("episodes", ["Show", 1], build("b")) == "a"
+    assert cache.render("episodes", ["Show", 2], build("c")) == "c"
+    assert cache.render("encoding_info", ["Show", 1], build("d")) == "d"
+    assert built == ["a", "c", "d"]
+    assert (cache.hits, cache.misses) == (1, 3)
+
+def test_stream_caches_the_joined_lines(tmp_path):
+    cache = FragmentCache(tmp_path / "fragments.json")
+    assert list(cache.stream("episodes", ["Show"], lambda: iter(["row 1", "row 2"]))) == ["row 1", "row 2"]
+    assert list(cache.stream("episodes", ["Show"], lambda: iter(["not", "used"]))) == ["row 1\nrow 2"]
+
+def test_saved_and_reloaded(tmp_path):
+    path = tmp_path / "fragments.json"
+    cache = FragmentCache(path)
+    cache.render("episodes", ["Show"], lambda: "rows")
+    cache.save()
+    assert FragmentCache(path).render("episodes", ["Show"], lambda: "rebuilt") == "rows"
+
+def test_least_recently_used_are_dropped(tmp_path):
+    path = tmp_path / "fragments.json"
+    cache = FragmentCache(path, max_entries=2)
+    for n in range(3):
+        cache.render("episodes", [n], lambda: "x")
+    cache.render("episodes", [0], lambda: "x")  # used again: newer than 1
+    cache.save()
+    reloaded = FragmentCache(path)
+    assert reloaded.has("episodes", [0]) and reloaded.has("episodes", [2])
+    assert not reloaded.has("episodes", [1])
+
+def test_disabled_cache_always_builds(tmp_path):
+    cache = FragmentCache(tmp_path / "fragments.json", enabled=False)
+    cache.render("episodes", ["Show"], lambda: "a")
+    assert cache.render("episodes", ["Show"], lambda: "b") == "b"
+    cache.save()
+    assert not (tmp_path / "fragments.json").exists()
+
+def test_encoding_inputs_follow_the_files(media):
+    folder = media / next(iter(SHOW_FILES))
+    with job_scope():
+        set_job_value("settings", {**DEFAULT_SETTINGS, **TEST_SETTINGS})
+        before = encoding_inputs(folder)
+        assert encoding_inputs(folder) == before
+        episode = next(folder.glob("*_-_02_*"))
+        episode.write_bytes(episode.read_bytes() + b"re-encoded")
+        assert encoding_inputs(folder) != before
+
+        set_job_value("settings", {**DEFAULT_SETTINGS, **TEST_SETTINGS, "ENCODER_NAME": "Other"})
+        assert encoding_inputs(folder)[-1] == "Other"
+
+def cache_counts(output: str) -> tuple[int, int]:
+    reused, rendered = re.search(r"\[Cache\] (\d+) fragment\(s\) reused, (\d+) rendered", output).groups()
+    return int(reused), int(rendered)
+
+def test_rerun_only_rerenders_what_changed(postar, app, media):
+    argv = post_argv("post.txt")
+    postar(*argv)
+    processed = app / "settings" / "processed.json"
+    processed.unlink()  # same New markers every run
+    # Two encoding tables and two episode tables
+    assert cache_counts(postar(*argv).stdout) == (4, 0)
+    first = (media / "output" / "post.txt").read_text(encoding="utf-8")
+
+    processed.unlink()
+    episode = next((media / next(iter(SHOW_FILES))).glob("*_-_02_*"))
+    episode.write_bytes(b"\0" * 4096)
+    # Only the 1080p folder's tables
+    assert cache_counts(postar(*argv).stdout) == (2, 2)
+    post = (media / "output" / "post.txt").read_text(encoding="utf-8")
+    assert post != first
+    assert f"{zlib.crc32(bytes(4096)) & 0xffffffff:08X}" in post
+
+def test_truncated_file_is_a_cold_cache(tmp_path):
+    path = tmp_path / "fragments.json"
+    cache = FragmentCache(path)
+    cache.render("episodes", ["Show"], lambda: "rows")
+    cache.save()
+    path.write_text(path.read_text(encoding="utf-8")[:20], encoding="utf-8")  # cut off mid-write
+
+    cold = FragmentCache(path)
+    assert cold.render("episodes", ["Show"], lambda: "rebuilt") == "rebuilt"
+    cold.save()
+    assert FragmentCache(path).render("episodes", ["Show"], lambda: "again") == "rebuilt"
+    assert not list(tmp_path.glob("*.tmp"))
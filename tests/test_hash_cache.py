@@ -0,0 +1,117 @@
+"""The CRC32 hash cache (helper.cached_crc32 / save_hash_cache)."""
+
+import json
+import os
+import zlib
+
+import pytest
+
+import helper
+
+@pytest.fixture
+def hash_cache(tmp_path, monkeypatch):
+    """An empty hash cache saved to tmp_path."""
+    path = tmp_path / "hash_cache.json"
+    monkeypatch.setattr(helper, "HASH_CACHE_FILE", path)
+    monkeypatch.setattr(helper, "_hash_cache", None)
+    monkeypatch.setattr(helper, "_hash_cache_dirty", False)
+    monkeypatch.setattr(helper, "ensure_settings_dir", lambda: tmp_path)
+    return path
+
+def crc_of(data: bytes) -> str:
+    return f"{zlib.crc32(data) & 0xffffffff:08X}"
+
+def test_hashes_are_saved_once(tmp_path, hash_cache, monkeypatch):
+    files = []
+    for n in range(3):
+        path = tmp_path / f"ep{n}.mkv"
+        path.write_bytes(b"episode %d" % n)
+        files.append(path)
+
+    read = []
+    compute = helper.compute_crc32
+    monkeypatch.setattr(helper, "compute_crc32", lambda path: read.append(path) or compute(path))
+    for path in files:
+        assert helper.cached_crc32(path) == crc_of(path.read_bytes())
+    assert not hash_cache.exists()  # nothing written per file
+
+    helper.save_hash_cache()
+    saved = json.loads(hash_cache.read_text(encoding="utf-8"))
+    assert sorted(saved.values()) == sorted(crc_of(p.read_bytes()) for p in files)
+
+    # Known now: not read again
+    for path in files:
+        helper.cached_crc32(path)
+    assert read == files
+
+def test_changed_file_is_hashed_again(tmp_path, hash_cache):
+    path = tmp_path / "ep.mkv"
+    path.write_bytes(b"first cut")
+    assert helper.cached_crc32(path) == crc_of(b"first cut")
+
+    path.write_bytes(b"second cut, longer")
+    assert helper.known_crc32(path) is None
+    assert helper.cached_crc32(path) == crc_of(b"second cut, longer")
+
+def test_stale_entries_are_pruned_on_save(tmp_path, hash_cache):
+    changed = tmp_path / "changed.mkv"
+    deleted = tmp_path / "deleted.mkv"
+    kept = tmp_path / "kept.mkv"
+    for path in (changed, deleted, kept):
+        path.write_bytes(path.name.encode())
+        helper.cached_crc32(path)
+    changed.write_bytes(b"re-encoded")
+    os.utime(changed, ns=(1, 1))
+    deleted.unlink()
+
+    # Folders that are missing altogether (an unmounted drive) are kept
+    unmounted = f"{tmp_path / 'unmounted' / 'ep.mkv'}|10|10"
+    helper._load_hash_cache()[unmounted] = "0000ABCD"
+
+    helper.save_hash_cache()
+    saved = json.loads(hash_cache.read_text(encoding="utf-8"))
+    paths = {key.rsplit("|", 2)[0] for key in saved}
+    assert paths == {str(kept.resolve()), str(tmp_path / "unmounted" / "ep.mkv")}
+
+def test_save_keeps_what_another_process_saved(tmp_path, hash_cache):
+    other = tmp_path / "other.mkv"
+    other.write_bytes(b"other process")
+    st = other.stat()
+    other_key = f"{other.resolve()}|{st.st_size}|{st.st_mtime_ns}"
+    helper._load_hash_cache()  # loaded before the other process saves
+    hash_cache.write_text(json.dumps({other_key: "12345678"}), encoding="utf-8")
+
+    mine = tmp_path / "mine.mkv"
+    mine.write_bytes(b"this process")
+    helper.cached_crc32(mine)
+    helper.save_hash_cache()
+
+    saved = json.loads(hash_cache.read_text(encoding="utf-8"))
+    assert saved[other_key] == "12345678"
+    assert crc_of(b"this process") in saved.values()
+
+def test_interrupted_save_leaves_the_old_file(tmp_path, hash_cache, monkeypatch):
+    saved = json.dumps({"old|1|1": "0000ABCD"})
+    hash_cache.write_text(saved, encoding="utf-8")
+    path = tmp_path / "ep.mkv"
+    path.write_bytes(b"episode")
+    helper.cached_crc32(path)
+
+    def crash(src, dst):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as m:
+        m.setattr(helper.os, "replace", crash)
+        helper.save_hash_cache()  # warns, doesn't raise
+    assert hash_cache.read_text(encoding="utf-8") == saved
+    assert not list(tmp_path.glob("*.tmp"))
+
+    helper.save_hash_cache()  # still unsaved, so written next time
+    assert crc_of(b"episode") in json.loads(hash_cache.read_text(encoding="utf-8")).values()
+
+def test_truncated_file_is_a_cold_cache(tmp_path, hash_cache):
+    hash_cache.write_text('{"/media/ep.mkv|10|10": "0000AB', encoding="utf-8")
+    path = tmp_path / "ep.mkv"
+    path.write_bytes(b"episode")
+    assert helper.known_crc32(path) is None
+    assert helper.cached_crc32(path) == crc_of(b"episode")
@@ -0,0 +1,58 @@
+"""The durable queue's file format (jobqueue.py)."""
+
+import json
+
+import pytest
+
+from jobqueue import JOB_QUEUE_FILE, STAGES, JobQueue, QueueFileError
+
+def test_not_the_gui_queue_file():
+    # The GUI keeps its own list of {args, output} in postar_job_queue.json
+    assert JOB_QUEUE_FILE.name != "postar_job_queue.json"
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "queue.json"
+    queue = JobQueue(path)
+    job = queue.add("show", ["-p", "/media/Show", "-m", "1"], {"/media/Show"}, retries=1, retry_delay=5)
+    queue.checkpoint(job["id"], "discovered", {"folders": ["/media/Show"]})
+
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert data["version"] == 1
+    assert data["next_id"] == 2
+    assert data["runner"] is None
+    [saved] = data["jobs"]
+    assert saved["name"] == "show"
+    assert saved["argv"] == ["-p", "/media/Show", "-m", "1"]
+    assert saved["keys"] == ["/media/Show"]
+    assert saved["status"] == "queued"
+    assert saved["retries"] == 1
+    assert set(saved["stages"]) <= set(STAGES)
+    assert saved["stages"]["discovered"]["data"] == {"folders": ["/media/Show"]}
+
+    # Another process sees the same queue
+    assert JobQueue(path).get(job["id"])["stages"] == saved["stages"]
+    assert not path.with_name(path.name + ".lock").exists()
+
+def test_gui_queue_file_is_rejected_and_left_alone(tmp_path):
+    path = tmp_path / "queue.json"
+    gui_queue = json.dumps([{"args": ["-p", "/media/Show"], "output": "show.txt"}])
+    path.write_text(gui_queue, encoding="utf-8")
+    queue = JobQueue(path)
+    with pytest.raises(QueueFileError):
+        queue.jobs()
+    with pytest.raises(QueueFileError):
+        queue.add("show", ["-p", "/media/Show"])
+    assert path.read_text(encoding="utf-8") == gui_queue
+
+def test_unreadable_file_is_moved_aside(tmp_path):
+    path = tmp_path / "queue.json"
+    path.write_text("{not json", encoding="utf-8")
+    assert JobQueue(path).jobs() == []
+    assert path.with_name("queue.json.bad").read_text(encoding="utf-8") == "{not json"
+
+def test_cli_reports_a_foreign_queue_file(postar, app):
+    (app / "settings" / JOB_QUEUE_FILE.name).write_text("[]", encoding="utf-8")
+    result = postar("--queue", "list", check=False)
+    assert result.returncode == 1
+    assert "isn't a postar job queue file" in result.stdout
+    assert "Traceback" not in result.stderr
@@ -0,0 +1,77 @@
+"""Layout templates (layout.py): compiling, user overrides and -layout."""
+
+import pytest
+
+import layout
+from conftest import SHOW_FILES, post_argv
+from helper import SPASTE_PREFIX, job_scope
+from layout import DEFAULT_TEMPLATES, Layout, compile_template, get_layout, load_templates, set_layout_dir
+
+ROW = {"label": "01", "size": "1.00 GB", "crc": "ABCD1234", "url": "https://b2.example/shows/ep01.mkv"}
+
+def test_defaults_compile_to_the_row_html():
+    html = compile_template("episode_row_crc", DEFAULT_TEMPLATES["episode_row_crc"])(ROW)
+    assert "<td>01</td>" in html and "<td>ABCD1234</td>" in html
+    assert f'<a href="{SPASTE_PREFIX}https://b2.example/shows/ep01.mkv">' in html  # constants baked in
+
+def test_template_forms():
+    assert compile_template("episode_row", "{label}|{{literal}}|{size}")(ROW) == "01|{literal}|1.00 GB"
+    # Format specs take the generic path and still work
+    assert compile_template("episode_row", "[{label:>4}] {size!r}")(ROW) == "[  01] '1.00 GB'"
+    assert compile_template("episode_header", "<tr></tr>")({}) == "<tr></tr>"
+
+@pytest.mark.parametrize("name, text, message", [
+    ("episode_row", "<td>{crc}</td>", r"uses unknown field\(s\): crc"),
+    ("batch_row", "<td>{quality}</td><td>{label}</td>", r"uses unknown field\(s\): label"),
+    ("episode_row", "<td>{label</td>", "is invalid"),
+    ("toggle_close", "</div>}", "is invalid"),
+])
+def test_bad_templates_fail_when_compiled(name, text, message):
+    with pytest.raises(ValueError, match=message):
+        compile_template(name, text)
+
+def test_user_templates_override_only_their_part(tmp_path):
+    (tmp_path / "episode_row.html").write_text("<li>{label} {size}</li>\n", encoding="utf-8")
+    (tmp_path / "unrelated.html").write_text("ignored", encoding="utf-8")
+    templates = load_templates(tmp_path)
+    assert templates["episode_row"] == "<li>{label} {size}</li>"  # trailing newline dropped
+    assert {name: text for name, text in templates.items() if name != "episode_row"} == \
+        {name: text for name, text in DEFAULT_TEMPLATES.items() if name != "episode_row"}
+
+    plain, with_crc = Layout(templates), Layout(templates, crc_enabled=True)
+    assert plain.episode_row(ROW) == "<li>01 1.00 GB</li>"
+    assert "<td>ABCD1234</td>" in with_crc.episode_row(ROW)  # episode_row_crc wasn't overridden
+
+    with pytest.raises(ValueError, match="Template folder not found"):
+        load_templates(tmp_path / "missing")
+
+def test_kage_toggle():
+    fields = {"folder": "Show", "title": "Show"}
+    assert Layout(DEFAULT_TEMPLATES, kage=True).toggle_open(fields) == '<div style="align:center">'
+    assert 'id="Show_hidden"' in Layout(DEFAULT_TEMPLATES).toggle_open(fields)
+
+def test_job_layout_leaves_the_process_layout_alone(tmp_path, monkeypatch):
+    monkeypatch.setattr(layout, "_templates", None)
+    monkeypatch.setattr(layout, "_layouts", {})
+    (tmp_path / "toggle_close.html").write_text("</section>", encoding="utf-8")
+    with job_scope():
+        set_layout_dir(tmp_path)
+        assert get_layout().toggle_close({}) == "</section>"
+        assert get_layout() is get_layout()  # compiled once per variant
+    assert get_layout().toggle_close({}) == "</div>"
+
+def test_layout_option(postar, media, tmp_path):
+    templates = tmp_path / "templates"
+    templates.mkdir()
+    (templates / "episode_row_crc.html").write_text('<tr class="ep"><td>{label}</td><td>{crc}</td></tr>', encoding="utf-8")
+    result = postar(*post_argv("post.txt"), "-layout", str(templates))
+    assert "[Layout] Using episode_row_crc.html" in result.stdout
+    post = (media / "output" / "post.txt").read_text(encoding="utf-8")
+    assert '<tr class="ep"><td>01<sup>New</sup></td><td>ABCD1234</td></tr>' in post
+    assert post.count('<tr class="ep">') == sum(len(files) for files in SHOW_FILES.values())
+
+    (templates / "episode_row_crc.html").write_text("<td>{episode}</td>", encoding="utf-8")
+    result = postar(*post_argv("bad.txt"), "-layout", str(templates), check=False)
+    assert result.returncode != 0
+    assert "uses unknown field(s): episode" in result.stdout + result.stderr
+    assert not (media / "output" / "bad.txt").exists()
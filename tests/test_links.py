@@ -0,0 +1,86 @@
+"""Link checking (helper.check_links, print_link_report), against tools/stub_server.py."""
+
+import json
+import time
+
+import pytest
+
+import helper
+from helper import LINK_CHECK_CACHE_TTL, check_links, print_link_report
+
+@pytest.fixture
+def bucket(tmp_path, monkeypatch):
+    """A stub serving tmp_path/buckets at /file/, with the link cache in tmp_path. Yields (url(name), server)."""
+    from stub_server import StubState, start_stub_server
+    root = tmp_path / "buckets" / "shows"
+    root.mkdir(parents=True)
+    (root / "ep01.mkv").write_bytes(b"1" * 100)
+    (root / "ep02.mkv").write_bytes(b"2" * 50)
+    (root / "show.torrent").write_bytes(b"t")
+    server = start_stub_server(state=StubState(files_root=tmp_path / "buckets"))
+    monkeypatch.setattr(helper, "LINK_CHECK_CACHE_FILE", tmp_path / "link_check_cache.json")
+    monkeypatch.setattr(helper, "ensure_settings_dir", lambda: tmp_path)
+    yield (lambda name: f"{server.base_url}/file/shows/{name}"), server
+    server.shutdown()
+    server.server_close()
+
+def requests_made(server) -> int:
+    return sum(n for path, n in server.state.stats.items() if path.startswith("/file/"))
+
+def test_statuses(bucket):
+    url, _ = bucket
+    links = [(url("ep01.mkv"), 100), (url("ep02.mkv"), 60), (url("ep03.mkv"), 10), (url("show.torrent"), None)]
+    results = check_links(links, concurrency=4)
+    assert {u.rsplit("/", 1)[1]: r["status"] for u, r in results.items()} == \
+        {"ep01.mkv": "ok", "ep02.mkv": "mismatch", "ep03.mkv": "missing", "show.torrent": "ok"}
+    assert results[url("ep02.mkv")]["detail"] == "remote 50 bytes, local 60 bytes"
+    assert results[url("show.torrent")]["expected"] is None
+
+def test_ok_results_are_cached(bucket):
+    url, server = bucket
+    links = [(url("ep01.mkv"), 100), (url("ep03.mkv"), 10)]
+    check_links(links)
+    assert requests_made(server) == 2
+
+    results = check_links(links)
+    assert results[url("ep01.mkv")] == {"status": "ok", "detail": "cached", "expected": 100}
+    assert results[url("ep03.mkv")]["status"] == "missing"  # problems are checked again
+    assert requests_made(server) == 3
+
+    # A different expected size (the file was re-encoded) isn't covered by the cached result
+    assert check_links([(url("ep01.mkv"), 99)])[url("ep01.mkv")]["status"] == "mismatch"
+
+def test_expired_entries_are_checked_and_dropped(bucket):
+    url, server = bucket
+    stale = time.time() - LINK_CHECK_CACHE_TTL - 1
+    helper.LINK_CHECK_CACHE_FILE.write_text(json.dumps({f"{url('ep01.mkv')}|100": stale, "gone|1": stale}),
+                                            encoding="utf-8")
+    assert check_links([(url("ep01.mkv"), 100)])[url("ep01.mkv")]["detail"] == ""
+    assert requests_made(server) == 1
+    assert list(json.loads(helper.LINK_CHECK_CACHE_FILE.read_text(encoding="utf-8"))) == [f"{url('ep01.mkv')}|100"]
+
+def test_without_the_cache(bucket):
+    url, server = bucket
+    check_links([(url("ep01.mkv"), 100)], use_cache=False)
+    check_links([(url("ep01.mkv"), 100)], use_cache=False)
+    assert requests_made(server) == 2
+    assert not helper.LINK_CHECK_CACHE_FILE.exists()
+
+def test_unreachable_host():
+    result = check_links([("http://127.0.0.1:9/nothing.mkv", 1)], use_cache=False)["http://127.0.0.1:9/nothing.mkv"]
+    assert result["status"] == "error"
+
+def test_report(capsys):
+    results = {
+        "https://b2.example/ep01.mkv": {"status": "ok", "detail": "cached", "expected": 100},
+        "https://b2.example/ep02.mkv": {"status": "mismatch", "detail": "remote 50 bytes, local 60 bytes", "expected": 60},
+        "https://b2.example/ep03.mkv": {"status": "missing", "detail": "404", "expected": 10},
+    }
+    assert print_link_report(results) is False
+    out = capsys.readouterr().out.splitlines()
+    assert out == [
+        "[Links] Checked 3 links (1 cached), 2 problem(s).",
+        "[Links] MISMATCH https://b2.example/ep02.mkv (remote 50 bytes, local 60 bytes)",
+        "[Links] MISSING  https://b2.example/ep03.mkv (404)",
+    ]
+    assert print_link_report({"https://b2.example/ep01.mkv": results["https://b2.example/ep01.mkv"]}) is True
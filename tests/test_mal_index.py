@@ -0,0 +1,139 @@
+"""The offline MAL title index (helper.MalTitleIndex, seed_mal_index, -am)."""
+
+import json
+
+import pytest
+
+import helper
+from conftest import SHOW_FILES, post_argv
+from helper import MAL_MATCH_THRESHOLD, MalTitleIndex, _dump_entry_to_index
+
+ENTRIES = {
+    "42310": {"title": "Cyberpunk: Edgerunners", "english_title": "Cyberpunk: Edgerunners", "synonyms": [],
+              "season_info": "Summer 2022"},
+    "37210": {"title": "Isekai Maou to Shoukan Shoujo no Dorei Majutsu", "english_title": "How NOT to Summon a Demon Lord",
+              "synonyms": [], "season_info": "Summer 2018"},
+    "41623": {"title": "Isekai Maou to Shoukan Shoujo no Dorei Majutsu Omega",
+              "english_title": "How NOT to Summon a Demon Lord Ω", "synonyms": ["Isekai Maou Omega"],
+              "season_info": "Spring 2021"},
+    "40591": {"title": "Kaguya-sama wa Kokurasetai? Tensai-tachi no Renai Zunousen", "english_title": None,
+              "synonyms": ["Kaguya-sama wa Kokurasetai 2nd Season"], "season_info": "Spring 2020"},
+}
+
+@pytest.fixture
+def mal_index(tmp_path, monkeypatch):
+    """An empty title index saved to tmp_path."""
+    path = tmp_path / "mal_title_index.json"
+    monkeypatch.setattr(helper, "MAL_INDEX_FILE", path)
+    monkeypatch.setattr(helper, "_mal_index", None)
+    monkeypatch.setattr(helper, "_mal_index_dirty", False)
+    monkeypatch.setattr(helper, "ensure_settings_dir", lambda: tmp_path)
+    return path
+
+def test_exact_match():
+    index = MalTitleIndex(ENTRIES)
+    assert index.search("Cyberpunk Edgerunners")[0] == ("42310", "Cyberpunk: Edgerunners", 1.0)
+    # English titles, synonyms and season markers count too
+    assert index.search("How NOT to Summon a Demon Lord")[0][0] == "37210"
+    assert index.search("Isekai Maou Omega")[0][0] == "41623"
+    assert index.search("Kaguya-sama wa Kokurasetai S2")[0][0] == "40591"
+
+def test_fuzzy_match():
+    index = MalTitleIndex(ENTRIES)
+    [(mal_id, _, score)] = index.search("Cyberpunk Edgerunner", limit=1)
+    assert mal_id == "42310"
+    assert MAL_MATCH_THRESHOLD <= score < 1.0
+    # The closer of two similar titles wins
+    ranked = index.search("Isekai Maou to Shoukan Shoujo no Dorei Majutsu Omega")
+    assert [m[0] for m in ranked[:2]] == ["41623", "37210"]
+
+def test_below_threshold(mal_index, monkeypatch):
+    monkeypatch.setattr(helper, "_mal_index", MalTitleIndex(ENTRIES))
+    assert helper.resolve_mal_id("(Hi10)_Totally_Different_Show_(1080p)") is None
+    assert all(score < MAL_MATCH_THRESHOLD for _, _, score in helper.suggest_mal_ids("Totally Different Show"))
+    assert helper.resolve_mal_id("(Hi10)_Cyberpunk_Edgerunners_(BD_1080p)") == "42310"
+    assert MalTitleIndex().search("Cyberpunk") == []
+
+def test_dump_formats():
+    official = {"id": 42310, "title": "Cyberpunk: Edgerunners",
+                "alternative_titles": {"en": "Cyberpunk: Edgerunners", "synonyms": ["CP:E"]},
+                "start_season": {"year": 2022, "season": "summer"}}
+    jikan = {"mal_id": 42310, "title": "Cyberpunk: Edgerunners", "title_english": "Cyberpunk: Edgerunners",
+             "title_synonyms": ["CP:E"], "season": "summer", "year": 2022}
+    offline_db = {"sources": ["https://anidb.net/anime/17010", "https://myanimelist.net/anime/42310"],
+                  "title": "Cyberpunk: Edgerunners", "synonyms": ["CP:E"],
+                  "animeSeason": {"season": "SUMMER", "year": 2022}}
+    expected = {"title": "Cyberpunk: Edgerunners", "english_title": "Cyberpunk: Edgerunners", "synonyms": ["CP:E"],
+                "season_info": "Summer 2022"}
+    assert _dump_entry_to_index(official) == ("42310", expected)
+    assert _dump_entry_to_index(jikan) == ("42310", expected)
+    assert _dump_entry_to_index(offline_db) == ("42310", {**expected, "english_title": None})
+
+    undefined_season = {**offline_db, "animeSeason": {"season": "UNDEFINED", "year": 2022}}
+    assert _dump_entry_to_index(undefined_season)[1]["season_info"] == ""
+    assert _dump_entry_to_index({"sources": ["https://anidb.net/anime/1"], "title": "Not on MAL"}) == (None, None)
+    assert _dump_entry_to_index({"id": 1}) == (None, None)
+
+def test_seed_from_json_and_json_lines(tmp_path, mal_index):
+    records = [{"id": int(mal_id), "title": entry["title"]} for mal_id, entry in ENTRIES.items()]
+    dump = tmp_path / "dump.json"
+    dump.write_text(json.dumps({"data": records[:2]}), encoding="utf-8")
+    assert helper.seed_mal_index(dump) == 2
+
+    lines = tmp_path / "dump.jsonl"
+    lines.write_text("\n".join(json.dumps(r) for r in records) + "\n", encoding="utf-8")
+    assert helper.seed_mal_index(lines) == 2  # the first two are known already
+
+    saved = json.loads(mal_index.read_text(encoding="utf-8"))
+    assert sorted(saved) == sorted(ENTRIES)
+    assert helper.resolve_mal_id("(Hi10)_Cyberpunk_Edgerunners_(BD_1080p)") == "42310"
+
+def test_lookups_are_saved_once(mal_index):
+    for mal_id, entry in ENTRIES.items():
+        helper.remember_mal_entry(mal_id, {"full_title": entry["title"], "english_title": entry["english_title"],
+                                           "synonyms": entry["synonyms"], "season_info": entry["season_info"]})
+    assert not mal_index.exists()  # nothing written per lookup
+
+    helper.save_mal_index()
+    assert json.loads(mal_index.read_text(encoding="utf-8")) == ENTRIES
+    assert [p.name for p in mal_index.parent.iterdir()] == [mal_index.name]  # no temporary files left
+
+def test_save_keeps_what_another_process_saved(mal_index):
+    helper.get_mal_index()  # loaded before the other process saves
+    mal_index.write_text(json.dumps({"37210": ENTRIES["37210"]}), encoding="utf-8")
+    helper.remember_mal_entry("42310", {"full_title": "Cyberpunk: Edgerunners"})
+    helper.save_mal_index()
+    assert sorted(json.loads(mal_index.read_text(encoding="utf-8"))) == ["37210", "42310"]
+
+def test_unreadable_index_is_moved_aside(mal_index):
+    mal_index.write_text('{"42310": {"title": "Cyber', encoding="utf-8")
+    assert helper.get_mal_index().entries == {}
+    assert mal_index.with_name(mal_index.name + ".bad").read_text(encoding="utf-8") == '{"42310": {"title": "Cyber'
+
+def test_auto_mal_gives_every_season_its_own_id(postar, app, media):
+    # A BD season plus a non-BD one in the same post
+    other = media / "(Hi10)_Isekai_Maou_Omega_(1080p)"
+    other.mkdir()
+    (other / "(Hi10)_Isekai_Maou_Omega_-_01_(1080p)_(Enc).mkv").write_bytes(b"\0" * 1024)
+    (app / "settings" / "mal_title_index.json").write_text(json.dumps(ENTRIES), encoding="utf-8")
+    argv = post_argv("post.txt")
+    del argv[argv.index("-m"):argv.index("-m") + 2]
+
+    result = postar(*argv, "-p", other.name, "-am")
+    bd_folder = next(iter(SHOW_FILES))
+    assert f"[MAL INDEX] {bd_folder} -> 42310" in result.stdout
+    assert f"[MAL INDEX] {other.name} -> 41623" in result.stdout
+    post = (media / "output" / "post.txt").read_text(encoding="utf-8")
+    assert "Cyberpunk: Edgerunners" in post
+    assert "Isekai Maou to Shoukan Shoujo no Dorei Majutsu Omega" in post
+
+def test_auto_mal_lists_suggestions_for_unmatched_folders(postar, app, media):
+    (app / "settings" / "mal_title_index.json").write_text(json.dumps(ENTRIES), encoding="utf-8")
+    other = media / "(Hi10)_Totally_Different_Show_(1080p)"
+    other.mkdir()
+    (other / "(Hi10)_Totally_Different_Show_-_01_(1080p).mkv").write_bytes(b"\0" * 1024)
+
+    result = postar("-p", other.name, "-a", "A1", "-d", "D1", "-c", "blue", "-am", "-o", "post.txt", check=False)
+    assert result.returncode == 1
+    assert f"[MAL INDEX] No confident match for {other.name}." in result.stdout
+    assert "Pass the MAL ID(s) with -m" in result.stderr
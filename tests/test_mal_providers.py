@@ -0,0 +1,63 @@
+"""MAL provider selection and hedging (helper._fetch_hedged_mal_info), against tools/stub_server.py."""
+
+import time
+
+import pytest
+
+import helper
+
+@pytest.fixture
+def providers(monkeypatch):
+    """providers(primary_fault, hedge_delay) starts a stub whose official API has *primary_fault*
+    and configures it as the primary, with its Jikan API as the secondary. Yields that function."""
+    from stub_server import StubState, start_stub_server
+    servers = []
+
+    def configure(primary_fault, hedge_delay):
+        server = start_stub_server(state=StubState(route_faults={"/v2/anime": primary_fault}))
+        servers.append(server)
+        settings = {
+            "MAL_PROVIDERS": [
+                {"name": "primary", "kind": "official", "url": server.base_url + "/v2/anime/{mal_id}"},
+                {"name": "secondary", "kind": "jikan", "url": server.base_url + "/v4/anime/{mal_id}"},
+            ],
+            "MAL_HEDGE_DELAY": hedge_delay,
+        }
+        monkeypatch.setattr(helper, "get_settings", lambda: settings)
+        return server
+
+    monkeypatch.setattr(helper, "get_mal_client_id", lambda: "stub-client")
+    yield configure
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def test_only_the_official_api_by_default(monkeypatch):
+    monkeypatch.setattr(helper, "get_settings", lambda: {})
+    assert [p["name"] for p in helper.get_mal_providers()] == ["official"]
+
+def test_slow_primary_lets_the_secondary_win(providers, capsys):
+    from stub_server import FaultProfile
+    server = providers(FaultProfile(latency=3), hedge_delay=0.1)
+    started = time.monotonic()
+    data = helper._fetch_hedged_mal_info("42310")
+    assert time.monotonic() - started < 2
+    assert data["title"] == "Cyberpunk: Edgerunners"
+    assert "[API] Using SECONDARY MAL provider" in capsys.readouterr().out
+    assert server.state.stats["/v2/anime/42310"] == 1  # the primary was asked first
+
+def test_primary_error_falls_back(providers, capsys):
+    from stub_server import FaultProfile
+    server = providers(FaultProfile(error_rate=1.0), hedge_delay=10)
+    started = time.monotonic()
+    data = helper._fetch_hedged_mal_info("42310")
+    assert time.monotonic() - started < 5  # on the failure, not after the hedge delay
+    assert data["title"] == "Cyberpunk: Edgerunners"
+    assert "[API] Using SECONDARY MAL provider" in capsys.readouterr().out
+    assert server.state.stats["500"] == 1
+
+def test_every_provider_failing_is_an_error(providers):
+    from stub_server import FaultProfile
+    providers(FaultProfile(error_rate=1.0), hedge_delay=0.1)
+    with pytest.raises(RuntimeError, match="primary: .*500"):
+        helper._fetch_hedged_mal_info("999999")
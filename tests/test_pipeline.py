@@ -0,0 +1,37 @@
+"""The overlapped post pipeline (pipeline.py) against -seq, and the progressive preview built on it."""
+
+import json
+
+from conftest import TEST_SETTINGS, post_argv
+from helper import PENDING
+
+def fresh_post(postar, app, media, output, *extra) -> str:
+    """The post from empty caches, with its New markers removed again."""
+    for name in ("processed.json", "hash_cache.json", "fragment_cache.json", "mal_title_index.json"):
+        (app / "settings" / name).unlink(missing_ok=True)
+    postar(*post_argv(output), *extra)
+    return (media / "output" / output).read_text(encoding="utf-8")
+
+def test_sequential_post_is_identical(postar, app, media):
+    overlapped = fresh_post(postar, app, media, "overlapped.txt")
+    assert fresh_post(postar, app, media, "sequential.txt", "-seq") == overlapped
+
+def test_preview_fills_in_its_placeholders(library):
+    script = """
+        import json, sys
+        from api import Postar
+
+        postar = Postar(settings=json.loads(sys.argv[1]))
+        updates = list(postar.preview(json.loads(sys.argv[2])))
+        rendered, _ = postar.render(json.loads(sys.argv[2]))
+        print(json.dumps({"updates": updates, "rendered": rendered}))
+    """
+    output = library(script, json.dumps(TEST_SETTINGS), json.dumps(post_argv("post.txt")))
+    result = json.loads(output.splitlines()[-1])
+    (first, first_summary), *_, (last, last_summary) = result["updates"]
+    # Nothing was cached, so the first version is all placeholders for the CRC32s, MediaInfo and synopsis
+    assert first_summary["pending"] and not first_summary["final"]
+    assert PENDING in first
+    assert last_summary["final"] and not last_summary["pending"]
+    assert PENDING not in last
+    assert last == result["rendered"]
@@ -0,0 +1,103 @@
+"""
+End to end: one BD post over the fixture folders, rendered through the
+CLI, --batch, api.Postar.render and the daemon's /render, with empty
+caches (so MediaInfo, hashing and the MAL lookup all run).
+"""
+
+import json
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+import zlib
+
+from conftest import SHOW_FILES, post_argv
+
+def cli_reference(postar, app, media) -> str:
+    """The CLI's post, with the New markers it recorded removed again."""
+    postar(*post_argv("reference.txt"))
+    (app / "settings" / "processed.json").unlink()
+    return (media / "output" / "reference.txt").read_text(encoding="utf-8")
+
+def test_cli_post(postar, app, media):
+    result = postar(*post_argv("post.txt"))
+    assert "Traceback" not in result.stdout + result.stderr
+
+    html = (media / "output" / "post.txt").read_text(encoding="utf-8")
+    assert "Cyberpunk: Edgerunners" in html  # from the stub's MAL recording
+    for files in SHOW_FILES.values():
+        for name in files:
+            assert name in html
+    assert "ABCD1234" in html  # CRC32 from the file name
+    data = bytes(i % 251 for i in range(2048))
+    assert f"{zlib.crc32(data) & 0xffffffff:08X}" in html  # CRC32 worked out from the file
+    assert "<sup>New</sup>" in html
+
+    processed = json.loads((app / "settings" / "processed.json").read_text(encoding="utf-8"))
+    assert processed
+    assert (app / "settings" / "hash_cache.json").exists()
+
+def test_batch_matches_cli(postar, app, media):
+    reference = cli_reference(postar, app, media)
+    jobs = media / "jobs.json"
+    jobs.write_text(json.dumps({"jobs": [post_argv("batch.txt")]}), encoding="utf-8")
+    postar("--batch", str(jobs), "--jobs", "2")
+    assert (media / "output" / "batch.txt").read_text(encoding="utf-8") == reference
+
+def test_api_render_matches_cli(postar, app, media):
+    reference = cli_reference(postar, app, media)
+    script = ("import json, sys; from pathlib import Path; from api import Postar; "
+              "html, summary = Postar().render(json.loads(sys.argv[1])); "
+              "Path(sys.argv[2]).write_text(html, encoding='utf-8')")
+    out = media / "api.html"
+    subprocess.run([sys.executable, "-c", script, json.dumps(post_argv("api.txt")), str(out)],
+                   cwd=media, env={**postar.env, "PYTHONPATH": str(app)}, check=True, capture_output=True, timeout=120)
+    assert out.read_text(encoding="utf-8") == reference
+    assert not (app / "settings" / "processed.json").exists()  # render() records no New markers
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _request(url: str, body=None, headers=None, timeout=60):
+    data = None if body is None else json.dumps(body).encode("utf-8")
+    request = urllib.request.Request(url, data=data, headers=headers or {}, method="GET" if body is None else "POST")
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.status, response.read().decode("utf-8")
+
+def test_daemon_render_matches_cli(postar, app, media):
+    reference = cli_reference(postar, app, media)
+    base = f"http://127.0.0.1:{_free_port()}"
+    daemon = subprocess.Popen([sys.executable, str(app / "python_postar.py"), "--serve", base[len("http://"):]],
+                              cwd=media, env=postar.env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                _request(f"{base}/health")
+                break
+            except OSError:
+                if time.monotonic() > deadline or daemon.poll() is not None:
+                    raise
+                time.sleep(0.1)
+
+        json_headers = {"Content-Type": "application/json"}
+        status, html = _request(f"{base}/render?format=html", post_argv("daemon.txt"), json_headers)
+        assert status == 200
+        assert html == reference
+
+        # A web page's request is refused
+        try:
+            _request(f"{base}/render", post_argv("evil.txt"), {**json_headers, "Origin": "http://evil.example"})
+        except urllib.error.HTTPError as e:
+            assert e.code == 403
+        else:
+            raise AssertionError("a request from another origin was accepted")
+
+        _request(f"{base}/shutdown", {}, json_headers)
+        daemon.wait(timeout=30)
+    finally:
+        if daemon.poll() is None:
+            daemon.kill()
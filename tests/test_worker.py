@@ -0,0 +1,91 @@
+"""Work manifests (worker.py): export, workers with --map/--shard, and merging the results."""
+
+import json
+import shutil
+import zlib
+
+from conftest import SHOW_FILES, post_argv
+
+BD_1080, BD_720 = SHOW_FILES
+
+def crc_of(data: bytes) -> str:
+    return f"{zlib.crc32(data) & 0xffffffff:08X}"
+
+def export(postar, media) -> dict:
+    postar(*post_argv("post.txt"), "--export-manifest", "work.json")
+    return json.loads((media / "work.json").read_text(encoding="utf-8"))
+
+def storage_copy(media, tmp_path, folders, change=None) -> str:
+    """The folders as a storage host has them; *change* is rewritten with other bytes of the same size."""
+    storage = tmp_path / "storage"
+    for folder in folders:
+        shutil.copytree(media / folder, storage / folder)
+    if change:
+        (storage / change).write_bytes(b"\xff" * (storage / change).stat().st_size)
+    return f"{media.resolve()}={storage}"
+
+def test_manifest_lists_the_missing_work(postar, media):
+    manifest = export(postar, media)
+    assert manifest["kind"] == "postar-work-manifest"
+    items = {item["folder"]: item for item in manifest["items"]}
+    assert set(items) == {str((media / folder).resolve()) for folder in SHOW_FILES}
+    # Files with a CRC tag in their name aren't hashed
+    assert sorted(f["name"] for f in items[str((media / BD_1080).resolve())]["files"]) == \
+        sorted(name for name in SHOW_FILES[BD_1080] if "[" not in name)
+    assert not (media / "output" / "post.txt").exists()  # nothing rendered
+
+def test_worker_results_are_merged(postar, app, media, tmp_path):
+    export(postar, media)
+    # Same size, other bytes: a CRC32 in the post that only the worker could have worked out
+    probe = f"{BD_1080}/{next(name for name in SHOW_FILES[BD_1080] if '[' not in name)}"
+    mapping = storage_copy(media, tmp_path, SHOW_FILES, change=probe)
+    result = postar("worker", "work.json", "-o", "results.json", "--map", mapping)
+    assert "2 folder(s)" in result.stdout
+
+    result = postar(*post_argv("post.txt"), "--merge-results", "results.json")
+    assert "[Manifest] Merged 5 CRC32(s)" in result.stdout
+    post = (media / "output" / "post.txt").read_text(encoding="utf-8")
+    assert crc_of(b"\xff" * SHOW_FILES[BD_1080][probe.split("/")[1]]) in post
+    assert (app / "settings" / "hash_cache.json").exists()
+
+def test_folders_on_other_hosts_are_left_alone(postar, media, tmp_path):
+    export(postar, media)
+    mapping = storage_copy(media, tmp_path, [BD_1080])
+    result = postar("worker", "work.json", "-o", "results.json", "--map", mapping)
+    assert "1 folder(s) aren't on this host" in result.stdout
+    results = json.loads((media / "results.json").read_text(encoding="utf-8"))
+    assert [item["folder"] for item in results["items"]] == [str((media / BD_1080).resolve())]
+
+def test_shards_split_the_work(postar, media, tmp_path):
+    manifest = export(postar, media)
+    mapping = storage_copy(media, tmp_path, SHOW_FILES)
+    done = []
+    for shard in ("1/2", "2/2"):
+        postar("worker", "work.json", "-o", f"shard{shard[0]}.json", "--map", mapping, "--shard", shard)
+        results = json.loads((media / f"shard{shard[0]}.json").read_text(encoding="utf-8"))
+        assert len(results["items"]) == 1
+        done += [item["id"] for item in results["items"]]
+    assert sorted(done) == [item["id"] for item in manifest["items"]]
+
+    result = postar(*post_argv("post.txt"), "--merge-results", "shard1.json", "shard2.json")
+    assert "[Manifest] Merged 5 CRC32(s)" in result.stdout
+
+def test_files_changed_since_the_manifest_are_skipped(postar, media, tmp_path):
+    export(postar, media)
+    mapping = storage_copy(media, tmp_path, SHOW_FILES)
+    postar("worker", "work.json", "-o", "results.json", "--map", mapping)
+
+    # Re-encoded on the coordinator after the manifest was written
+    changed = media / BD_720 / next(iter(SHOW_FILES[BD_720]))
+    changed.write_bytes(b"re-encoded")
+    result = postar(*post_argv("post.txt"), "--merge-results", "results.json")
+    assert "[Manifest] Merged 4 CRC32(s)" in result.stdout
+    assert "1 changed since and skipped" in result.stdout
+    post = (media / "output" / "post.txt").read_text(encoding="utf-8")
+    assert crc_of(b"re-encoded") in post  # hashed locally as usual
+
+def test_unreadable_manifest(postar, media):
+    (media / "work.json").write_text('{"kind": "postar-work-results", "version": 1}', encoding="utf-8")
+    result = postar("worker", "work.json", "-o", "results.json", check=False)
+    assert result.returncode == 1
+    assert "is not a postar-work-manifest file" in result.stdout
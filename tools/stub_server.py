@@ -0,0 +1,581 @@
+#!/usr/bin/env python3
+"""
+stub_server.py
+
+Local HTTP stand-in for the services postar talks to, so the network paths
+(get_mal_info, get_latest_github_release, check_for_github_update) can be
+tested and benchmarked offline and reproducibly.
+
+Serves:
+- /v2/anime/<id>                                  official MAL API shape
+- /v4/anime/<id>                                  Jikan shape
+- /repos/<owner>/<repo>/releases/latest           GitHub release metadata
+- /<owner>/<repo>/releases/latest/download/<zip>  release ZIP
+- /file/<bucket>/<path>                           files under --files-root (B2 download URLs)
+- /s3/<bucket>[/<key>]                            S3-compatible API over --files-root
+                                                  (listing, HEAD/GET, PUT, copy, multipart;
+                                                  SigV4 signatures checked with --s3-credentials)
+- /__stats, /__reset                              request counters
+
+Point postar at it with the environment variables printed on startup.
+"""
+
+import argparse
+import base64
+import hashlib
+import hmac
+import io
+import json
+import random
+import re
+import sys
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit, unquote, parse_qs, parse_qsl, quote
+from xml.sax.saxutils import escape
+
+# ----------------------
+# Recorded responses
+# ----------------------
+# Entries are stored in the official MAL API shape and converted to the
+# Jikan shape on the fly.
+DEFAULT_RECORDINGS = {
+    "mal": {
+        "42310": {
+            "id": 42310,
+            "title": "Cyberpunk: Edgerunners",
+            "alternative_titles": {
+                "synonyms": [],
+                "en": "Cyberpunk: Edgerunners",
+                "ja": "サイバーパンク エッジランナーズ"
+            },
+            "synopsis": "In a dystopia riddled with corruption and cybernetic implants, a talented but reckless street kid strives to become a mercenary outlaw.",
+            "start_season": {"year": 2022, "season": "summer"}
+        },
+        "41623": {
+            "id": 41623,
+            "title": "Isekai Maou to Shoukan Shoujo no Dorei Majutsu Omega",
+            "alternative_titles": {
+                "synonyms": ["Isekai Maou Omega"],
+                "en": "How NOT to Summon a Demon Lord Ω",
+                "ja": "異世界魔王と召喚少女の奴隷魔術Ω"
+            },
+            "synopsis": "Diablo continues his adventures with his summoners.",
+            "start_season": {"year": 2021, "season": "spring"}
+        },
+        "59457": {
+            "id": 59457,
+            "title": "Haite Kudasai, Takamine-san",
+            "alternative_titles": {
+                "synonyms": [],
+                "en": "Please Put Them On, Takamine-san",
+                "ja": "穿いてください、鷹峰さん"
+            },
+            "synopsis": "Koushi Shirota finds out the perfect student council president Takamine can rewind time.",
+            "start_season": {"year": 2025, "season": "fall"}
+        }
+    },
+    "release": {
+        "tag_name": "v0.55",
+        "name": "Stub Release"
+    }
+}
+
+def to_jikan_shape(entry: dict) -> dict:
+    """Convert an official-API-shaped entry into a Jikan /v4 payload."""
+    alt = entry.get("alternative_titles", {}) or {}
+    start = entry.get("start_season", {}) or {}
+    return {
+        "data": {
+            "mal_id": entry.get("id"),
+            "title": entry.get("title"),
+            "title_english": alt.get("en"),
+            "title_japanese": alt.get("ja", ""),
+            "title_synonyms": alt.get("synonyms", []),
+            "synopsis": entry.get("synopsis"),
+            "season": start.get("season"),
+            "year": start.get("year")
+        }
+    }
+
+def build_release_zip(files: dict) -> bytes:
+    """Build an in-memory release ZIP from {relative_path: text}."""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        for name, text in files.items():
+            z.writestr(name, text)
+    return buf.getvalue()
+
+# ----------------------
+# Fault injection
+# ----------------------
+class FaultProfile:
+    """Latency, throttling (429) and failure (500) settings for a path prefix."""
+
+    def __init__(self, latency=0.0, jitter=0.0, throttle_rate=0.0, error_rate=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+
+    @classmethod
+    def parse(cls, spec: str):
+        """
+        Parse 'PREFIX:latency=0.5,jitter=0.1,throttle=0.2,error=0.1'
+        into (prefix, FaultProfile).
+        """
+        prefix, _, opts = spec.partition(":")
+        values = {}
+        for part in filter(None, opts.split(",")):
+            key, _, val = part.partition("=")
+            values[key.strip()] = float(val)
+        return prefix, cls(
+            latency=values.get("latency", 0.0),
+            jitter=values.get("jitter", 0.0),
+            throttle_rate=values.get("throttle", 0.0),
+            error_rate=values.get("error", 0.0)
+        )
+
+class StubState:
+    def __init__(self, recordings=None, default_fault=None, route_faults=None, seed=None, files_root=None, s3_credentials=None):
+        self.recordings = recordings or DEFAULT_RECORDINGS
+        self.files_root = Path(files_root).resolve() if files_root else None
+        self.s3_credentials = s3_credentials or {}  # key id -> secret; empty: S3 requests aren't checked
+        self.default_fault = default_fault or FaultProfile()
+        self.route_faults = route_faults or {}
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {}
+        self.release_files = {"STUB_RELEASE.txt": "python_postar stub release\n"}
+        self.object_meta = {}  # (bucket, key) -> {"crc32": ...} served as x-amz-meta-* headers
+        self.uploads = {}      # upload id -> {"bucket", "key", "meta", "parts": {n: bytes}}
+
+    def fault_for(self, path: str) -> FaultProfile:
+        # Longest matching prefix wins
+        best = None
+        for prefix in self.route_faults:
+            if path.startswith(prefix) and (best is None or len(prefix) > len(best)):
+                best = prefix
+        return self.route_faults[best] if best is not None else self.default_fault
+
+    def count(self, key: str):
+        with self.lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+    def roll(self) -> float:
+        with self.lock:
+            return self.random.random()
+
+# ----------------------
+# Request handler
+# ----------------------
+class StubHandler(BaseHTTPRequestHandler):
+    server_version = "PostarStub/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def state(self) -> StubState:
+        return self.server.state
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            sys.stderr.write("[Stub] " + (fmt % args) + "\n")
+
+    def send_body(self, status: int, body: bytes, content_type="application/json", headers=None, head_only=False):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(body)
+
+    def send_json(self, status: int, payload, head_only=False):
+        self.send_body(status, json.dumps(payload).encode("utf-8"), head_only=head_only)
+
+    def signature_valid(self, body: bytes) -> bool:
+        """Check an S3 request's SigV4 Authorization header (always True without s3_credentials)."""
+        if not self.state.s3_credentials:
+            return True
+        m = re.fullmatch(
+            r"AWS4-HMAC-SHA256 Credential=([^/]+)/(\d{8})/([^/]+)/s3/aws4_request, "
+            r"SignedHeaders=([^,]+), Signature=([0-9a-f]{64})",
+            self.headers.get("Authorization", "")
+        )
+        if not m or m.group(1) not in self.state.s3_credentials:
+            return False
+        key_id, datestamp, region, names, signature = m.groups()
+
+        payload_hash = self.headers.get("x-amz-content-sha256", "")
+        if payload_hash != "UNSIGNED-PAYLOAD" and payload_hash != hashlib.sha256(body).hexdigest():
+            return False
+        url = urlsplit(self.path)
+        query = "&".join(f"{quote(k, safe='~')}={quote(v, safe='~')}"
+                         for k, v in sorted(parse_qsl(url.query, keep_blank_values=True)))
+        headers = "".join(f"{name}:{(self.headers.get(name) or '').strip()}\n" for name in names.split(";"))
+        canonical_request = "\n".join([self.command, url.path, query, headers, names, payload_hash])
+        string_to_sign = "\n".join([
+            "AWS4-HMAC-SHA256", self.headers.get("x-amz-date", ""), f"{datestamp}/{region}/s3/aws4_request",
+            hashlib.sha256(canonical_request.encode("utf-8")).hexdigest()
+        ])
+
+        key = ("AWS4" + self.state.s3_credentials[key_id]).encode("utf-8")
+        for part in (datestamp, region, "s3", "aws4_request"):
+            key = hmac.new(key, part.encode("utf-8"), hashlib.sha256).digest()
+        expected = hmac.new(key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, signature)
+
+    def send_signature_error(self, head_only=False):
+        self.state.count("403")
+        self.send_body(403, b"<Error><Code>SignatureDoesNotMatch</Code></Error>", "application/xml", head_only=head_only)
+
+    def apply_faults(self, path: str, head_only=False) -> bool:
+        """Sleep and maybe answer with 429/500. Returns True if a fault was served."""
+        fault = self.state.fault_for(path)
+        delay = fault.latency + (self.state.roll() * fault.jitter if fault.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+        if fault.throttle_rate and self.state.roll() < fault.throttle_rate:
+            self.state.count("429")
+            self.send_json(429, {"error": "rate limited"}, head_only=head_only)
+            return True
+
+        if fault.error_rate and self.state.roll() < fault.error_rate:
+            self.state.count("500")
+            self.send_json(500, {"error": "injected failure"}, head_only=head_only)
+            return True
+
+        return False
+
+    def do_HEAD(self):
+        self.handle_request(head_only=True)
+
+    def do_GET(self):
+        self.handle_request(head_only=False)
+
+    def do_PUT(self):
+        self.handle_write("PUT")
+
+    def do_POST(self):
+        self.handle_write("POST")
+
+    def do_DELETE(self):
+        self.handle_write("DELETE")
+
+    def handle_request(self, head_only=False):
+        url = urlsplit(self.path)
+        path = url.path
+        parts = [p for p in path.split("/") if p]
+
+        # Control endpoints are never faulted
+        if path == "/__stats":
+            with self.state.lock:
+                return self.send_json(200, dict(self.state.stats))
+        if path == "/__reset":
+            with self.state.lock:
+                self.state.stats.clear()
+            return self.send_json(200, {"reset": True})
+
+        self.state.count(path)
+
+        if self.apply_faults(path, head_only=head_only):
+            return
+
+        # ---- MAL (official) ----
+        if len(parts) == 3 and parts[:2] == ["v2", "anime"]:
+            entry = self.state.recordings["mal"].get(parts[2])
+            if not entry:
+                return self.send_json(404, {"error": "not_found"}, head_only=head_only)
+            return self.send_json(200, entry, head_only=head_only)
+
+        # ---- MAL (Jikan) ----
+        if len(parts) == 3 and parts[:2] == ["v4", "anime"]:
+            entry = self.state.recordings["mal"].get(parts[2])
+            if not entry:
+                return self.send_json(404, {"status": 404, "message": "Resource does not exist"}, head_only=head_only)
+            return self.send_json(200, to_jikan_shape(entry), head_only=head_only)
+
+        # ---- GitHub release metadata ----
+        if len(parts) == 5 and parts[0] == "repos" and parts[3:] == ["releases", "latest"]:
+            return self.send_json(200, self.state.recordings["release"], head_only=head_only)
+
+        # ---- GitHub release ZIP ----
+        if len(parts) == 6 and parts[2:5] == ["releases", "latest", "download"]:
+            body = build_release_zip(self.state.release_files)
+            return self.send_body(200, body, content_type="application/zip", head_only=head_only)
+
+        # ---- B2 download URLs ----
+        if parts and parts[0] == "file" and self.state.files_root:
+            return self.send_file(unquote(path[len("/file/"):]), head_only=head_only)
+
+        # ---- S3-compatible API ----
+        if len(parts) >= 2 and parts[0] == "s3" and self.state.files_root:
+            if not self.signature_valid(b""):
+                return self.send_signature_error(head_only)
+            bucket = unquote(parts[1])
+            key = unquote(path.split("/", 3)[3]) if len(parts) > 2 else ""
+            if not key:
+                return self.send_listing(bucket, parse_qs(url.query), head_only=head_only)
+            return self.send_file(f"{bucket}/{key}", head_only=head_only, meta=self.state.object_meta.get((bucket, key)))
+
+        return self.send_json(404, {"error": "no stub for path"}, head_only=head_only)
+
+    def handle_write(self, method: str):
+        """S3 writes: PutObject, CopyObject (metadata REPLACE) and multipart uploads."""
+        url = urlsplit(self.path)
+        path = url.path
+        parts = [p for p in path.split("/") if p]
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+        self.state.count(f"{method} {path}")
+        if self.apply_faults(path):
+            return
+
+        if len(parts) < 3 or parts[0] != "s3" or not self.state.files_root:
+            return self.send_json(404, {"error": "no stub for path"})
+        if not self.signature_valid(body):
+            return self.send_signature_error()
+
+        bucket = unquote(parts[1])
+        key = unquote(path.split("/", 3)[3])
+        target = (self.state.files_root / bucket / key).resolve()
+        if self.state.files_root not in target.parents:
+            return self.send_body(403, b"<Error><Code>AccessDenied</Code></Error>", "application/xml")
+
+        query = parse_qs(url.query, keep_blank_values=True)
+        upload_id = query.get("uploadId", [""])[0]
+        meta = {k[len("x-amz-meta-"):].lower(): v for k, v in self.headers.items() if k.lower().startswith("x-amz-meta-")}
+
+        if not self.check_content_md5(body):
+            return self.send_body(400, b"<Error><Code>BadDigest</Code></Error>", "application/xml")
+
+        # ---- CreateMultipartUpload ----
+        if method == "POST" and "uploads" in query:
+            new_id = hashlib.md5(f"{bucket}/{key}/{time.time_ns()}".encode()).hexdigest()
+            with self.state.lock:
+                self.state.uploads[new_id] = {"bucket": bucket, "key": key, "meta": meta, "parts": {}}
+            return self.send_s3_result("InitiateMultipartUploadResult", f"<Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key><UploadId>{new_id}</UploadId>")
+
+        if upload_id:
+            with self.state.lock:
+                upload = self.state.uploads.get(upload_id)
+            if not upload or (upload["bucket"], upload["key"]) != (bucket, key):
+                return self.send_body(404, b"<Error><Code>NoSuchUpload</Code></Error>", "application/xml")
+
+            # ---- UploadPart ----
+            if method == "PUT":
+                n = int(query.get("partNumber", ["0"])[0])
+                with self.state.lock:
+                    upload["parts"][n] = body
+                return self.send_body(200, b"", headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+
+            # ---- AbortMultipartUpload ----
+            if method == "DELETE":
+                with self.state.lock:
+                    self.state.uploads.pop(upload_id, None)
+                return self.send_body(204, b"")
+
+            # ---- CompleteMultipartUpload ----
+            numbers = [int(n) for n in re.findall(r"<PartNumber>(\d+)</PartNumber>", body.decode("utf-8"))]
+            if any(n not in upload["parts"] for n in numbers):
+                return self.send_body(400, b"<Error><Code>InvalidPart</Code></Error>", "application/xml")
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with open(target, "wb") as f:
+                for n in numbers:
+                    f.write(upload["parts"][n])
+            with self.state.lock:
+                self.state.uploads.pop(upload_id, None)
+                self.state.object_meta[(bucket, key)] = upload["meta"]
+            return self.send_s3_result("CompleteMultipartUploadResult", f"<Key>{escape(key)}</Key><ETag>&quot;{file_etag(target)}&quot;</ETag>")
+
+        # ---- CopyObject onto itself (metadata REPLACE) ----
+        if method == "PUT" and self.headers.get("x-amz-copy-source"):
+            source = unquote(self.headers["x-amz-copy-source"]).lstrip("/")
+            if source != f"{bucket}/{key}" or not target.is_file():
+                return self.send_body(404, b"<Error><Code>NoSuchKey</Code></Error>", "application/xml")
+            with self.state.lock:
+                self.state.object_meta[(bucket, key)] = meta
+            return self.send_s3_result("CopyObjectResult", f"<ETag>&quot;{file_etag(target)}&quot;</ETag>")
+
+        # ---- PutObject ----
+        if method == "PUT":
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(body)
+            with self.state.lock:
+                self.state.object_meta[(bucket, key)] = meta
+            return self.send_body(200, b"", headers={"ETag": f'"{file_etag(target)}"'})
+
+        return self.send_body(405, b"<Error><Code>MethodNotAllowed</Code></Error>", "application/xml")
+
+    def check_content_md5(self, body: bytes) -> bool:
+        expected = self.headers.get("Content-MD5")
+        return not expected or base64.b64encode(hashlib.md5(body).digest()).decode("ascii") == expected
+
+    def send_s3_result(self, tag: str, inner: str):
+        xml = f'<?xml version="1.0" encoding="UTF-8"?><{tag} xmlns="http://s3.amazonaws.com/doc/2006-03-01/">{inner}</{tag}>'
+        self.send_body(200, xml.encode("utf-8"), "application/xml")
+
+    def send_file(self, rel_path: str, head_only=False, meta=None):
+        target = (self.state.files_root / rel_path).resolve()
+        if self.state.files_root not in target.parents or not target.is_file():
+            return self.send_json(404, {"error": "not_found"}, head_only=head_only)
+
+        size = target.stat().st_size
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(size))
+        self.send_header("ETag", f'"{file_etag(target)}"')
+        for k, v in (meta or {}).items():
+            self.send_header(f"x-amz-meta-{k}", v)
+        self.end_headers()
+        if not head_only:
+            with open(target, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    self.wfile.write(chunk)
+
+    def send_listing(self, bucket: str, query: dict, head_only=False):
+        """ListObjectsV2 over files_root/<bucket> (prefix, delimiter, max-keys, continuation-token)."""
+        root = (self.state.files_root / bucket).resolve()
+        if self.state.files_root not in root.parents or not root.is_dir():
+            return self.send_body(404, b"<Error><Code>NoSuchBucket</Code></Error>", "application/xml", head_only=head_only)
+
+        prefix = query.get("prefix", [""])[0]
+        delimiter = query.get("delimiter", [""])[0]
+        max_keys = int(query.get("max-keys", ["1000"])[0])
+        token = query.get("continuation-token", [""])[0]
+
+        # Keys and common prefixes are paged together, in key order, like S3 does
+        keys = sorted(p.relative_to(root).as_posix() for p in root.rglob("*") if p.is_file())
+        entries = []  # (key or common prefix, is_prefix)
+        for key in keys:
+            if not key.startswith(prefix):
+                continue
+            if delimiter and delimiter in key[len(prefix):]:
+                common = prefix + key[len(prefix):].split(delimiter, 1)[0] + delimiter
+                if entries and entries[-1] == (common, True):
+                    continue
+                key, is_prefix = common, True
+            else:
+                is_prefix = False
+            if token and key <= token:
+                continue
+            entries.append((key, is_prefix))
+
+        truncated = len(entries) > max_keys
+        entries = entries[:max_keys]
+
+        xml = ['<?xml version="1.0" encoding="UTF-8"?>',
+               '<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">',
+               f"<Name>{escape(bucket)}</Name><Prefix>{escape(prefix)}</Prefix><KeyCount>{len(entries)}</KeyCount>",
+               f"<IsTruncated>{'true' if truncated else 'false'}</IsTruncated>"]
+        if truncated:
+            xml.append(f"<NextContinuationToken>{escape(entries[-1][0])}</NextContinuationToken>")
+        for key, is_prefix in entries:
+            if is_prefix:
+                xml.append(f"<CommonPrefixes><Prefix>{escape(key)}</Prefix></CommonPrefixes>")
+                continue
+            target = root / key
+            xml.append(
+                f"<Contents><Key>{escape(key)}</Key><Size>{target.stat().st_size}</Size>"
+                f"<ETag>&quot;{file_etag(target)}&quot;</ETag></Contents>"
+            )
+        xml.append("</ListBucketResult>")
+
+        self.send_body(200, "".join(xml).encode("utf-8"), "application/xml", head_only=head_only)
+
+def file_etag(path: Path) -> str:
+    """Cheap stand-in ETag that changes whenever the file does."""
+    st = path.stat()
+    return hashlib.md5(f"{st.st_size}-{st.st_mtime_ns}".encode()).hexdigest()
+
+# ----------------------
+# Server helpers
+# ----------------------
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, state: StubState, verbose=False):
+        super().__init__(address, StubHandler)
+        self.state = state
+        self.verbose = verbose
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+def start_stub_server(host="127.0.0.1", port=0, state=None, verbose=False) -> StubServer:
+    """Start a stub server on a background thread (port 0 picks a free port)."""
+    server = StubServer((host, port), state or StubState(), verbose=verbose)
+    threading.Thread(target=server.serve_forever, name="postar-stub", daemon=True).start()
+    return server
+
+def stub_environment(base_url: str) -> dict:
+    """Environment variables that point postar at the stub."""
+    return {
+        "POSTAR_MAL_API_BASE": base_url,
+        "POSTAR_JIKAN_API_BASE": base_url,
+        "POSTAR_GITHUB_API_BASE": base_url,
+        "POSTAR_GITHUB_BASE": base_url
+    }
+
+def load_recordings(path: str) -> dict:
+    """Load a recordings file, falling back to the bundled defaults for missing sections."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    recordings = dict(DEFAULT_RECORDINGS)
+    recordings.update(data)
+    return recordings
+
+# -----------------------------
+# CLI
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Local stub server for postar's MAL and GitHub endpoints")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on (0 picks a free port)")
+    parser.add_argument("--recordings", help="JSON file with recorded 'mal' entries and 'release' metadata")
+    parser.add_argument("--latency", type=float, default=0.0, help="Added latency per request in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra latency up to this many seconds")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--route", action="append", default=[], metavar="PREFIX:OPTS",
+                        help="Per-path faults, e.g. /v2/anime:latency=2,error=0.5 (repeatable)")
+    parser.add_argument("--seed", type=int, help="Random seed for reproducible fault injection")
+    parser.add_argument("--files-root", help="Folder of buckets served under /file/ (B2 download URLs) and /s3/ (S3 API)")
+    parser.add_argument("--s3-credentials", action="append", default=[], metavar="KEY_ID:SECRET",
+                        help="Check SigV4 signatures of S3 requests against these keys (repeatable)")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    state = StubState(
+        recordings=load_recordings(args.recordings) if args.recordings else None,
+        default_fault=FaultProfile(args.latency, args.jitter, args.throttle_rate, args.error_rate),
+        route_faults=dict(FaultProfile.parse(spec) for spec in args.route),
+        seed=args.seed,
+        files_root=args.files_root,
+        s3_credentials=dict(spec.split(":", 1) for spec in args.s3_credentials)
+    )
+
+    server = StubServer((args.host, args.port), state, verbose=args.verbose)
+    print(f"[Stub] Listening on {server.base_url}")
+    print("[Stub] Point postar at it with:")
+    for k, v in stub_environment(server.base_url).items():
+        print(f"  {k}={v}")
+    if args.files_root:
+        print(f"[Stub] Serving buckets in {args.files_root} at {server.base_url}/file/<bucket>/ and S3 endpoint {server.base_url}/s3")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[Stub] Stopped.")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()